@@ -1,8 +1,46 @@
-from flask import Flask, request, jsonify
+import atexit
+import gzip
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from almacen_chat import SALA_GENERAL, AlmacenChat
 
-# Lista global para almacenar los mensajes
-mensajes = []
+# Almacén de los mensajes: los últimos de cada sala en memoria (búfer acotado)
+# y todo el historial en SQLite. Cada mensaje lleva un id creciente dentro de
+# su sala; el almacén avisa a los hilos que esperan en /dame o /eventos cuando
+# llega uno nuevo a la sala que miran.
+# Con varios procesos (gunicorn, ver gunicorn.conf.py) CHAT_COMPARTIDO=1 hace
+# que todos numeren y lean los mensajes a través de la misma base de datos.
+# CHAT_CAPACIDAD (mensajes en memoria por sala) y CHAT_LOTE (mensajes por
+# escritura en SQLite) permiten comparar configuraciones con bench_chat.py
+RUTA_DB = os.environ.get('CHAT_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat.db'))
+almacen = AlmacenChat(RUTA_DB,
+                      capacidad=int(os.environ.get('CHAT_CAPACIDAD', 1000)),
+                      lote=int(os.environ.get('CHAT_LOTE', 256)),
+                      compartido=os.environ.get('CHAT_COMPARTIDO') == '1')
+atexit.register(almacen.cerrar)  # Guarda el último lote al salir
+
+# Mensajes por respuesta como máximo (los clientes piden el resto con 'desde')
+LIMITE = 1000
+# Tiempo máximo que una petición de long-polling queda bloqueada
+ESPERA_MAXIMA = 30
+# Cada cuánto se envía un comentario por SSE para mantener viva la conexión
+LATIDO_SSE = 15
+# Respuestas de /dame ya serializadas que se guardan, y tamaño a partir del cual se comprimen
+RESPUESTAS_EN_CACHE = 256
+TAMANO_MINIMO_GZIP = 512
+# Nombres de sala válidos: letras, números, '_' y '-'
+NOMBRE_SALA = re.compile(r'[\w-]{1,64}')
+
+# Caché de respuestas de /dame: (sala, desde, hasta) -> (JSON, JSON con gzip).
+# Un rango de ids siempre contiene los mismos mensajes, así que cada
+# respuesta se serializa y se comprime una sola vez
+respuestas = OrderedDict()
+cerrojo_respuestas = threading.Lock()
 
 # Crear una instancia de la aplicación Flask
 app = Flask(__name__)
@@ -10,6 +48,31 @@ app = Flask(__name__)
 # Habilitar CORS para permitir peticiones desde diferentes dominios
 CORS(app)
 
+def sala_pedida():
+    """Sala indicada en la URL ('general' si no se indica) o None si el nombre no es válido"""
+    sala = request.args.get('sala', SALA_GENERAL)
+    return sala if NOMBRE_SALA.fullmatch(sala) else None
+
+def desde_por_defecto(sala):
+    """Sin 'desde', se empieza por los mensajes más recientes de la sala"""
+    return max(almacen.version(sala) - LIMITE, 0)
+
+def respuesta_cacheada(sala, desde, hasta):
+    """Cuerpo JSON (y su versión gzip) de los mensajes de la sala con id en (desde, hasta]"""
+    clave = (sala, desde, hasta)
+    with cerrojo_respuestas:
+        if clave in respuestas:
+            respuestas.move_to_end(clave)
+            return respuestas[clave]
+
+    cuerpo = json.dumps(almacen.desde(desde, 0, hasta - desde, sala), separators=(',', ':')).encode('utf-8')
+    comprimido = gzip.compress(cuerpo, 6) if len(cuerpo) >= TAMANO_MINIMO_GZIP else None
+    with cerrojo_respuestas:
+        respuestas[clave] = (cuerpo, comprimido)
+        if len(respuestas) > RESPUESTAS_EN_CACHE:
+            respuestas.popitem(last=False)
+    return cuerpo, comprimido
+
 # Ruta raíz para mostrar un saludo
 @app.route('/')
 def inicio():
@@ -18,35 +81,123 @@ def inicio():
     """
     return "Hola mundo"  # Retorna un saludo en formato texto
 
-# Ruta para obtener todos los mensajes almacenados
+# Ruta para obtener los mensajes almacenados
 @app.route('/dame', methods=['GET'])
 def dame():
     """
-    Ruta que devuelve todos los mensajes almacenados en formato JSON.
+    Ruta que devuelve en formato JSON hasta LIMITE mensajes de la sala 'sala'
+    ('general' si no se indica) posteriores al id 'desde' (los más recientes
+    si no se indica). Con 'espera=<segundos>' hace
+    long-polling: si aún no hay mensajes nuevos, la respuesta espera a que lleguen.
+
+    La respuesta lleva un ETag con el rango de ids que contiene: si el cliente
+    ya lo tiene (If-None-Match) se contesta 304 sin cuerpo, y si no, se envía
+    el cuerpo de la caché, comprimido con gzip si el cliente lo acepta. El
+    ETag es débil (W/): el cuerpo con y sin gzip tiene el mismo contenido
+    pero no los mismos bytes.
+    """
+    sala = sala_pedida()
+    if sala is None:
+        return jsonify({"error": "Nombre de sala no válido"}), 400
+
+    desde = max(request.args.get('desde', desde_por_defecto(sala), type=int), 0)
+    espera = min(max(request.args.get('espera', 0, type=float), 0), ESPERA_MAXIMA)
+    # Los ids no tienen huecos: el rango basta para saber qué mensajes van
+    # (la sala ya forma parte de la URL, a la que va asociado el ETag)
+    hasta = max(min(almacen.esperar(desde, espera, sala), desde + LIMITE), desde)
+    etiqueta = f"{desde}-{hasta}"
+
+    if request.if_none_match.contains_weak(etiqueta):
+        respuesta = Response(status=304)
+    else:
+        cuerpo, comprimido = respuesta_cacheada(sala, desde, hasta)
+        respuesta = Response(cuerpo, mimetype='application/json')
+        if comprimido is not None and 'gzip' in request.accept_encodings:
+            respuesta.set_data(comprimido)
+            respuesta.headers['Content-Encoding'] = 'gzip'
+    respuesta.set_etag(etiqueta, weak=True)
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    respuesta.headers['Cache-Control'] = 'no-cache'  # El navegador revalida siempre con el ETag
+    return respuesta  # Devuelve los mensajes como una respuesta JSON
+
+# Ruta para recibir los mensajes como Server-Sent Events
+@app.route('/eventos', methods=['GET'])
+def eventos():
+    """
+    Ruta que mantiene abierta la conexión y envía cada mensaje nuevo de la
+    sala como un evento SSE con su id. Al reconectar, el navegador manda la
+    cabecera Last-Event-ID y se continúa desde ese mensaje.
     """
-    return jsonify(mensajes)  # Devuelve los mensajes como una respuesta JSON
+    sala = sala_pedida()
+    if sala is None:
+        return jsonify({"error": "Nombre de sala no válido"}), 400
+
+    desde = request.headers.get('Last-Event-ID', type=int)
+    if desde is None:
+        desde = request.args.get('desde', desde_por_defecto(sala), type=int)
+
+    def generar(desde):
+        while True:
+            nuevos = almacen.desde(desde, LATIDO_SSE, LIMITE, sala)
+            if not nuevos:
+                yield ": latido\n\n"  # Comentario SSE: el navegador lo ignora
+                continue
+            for mensaje in nuevos:
+                yield f"id: {mensaje['id']}\ndata: {json.dumps(mensaje)}\n\n"
+            desde = nuevos[-1]['id']
+
+    return Response(generar(max(desde, 0)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+# Ruta para buscar en el historial
+@app.route('/buscar', methods=['GET'])
+def buscar():
+    """
+    Ruta que busca mensajes por texto o usuario: 'q' son las palabras a
+    buscar (cada una vale como prefijo: "hol" encuentra "hola"). Opcionalmente
+    'sala' limita la búsqueda a una sala y 'limite' fija el tamaño de página.
+    Devuelve los resultados del más reciente al más antiguo y un cursor
+    'siguiente' que se pasa como 'antes' para pedir la página siguiente.
+    """
+    texto = request.args.get('q', '')
+    sala = request.args.get('sala')
+    if sala is not None and not NOMBRE_SALA.fullmatch(sala):
+        return jsonify({"error": "Nombre de sala no válido"}), 400
+    if not texto.strip():
+        return jsonify({"error": "Falta el parámetro 'q'"}), 400
+
+    antes = request.args.get('antes', type=int)
+    limite = min(max(request.args.get('limite', 50, type=int), 1), 100)
+    resultados, siguiente = almacen.buscar(texto, sala, antes, limite)
+    return jsonify({"resultados": resultados, "siguiente": siguiente})
 
 # Ruta para agregar un nuevo mensaje
 @app.route('/toma', methods=['GET'])
 def toma():
     """
-    Ruta que recibe un mensaje y un usuario desde los parámetros de la URL,
-    los almacena y devuelve una respuesta de éxito.
+    Ruta que recibe un mensaje, un usuario y opcionalmente una sala desde los
+    parámetros de la URL, los almacena y devuelve una respuesta de éxito con
+    el id asignado dentro de la sala.
     """
     mensaje = request.args.get('mensaje')  # Obtiene el mensaje de la URL
     usuario = request.args.get('usuario')  # Obtiene el usuario de la URL
-    
+    sala = sala_pedida()  # Obtiene la sala de la URL ('general' por defecto)
+
     # Verifica si los parámetros necesarios están presentes
     if not mensaje or not usuario:
         return jsonify({"error": "Faltan parámetros 'mensaje' o 'usuario'"}), 400
-    
-    # Añadir el nuevo mensaje a la lista global
-    mensajes.append({'mensaje': mensaje, 'usuario': usuario})
-    
+    if sala is None:
+        return jsonify({"error": "Nombre de sala no válido"}), 400
+
+    # Añadir el nuevo mensaje al almacén (despierta a quien espera)
+    nuevo_id = almacen.agregar(usuario, mensaje, sala)
+
     # Devuelve una respuesta de éxito
-    return jsonify({"mensaje": "ok"}), 200
+    return jsonify({"mensaje": "ok", "id": nuevo_id}), 200
 
 # Ejecutar la aplicación Flask
 if __name__ == '__main__':
     # Ejecuta el servidor en modo de desarrollo, con IP 192.168.1.41
-    app.run(debug=True, host='192.168.1.41', port=5000)
+    # (para varios procesos: gunicorn -c gunicorn.conf.py)
+    # threaded=True: cada petición en espera ocupa un hilo, no bloquea al resto
+    app.run(debug=True, host='192.168.1.41', port=5000, threaded=True)
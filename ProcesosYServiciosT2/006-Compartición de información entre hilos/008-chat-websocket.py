@@ -0,0 +1,427 @@
+import asyncio
+import gzip
+import json
+import os
+import queue
+import re
+import weakref
+from collections import OrderedDict
+from aiohttp import ETag, WSCloseCode, WSMsgType, web
+from almacen_chat import SALA_GENERAL, AlmacenChat
+
+# Variante asíncrona de 007-chat.py con WebSockets (aiohttp).
+#
+# En 007-chat.py cada long-polling o SSE abierto ocupa un hilo mientras
+# espera. Aquí todo corre en un único hilo con asyncio: una conexión abierta
+# es una corrutina parada en un await, así que un proceso mantiene miles de
+# navegadores conectados. Cada sala tiene un canal con sus suscriptores
+# (WebSocket o SSE); cada mensaje que llega por /toma o por un WebSocket se
+# serializa una vez y se deja en la cola de envío de cada suscriptor.
+#
+# Las rutas HTTP de 007-chat.py siguen funcionando igual para los clientes
+# antiguos. Este servidor es un solo proceso: no usa el modo compartido de
+# AlmacenChat, porque los mensajes guardados por otros procesos no pasarían
+# por sus canales.
+#
+#     python 008-chat-websocket.py
+#     CHAT_BIND=127.0.0.1:8080 python 008-chat-websocket.py
+RUTA_DB = os.environ.get('CHAT_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat.db'))
+almacen = AlmacenChat(RUTA_DB,
+                      capacidad=int(os.environ.get('CHAT_CAPACIDAD', 1000)),
+                      lote=int(os.environ.get('CHAT_LOTE', 256)))
+BIND = os.environ.get('CHAT_BIND', '192.168.1.41:5000')
+
+# Mensajes por respuesta como máximo (los clientes piden el resto con 'desde')
+LIMITE = 1000
+# Tiempo máximo que una petición de long-polling queda bloqueada
+ESPERA_MAXIMA = 30
+# Cada cuánto se envía un latido por SSE (comentario) o WebSocket (ping)
+LATIDO = 15
+# Mensajes pendientes de enviar por conexión: si un cliente no da abasto
+# se le desconecta y, al reconectar, pide lo que le falte con 'desde'
+COLA_ENVIO = 256
+# Respuestas de /dame ya serializadas que se guardan, y tamaño a partir del cual se comprimen
+RESPUESTAS_EN_CACHE = 256
+TAMANO_MINIMO_GZIP = 512
+# Nombres de sala válidos: letras, números, '_' y '-'
+NOMBRE_SALA = re.compile(r'[\w-]{1,64}')
+
+# WebSockets abiertos, para cerrarlos limpiamente al parar el servidor
+WEBSOCKETS = web.AppKey('websockets', weakref.WeakSet)
+
+# Caché de respuestas de /dame: (sala, desde, hasta) -> (JSON, JSON con gzip).
+# No necesita cerrojo: solo la toca el hilo del bucle de eventos
+respuestas = OrderedDict()
+
+class Suscriptor:
+    """Conexión (WebSocket o SSE) que sigue una sala, con su cola de envío acotada"""
+
+    def __init__(self):
+        self.cola = asyncio.Queue(maxsize=COLA_ENVIO)
+        self.desbordado = False
+
+    def entregar(self, id, texto):
+        """Encola un mensaje ya serializado; nunca espera al cliente"""
+        if self.desbordado:
+            return
+        try:
+            self.cola.put_nowait((id, texto))
+        except asyncio.QueueFull:
+            # Cliente lento: en vez de acumular sus mensajes se vacía la cola
+            # y se le avisa (None) para cerrar la conexión
+            self.desbordado = True
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(None)
+
+class Canal:
+    """Suscriptores y long-pollings en espera de una sala"""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.suscriptores = set()
+        self.esperando = 0
+        # Se activa y se sustituye por uno nuevo con cada mensaje
+        self.evento = asyncio.Event()
+
+    def avisar(self):
+        self.evento.set()
+        self.evento = asyncio.Event()
+
+    async def esperar(self, desde, espera):
+        """Espera hasta 'espera' segundos a un mensaje posterior a 'desde'; devuelve la versión de la sala"""
+        limite = asyncio.get_running_loop().time() + espera
+        # La sala se carga (si hace falta) fuera del bucle y después se fija
+        # en memoria: mientras se espera no se desaloja, así que basta mirar
+        # su último id sin volver a pasar por el almacén ni por SQLite
+        self.esperando += 1
+        sala = None
+        try:
+            await version(self.nombre)
+            sala = almacen.fijar(self.nombre)
+            while sala.ultimo_id <= desde:
+                resto = limite - asyncio.get_running_loop().time()
+                if resto <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self.evento.wait(), resto)
+                except TimeoutError:
+                    break
+        finally:
+            if sala is not None:
+                almacen.soltar(sala)
+            self.esperando -= 1
+            liberar(self)
+        return sala.ultimo_id
+
+# Canales de las salas con alguien conectado o esperando
+canales = {}
+
+def canal(sala):
+    if sala not in canales:
+        canales[sala] = Canal(sala)
+    return canales[sala]
+
+def liberar(canal):
+    """Olvida el canal de una sala cuando ya nadie la sigue"""
+    if not canal.suscriptores and not canal.esperando and canales.get(canal.nombre) is canal:
+        del canales[canal.nombre]
+
+def serializar(mensaje):
+    return json.dumps(mensaje, separators=(',', ':'))
+
+async def publicar(usuario, mensaje, sala):
+    """
+    Guarda un mensaje y lo difunde a la sala; devuelve su id. Lanza
+    queue.Full si SQLite va tan por detrás que la cola de persistencia
+    está llena: quien llama responde que el servidor está saturado.
+    """
+    # La sala se carga de SQLite (si no estaba en memoria) fuera del bucle
+    await version(sala)
+    # agregar() se llama desde el bucle de eventos, sin esperar hueco en la
+    # cola: así nunca lo bloquea y los ids se asignan y se difunden en el
+    # mismo orden. Con la sala ya en memoria no consulta SQLite y el cerrojo
+    # global solo se toma un instante (las cargas de otras salas no lo retienen)
+    nuevo_id = almacen.agregar(usuario, mensaje, sala, espera=0)
+
+    destino = canales.get(sala)
+    if destino is not None:
+        destino.avisar()
+        # Una sola serialización para todos los suscriptores de la sala
+        texto = serializar({'id': nuevo_id, 'mensaje': mensaje, 'usuario': usuario})
+        for suscriptor in destino.suscriptores:
+            suscriptor.entregar(nuevo_id, texto)
+    return nuevo_id
+
+async def seguir(sala, desde, enviar, latido=None):
+    """
+    Envía con 'enviar(id, texto)' los mensajes de la sala posteriores a
+    'desde' y después los nuevos según llegan. Con 'latido', lo llama si
+    pasan LATIDO segundos sin mensajes. Devuelve False si se desconecta al
+    cliente por lento.
+    """
+    destino = canal(sala)
+    suscriptor = Suscriptor()
+    # Suscrito antes de leer lo atrasado: lo que llegue mientras no se pierde
+    # (y lo repetido se descarta por id)
+    destino.suscriptores.add(suscriptor)
+    try:
+        while True:
+            atrasados = await asyncio.to_thread(almacen.desde, desde, 0, LIMITE, sala)
+            for mensaje in atrasados:
+                await enviar(mensaje['id'], serializar(mensaje))
+            if atrasados:
+                desde = atrasados[-1]['id']
+            if len(atrasados) < LIMITE:
+                break
+
+        while True:
+            try:
+                elemento = await asyncio.wait_for(suscriptor.cola.get(), LATIDO if latido else None)
+            except TimeoutError:
+                await latido()
+                continue
+            if elemento is None:
+                return False
+            id, texto = elemento
+            if id > desde:
+                await enviar(id, texto)
+                desde = id
+    finally:
+        destino.suscriptores.discard(suscriptor)
+        liberar(destino)
+
+def numero(request, nombre, defecto, tipo=int):
+    """Parámetro numérico de la URL ('defecto' si falta o no es válido)"""
+    try:
+        return tipo(request.query[nombre])
+    except (KeyError, ValueError):
+        return defecto
+
+def sala_pedida(request):
+    """Sala indicada en la URL ('general' si no se indica) o None si el nombre no es válido"""
+    sala = request.query.get('sala', SALA_GENERAL)
+    return sala if NOMBRE_SALA.fullmatch(sala) else None
+
+def desde_pedido(request, version, cabecera=None):
+    """'desde' de la URL (o de la cabecera indicada); sin él, los mensajes más recientes de la sala"""
+    if cabecera and request.headers.get(cabecera, '').isdigit():
+        return int(request.headers[cabecera])
+    return max(numero(request, 'desde', max(version - LIMITE, 0)), 0)
+
+async def version(sala):
+    """Versión de la sala; la primera vez la carga de SQLite, fuera del bucle de eventos"""
+    return await asyncio.to_thread(almacen.version, sala)
+
+def error(texto):
+    return web.json_response({"error": texto}, status=400)
+
+async def respuesta_cacheada(sala, desde, hasta):
+    """Cuerpo JSON (y su versión gzip) de los mensajes de la sala con id en (desde, hasta]"""
+    clave = (sala, desde, hasta)
+    if clave in respuestas:
+        respuestas.move_to_end(clave)
+        return respuestas[clave]
+
+    # Lo que ya salió de memoria se lee de SQLite: fuera del bucle de eventos
+    mensajes = await asyncio.to_thread(almacen.desde, desde, 0, hasta - desde, sala)
+    cuerpo = json.dumps(mensajes, separators=(',', ':')).encode('utf-8')
+    comprimido = gzip.compress(cuerpo, 6) if len(cuerpo) >= TAMANO_MINIMO_GZIP else None
+    respuestas[clave] = (cuerpo, comprimido)
+    if len(respuestas) > RESPUESTAS_EN_CACHE:
+        respuestas.popitem(last=False)
+    return cuerpo, comprimido
+
+@web.middleware
+async def cors(request, handler):
+    """Permite peticiones desde cualquier dominio (como flask_cors en 007-chat.py)"""
+    respuesta = await handler(request)
+    if not respuesta.prepared:
+        respuesta.headers['Access-Control-Allow-Origin'] = '*'
+    return respuesta
+
+rutas = web.RouteTableDef()
+
+# Ruta raíz para mostrar un saludo
+@rutas.get('/')
+async def inicio(request):
+    """
+    Ruta principal que responde con un mensaje de saludo.
+    """
+    return web.Response(text="Hola mundo")
+
+# Ruta para obtener los mensajes almacenados (igual que en 007-chat.py)
+@rutas.get('/dame')
+async def dame(request):
+    """
+    Ruta que devuelve en formato JSON hasta LIMITE mensajes de la sala
+    posteriores al id 'desde', con long-polling opcional ('espera'),
+    ETag/304 y gzip. El long-polling no ocupa ningún hilo mientras espera.
+    """
+    sala = sala_pedida(request)
+    if sala is None:
+        return error("Nombre de sala no válido")
+
+    actual = await version(sala)
+    desde = desde_pedido(request, actual)
+    espera = min(max(numero(request, 'espera', 0, float), 0), ESPERA_MAXIMA)
+    if espera and actual <= desde:
+        actual = await canal(sala).esperar(desde, espera)
+    hasta = max(min(actual, desde + LIMITE), desde)
+    etiqueta = f"{desde}-{hasta}"
+
+    # ETag débil: el cuerpo con y sin gzip tiene el mismo contenido pero no los mismos bytes
+    if any(e.value == etiqueta for e in request.if_none_match or ()):
+        respuesta = web.Response(status=304)
+    else:
+        cuerpo, comprimido = await respuesta_cacheada(sala, desde, hasta)
+        respuesta = web.Response(body=cuerpo, content_type='application/json')
+        if comprimido is not None and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            respuesta.body = comprimido
+            respuesta.headers['Content-Encoding'] = 'gzip'
+    respuesta.etag = ETag(value=etiqueta, is_weak=True)
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    respuesta.headers['Cache-Control'] = 'no-cache'  # El navegador revalida siempre con el ETag
+    return respuesta
+
+# Ruta para recibir los mensajes como Server-Sent Events
+@rutas.get('/eventos')
+async def eventos(request):
+    """
+    Ruta que mantiene abierta la conexión y envía cada mensaje nuevo de la
+    sala como un evento SSE con su id (al reconectar, el navegador manda
+    Last-Event-ID y se continúa desde ese mensaje).
+    """
+    sala = sala_pedida(request)
+    if sala is None:
+        return error("Nombre de sala no válido")
+    desde = desde_pedido(request, await version(sala), 'Last-Event-ID')
+
+    respuesta = web.StreamResponse(headers={'Content-Type': 'text/event-stream',
+                                            'Cache-Control': 'no-cache',
+                                            'Access-Control-Allow-Origin': '*'})
+    await respuesta.prepare(request)
+
+    async def enviar(id, texto):
+        await respuesta.write(f"id: {id}\ndata: {texto}\n\n".encode('utf-8'))
+
+    async def latido():
+        await respuesta.write(b": latido\n\n")  # Comentario SSE: el navegador lo ignora
+
+    try:
+        await seguir(sala, desde, enviar, latido)
+    except ConnectionError:
+        pass  # El navegador cerró la página
+    return respuesta
+
+# Ruta para los clientes con WebSocket
+@rutas.get('/ws')
+async def websocket(request):
+    """
+    WebSocket de una sala: envía los mensajes posteriores a 'desde' (los
+    más recientes si no se indica) y después cada mensaje nuevo como texto
+    JSON. El cliente puede enviar {"usuario": ..., "mensaje": ...} para
+    publicar en la sala, igual que con /toma.
+    """
+    sala = sala_pedida(request)
+    if sala is None:
+        return error("Nombre de sala no válido")
+    desde = desde_pedido(request, await version(sala))
+
+    ws = web.WebSocketResponse(heartbeat=LATIDO)
+    await ws.prepare(request)
+    request.app[WEBSOCKETS].add(ws)
+
+    async def enviar(id, texto):
+        await ws.send_str(texto)
+
+    async def emitir():
+        try:
+            if not await seguir(sala, desde, enviar):
+                await ws.close(code=WSCloseCode.TRY_AGAIN_LATER, message=b'Cola de envio llena')
+        except ConnectionError:
+            pass
+
+    emisor = asyncio.create_task(emitir())
+    try:
+        async for recibido in ws:
+            if recibido.type != WSMsgType.TEXT:
+                continue
+            try:
+                dato = json.loads(recibido.data)
+                usuario, mensaje = str(dato.get('usuario') or ''), str(dato.get('mensaje') or '')
+            except (ValueError, AttributeError):
+                usuario = mensaje = ''
+            if not mensaje or not usuario:
+                await ws.send_json({"error": "Faltan 'mensaje' o 'usuario'"})
+                continue
+            try:
+                await publicar(usuario, mensaje, sala)
+            except queue.Full:
+                await ws.send_json({"error": "Servidor saturado, inténtalo más tarde"})
+    finally:
+        emisor.cancel()
+    return ws
+
+# Ruta para buscar en el historial
+@rutas.get('/buscar')
+async def buscar(request):
+    """
+    Ruta que busca mensajes por texto o usuario (ver 007-chat.py): 'q',
+    'sala', 'limite' y el cursor 'antes' para la página siguiente.
+    """
+    texto = request.query.get('q', '')
+    sala = request.query.get('sala')
+    if sala is not None and not NOMBRE_SALA.fullmatch(sala):
+        return error("Nombre de sala no válido")
+    if not texto.strip():
+        return error("Falta el parámetro 'q'")
+
+    antes = numero(request, 'antes', None)
+    limite = min(max(numero(request, 'limite', 50), 1), 100)
+    resultados, siguiente = await asyncio.to_thread(almacen.buscar, texto, sala, antes, limite)
+    return web.json_response({"resultados": resultados, "siguiente": siguiente})
+
+# Ruta para agregar un nuevo mensaje
+@rutas.get('/toma')
+async def toma(request):
+    """
+    Ruta que recibe un mensaje, un usuario y opcionalmente una sala, lo
+    guarda, lo difunde a los conectados a la sala y devuelve su id.
+    """
+    mensaje = request.query.get('mensaje')
+    usuario = request.query.get('usuario')
+    sala = sala_pedida(request)
+
+    if not mensaje or not usuario:
+        return error("Faltan parámetros 'mensaje' o 'usuario'")
+    if sala is None:
+        return error("Nombre de sala no válido")
+
+    try:
+        nuevo_id = await publicar(usuario, mensaje, sala)
+    except queue.Full:
+        return web.json_response({"error": "Servidor saturado, inténtalo más tarde"}, status=503,
+                                 headers={'Retry-After': '1'})
+    return web.json_response({"mensaje": "ok", "id": nuevo_id})
+
+async def cerrar_websockets(app):
+    """Al parar el servidor, los navegadores reciben un cierre limpio y reconectan"""
+    for ws in set(app[WEBSOCKETS]):
+        await ws.close(code=WSCloseCode.GOING_AWAY, message=b'Servidor detenido')
+
+async def cerrar_almacen(app):
+    await asyncio.to_thread(almacen.cerrar)  # Guarda el último lote
+
+def crear_app():
+    app = web.Application(middlewares=[cors])
+    app[WEBSOCKETS] = weakref.WeakSet()
+    app.add_routes(rutas)
+    app.on_shutdown.append(cerrar_websockets)
+    app.on_cleanup.append(cerrar_almacen)
+    return app
+
+# Ejecutar el servidor
+if __name__ == '__main__':
+    host, puerto = BIND.rsplit(':', 1)
+    web.run_app(crear_app(), host=host, port=int(puerto))
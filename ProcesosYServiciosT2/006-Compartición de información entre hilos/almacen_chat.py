@@ -0,0 +1,464 @@
+"""
+Almacén de mensajes del chat: memoria acotada + SQLite, por salas.
+
+Cada sala tiene su propio búfer circular (deque con maxlen) y su propio
+cerrojo, así que las salas no compiten entre sí y leer una sala cuesta lo
+que cueste su actividad, no la de todo el chat. Los ids son por sala y no
+tienen huecos. Las salas que llevan 'inactividad' segundos sin usarse se
+sacan de memoria (ya están en SQLite) y se recargan al volver a pedirlas,
+de modo que la memoria no crece aunque el servidor pase semanas encendido
+con miles de salas.
+
+Cada mensaje se encola además para un único hilo que los guarda por lotes
+en SQLite (modo WAL: las lecturas no bloquean las escrituras), de modo que
+las peticiones nunca esperan al disco. Los mensajes que ya salieron del
+búfer se leen de la base de datos por (sala, id), y al arrancar el
+historial sigue ahí.
+
+Con compartido=True varios procesos (workers de gunicorn) usan la misma
+base de datos. Entonces es SQLite quien numera los mensajes: el hilo de
+persistencia de cada proceso toma el bloqueo de escritura (BEGIN
+IMMEDIATE), continúa desde el id máximo de cada sala y /toma espera a que
+su lote se confirme. Los búferes pasan a ser una copia de lo último de la
+base de datos: cada proceso compara PRAGMA data_version (cambia cuando
+otra conexión confirma algo) antes de cada lectura y copia las filas
+nuevas a las salas que tiene en memoria; un hilo vigilante lo mira cada
+'sondeo' segundos para despertar a quien espera en long-polling o SSE.
+
+Para las búsquedas, una tabla FTS5 (índice invertido de SQLite) indexa el
+texto y el usuario de cada mensaje. Un trigger la actualiza en la misma
+transacción que guarda cada lote, así que el índice siempre está al día
+con lo persistido.
+"""
+
+import contextlib
+import itertools
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+SALA_GENERAL = 'general'
+# Veces que se intenta guardar un lote que SQLite rechaza antes de darlo por perdido
+REINTENTOS = 5
+
+log = logging.getLogger('chat')
+# Palabras de una búsqueda (el mismo criterio que el tokenizador unicode61)
+PALABRA = re.compile(r'\w+')
+
+class Sala:
+    """Mensajes recientes de una sala, con su propio cerrojo"""
+
+    def __init__(self, nombre, capacidad):
+        self.nombre = nombre
+        # Condición que protege el búfer y avisa de mensajes nuevos
+        self.nuevos = threading.Condition()
+        self.recientes = deque(maxlen=capacidad)
+        self.persistido = 0
+        self.esperando = 0
+        self.ultimo_uso = time.monotonic()
+        # La sala se da de alta vacía y se carga de SQLite bajo su propio
+        # cerrojo: quien pide otra sala no espera a esta carga
+        self.carga = threading.Lock()
+        self.cargada = False
+
+    @property
+    def ultimo_id(self):
+        return self.recientes[-1]['id'] if self.recientes else self.persistido
+
+    def anadir(self, id, usuario, mensaje):
+        self.recientes.append({'id': id, 'mensaje': mensaje, 'usuario': usuario})
+
+class AlmacenChat:
+    def __init__(self, ruta='chat.db', capacidad=1000, lote=256, compartido=False,
+                 sondeo=0.01, inactividad=300):
+        """'capacidad' mensajes en memoria por sala; se guardan en lotes de hasta 'lote'"""
+        self.ruta = ruta
+        self.capacidad = capacidad
+        self.lote = lote
+        self.compartido = compartido
+        self.sondeo = sondeo
+        self.inactividad = inactividad
+
+        # El cerrojo global solo protege el diccionario de salas
+        self.salas = {}
+        self.cerrojo = threading.Lock()
+        self.ultima_limpieza = time.monotonic()
+        # Condición del hilo de persistencia: avisa al guardar cada lote
+        self.guardados = threading.Condition()
+
+        self.local = threading.local()
+        self.crear_tablas()
+        # Última fila (rowid) copiada a los búferes en modo compartido
+        self.cerrojo_refresco = threading.Lock()
+        self.ultima_fila = self.conexion().execute("SELECT COALESCE(MAX(rowid), 0) FROM mensajes").fetchone()[0]
+
+        # Cola con hueco para lote * 16 mensajes: si SQLite no da abasto,
+        # agregar() espera a que haya hueco en lugar de acumular mensajes en
+        # memoria. El hueco se reserva antes de tomar el cerrojo de la sala,
+        # así que esa espera no bloquea a quien lee la sala
+        self.cola = queue.SimpleQueue()
+        self.huecos = threading.Semaphore(lote * 16)
+        self.hilo = threading.Thread(target=self.persistir, name='chat-sqlite', daemon=True)
+        self.hilo.start()
+
+        self.parado = threading.Event()
+        self.aviso = threading.Event()
+        self.vigilante = None
+        if compartido:
+            self.vigilante = threading.Thread(target=self.vigilar, name='chat-vigilante', daemon=True)
+            self.vigilante.start()
+
+    # ------------------------------------------------------------------
+    # Base de datos
+    # ------------------------------------------------------------------
+    def conexion(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        conexion = getattr(self.local, 'conexion', None)
+        if conexion is None:
+            conexion = self.local.conexion = sqlite3.connect(self.ruta, timeout=30)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+        return conexion
+
+    def crear_tablas(self):
+        with self.conexion() as conexion:
+            # Con el bloqueo de escritura: si varios workers arrancan a la vez,
+            # solo uno migra y crea el índice; los demás ya lo encuentran hecho
+            conexion.execute("BEGIN IMMEDIATE")
+            columnas = [fila[1] for fila in conexion.execute("PRAGMA table_info(mensajes)")]
+            if columnas and 'sala' not in columnas:
+                # Base de datos anterior a las salas: sus mensajes pasan a la sala general
+                conexion.execute("ALTER TABLE mensajes RENAME TO mensajes_sin_salas")
+
+            # El índice único (sala, id) sirve las lecturas por rango de una sala
+            conexion.execute("""CREATE TABLE IF NOT EXISTS mensajes (
+                                    sala TEXT NOT NULL,
+                                    id INTEGER NOT NULL,
+                                    usuario TEXT NOT NULL,
+                                    mensaje TEXT NOT NULL,
+                                    fecha REAL NOT NULL,
+                                    UNIQUE (sala, id))""")
+
+            if columnas and 'sala' not in columnas:
+                conexion.execute("""INSERT INTO mensajes (sala, id, usuario, mensaje, fecha)
+                                    SELECT ?, id, usuario, mensaje, fecha FROM mensajes_sin_salas
+                                    ORDER BY id""", (SALA_GENERAL,))
+                conexion.execute("DROP TABLE mensajes_sin_salas")
+
+            # Índice de texto completo sobre la propia tabla (no duplica el texto).
+            # remove_diacritics: "cancion" encuentra "canción"; prefix: los
+            # prefijos cortos se resuelven con índices propios
+            indexado = conexion.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'mensajes_fts'").fetchone()
+            conexion.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS mensajes_fts USING fts5(
+                                    mensaje, usuario, content='mensajes', content_rowid='rowid',
+                                    tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+            conexion.execute("""CREATE TRIGGER IF NOT EXISTS mensajes_fts_nuevo AFTER INSERT ON mensajes
+                                BEGIN
+                                    INSERT INTO mensajes_fts (rowid, mensaje, usuario)
+                                    VALUES (new.rowid, new.mensaje, new.usuario);
+                                END""")
+            if not indexado:
+                # Historial guardado antes de existir el índice
+                conexion.execute("INSERT INTO mensajes_fts (mensajes_fts) VALUES ('rebuild')")
+
+    def cargar(self, sala):
+        """Llena una sala recién dada de alta con sus mensajes más recientes"""
+        # En modo compartido, bajo el cerrojo de refresco: refrescar() no
+        # puede saltarse las filas de esta sala que se guarden entre la
+        # lectura y el final de la carga (las que ya lea esta consulta se
+        # descartan por id), y lo que añadiera antes ya está en la consulta
+        with self.cerrojo_refresco if self.compartido else contextlib.nullcontext():
+            filas = self.conexion().execute(
+                "SELECT id, usuario, mensaje FROM mensajes WHERE sala = ? ORDER BY id DESC LIMIT ?",
+                (sala.nombre, self.capacidad)).fetchall()
+            with sala.nuevos:
+                sala.recientes.clear()
+                for id, usuario, mensaje in reversed(filas):
+                    sala.anadir(id, usuario, mensaje)
+                sala.persistido = filas[0][0] if filas else 0
+                sala.cargada = True
+
+    def persistir(self):
+        """Hilo que guarda los mensajes por lotes: una transacción por lote"""
+        conexion = self.conexion()
+        cerrando = False
+        while not cerrando:
+            lote = [self.cola.get()]
+            while len(lote) < self.lote:
+                try:
+                    lote.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            if None in lote:
+                lote = [fila for fila in lote if fila is not None]
+                cerrando = True
+            if not lote:
+                continue
+
+            if self.compartido:
+                self.guardar_compartido(conexion, lote)
+            else:
+                self.guardar(conexion, lote)
+            self.huecos.release(len(lote))
+
+    def guardar(self, conexion, lote):
+        """Guarda un lote ya numerado; si SQLite falla se reintenta y al final se descarta"""
+        filas = [(sala.nombre, id, usuario, mensaje, fecha) for sala, id, usuario, mensaje, fecha in lote]
+        for intento in range(1, REINTENTOS + 1):
+            try:
+                with conexion:
+                    conexion.executemany(
+                        "INSERT INTO mensajes (sala, id, usuario, mensaje, fecha) VALUES (?, ?, ?, ?, ?)", filas)
+                break
+            except sqlite3.Error as e:
+                log.error("No se pudo guardar un lote de %d mensajes (intento %d de %d): %s",
+                          len(lote), intento, REINTENTOS, e)
+                if intento < REINTENTOS:
+                    time.sleep(0.1 * 2 ** intento)
+        else:
+            log.error("Se descartan %d mensajes que no se pudieron guardar en %s", len(lote), self.ruta)
+
+        # También si se descartan: quien lee no debe esperar filas que no van a llegar
+        with self.guardados:
+            for sala, id, *_ in lote:
+                sala.persistido = id
+            self.guardados.notify_all()
+
+    def guardar_compartido(self, conexion, lote):
+        """Numera y guarda un lote con el bloqueo de escritura de la base de datos"""
+        try:
+            with conexion:
+                conexion.execute("BEGIN IMMEDIATE")
+                siguientes = {}
+                filas = []
+                for sala, _, usuario, mensaje, fecha, _ in lote:
+                    if sala.nombre not in siguientes:
+                        siguientes[sala.nombre] = conexion.execute(
+                            "SELECT COALESCE(MAX(id), 0) FROM mensajes WHERE sala = ?",
+                            (sala.nombre,)).fetchone()[0]
+                    siguientes[sala.nombre] += 1
+                    filas.append((sala.nombre, siguientes[sala.nombre], usuario, mensaje, fecha))
+                conexion.executemany(
+                    "INSERT INTO mensajes (sala, id, usuario, mensaje, fecha) VALUES (?, ?, ?, ?, ?)", filas)
+        except sqlite3.Error as e:
+            for *_, futuro in lote:
+                futuro.set_exception(e)
+            return
+
+        for fila, (*_, futuro) in zip(filas, lote):
+            futuro.set_result(fila[1])
+        self.aviso.set()
+
+    def refrescar(self):
+        """Copia a las salas en memoria lo que otros procesos hayan guardado (modo compartido)"""
+        conexion = self.conexion()
+        version = conexion.execute("PRAGMA data_version").fetchone()[0]
+        if version == getattr(self.local, 'version', None):
+            return
+        self.local.version = version
+
+        with self.cerrojo_refresco:
+            while True:
+                filas = conexion.execute(
+                    "SELECT rowid, sala, id, usuario, mensaje FROM mensajes WHERE rowid > ? ORDER BY rowid LIMIT 5000",
+                    (self.ultima_fila,)).fetchall()
+                if not filas:
+                    return
+                self.ultima_fila = filas[-1][0]
+
+                for nombre, grupo in itertools.groupby(filas, key=lambda fila: fila[1]):
+                    sala = self.salas.get(nombre)
+                    if sala is None:
+                        continue  # Sala no cargada: se leerá de la base de datos al pedirla
+                    with sala.nuevos:
+                        for _, _, id, usuario, mensaje in grupo:
+                            if id > sala.ultimo_id:
+                                sala.anadir(id, usuario, mensaje)
+                                sala.persistido = id
+                        sala.nuevos.notify_all()
+
+    def vigilar(self):
+        """Hilo que despierta a los que esperan cuando otro proceso guarda mensajes"""
+        while not self.parado.is_set():
+            self.aviso.wait(self.sondeo)
+            self.aviso.clear()
+            try:
+                self.refrescar()
+            except sqlite3.Error:
+                pass
+
+    def cerrar(self):
+        """Guarda lo pendiente y detiene los hilos del almacén"""
+        if self.hilo is not None:
+            self.cola.put(None)
+            self.hilo.join()
+            self.hilo = None
+        if self.vigilante is not None:
+            self.parado.set()
+            self.vigilante.join()
+            self.vigilante = None
+
+    # ------------------------------------------------------------------
+    # Salas en memoria
+    # ------------------------------------------------------------------
+    def sala(self, nombre):
+        """Sala en memoria (se carga de la base de datos si no lo estaba)"""
+        with self.cerrojo:
+            ahora = time.monotonic()
+            if ahora - self.ultima_limpieza > min(self.inactividad, 60):
+                self.desalojar(ahora)
+            sala = self.salas.get(nombre)
+            if sala is None:
+                sala = self.salas[nombre] = Sala(nombre, self.capacidad)
+            sala.ultimo_uso = ahora
+        # La consulta a SQLite, ya sin el cerrojo global
+        if not sala.cargada:
+            with sala.carga:
+                if not sala.cargada:
+                    self.cargar(sala)
+        return sala
+
+    def fijar(self, nombre):
+        """Sala en memoria que no se desaloja hasta soltar(sala), para esperar en ella desde fuera"""
+        sala = self.sala(nombre)
+        with sala.nuevos:
+            sala.esperando += 1
+        return sala
+
+    def soltar(self, sala):
+        with sala.nuevos:
+            sala.esperando -= 1
+
+    def desalojar(self, ahora):
+        """Saca de memoria las salas inactivas sin esperas ni mensajes por guardar"""
+        self.ultima_limpieza = ahora
+        for nombre, sala in list(self.salas.items()):
+            if (ahora - sala.ultimo_uso > self.inactividad and not sala.esperando
+                    and sala.cargada and sala.persistido >= sala.ultimo_id):
+                del self.salas[nombre]
+
+    # ------------------------------------------------------------------
+    # Mensajes
+    # ------------------------------------------------------------------
+    def version(self, sala=SALA_GENERAL):
+        """
+        Último id guardado en la sala. Sirve de número de versión de su
+        historial: un mensaje no cambia una vez guardado y los ids no tienen
+        huecos.
+        """
+        if self.compartido:
+            self.refrescar()
+        return self.sala(sala).ultimo_id
+
+    def esperar(self, desde, espera, sala=SALA_GENERAL):
+        """Espera hasta 'espera' segundos a que la sala tenga mensajes posteriores a 'desde'; devuelve la versión"""
+        version = self.version(sala)
+        if espera and version <= desde:
+            sala = self.sala(sala)
+            with sala.nuevos:
+                sala.esperando += 1
+                try:
+                    sala.nuevos.wait_for(lambda: sala.ultimo_id > desde, timeout=espera)
+                finally:
+                    sala.esperando -= 1
+                version = sala.ultimo_id
+        return version
+
+    def agregar(self, usuario, mensaje, sala=SALA_GENERAL, espera=None):
+        """
+        Guarda un mensaje en una sala y devuelve su id; despierta a quien
+        espera en ella. Si la cola de SQLite está llena espera hueco hasta
+        'espera' segundos (None: sin límite) y, si no lo hay, lanza queue.Full.
+        """
+        sala = self.sala(sala)
+        if not self.huecos.acquire(timeout=espera):
+            raise queue.Full
+        if self.compartido:
+            futuro = Future()
+            self.cola.put((sala, None, usuario, mensaje, time.time(), futuro))
+            nuevo_id = futuro.result()
+            # Quien escribe ve su mensaje en la siguiente lectura de este proceso
+            self.refrescar()
+            return nuevo_id
+
+        with sala.nuevos:
+            nuevo_id = sala.ultimo_id + 1
+            sala.anadir(nuevo_id, usuario, mensaje)
+            self.cola.put((sala, nuevo_id, usuario, mensaje, time.time()))  # Hueco ya reservado: no espera
+            sala.nuevos.notify_all()
+        return nuevo_id
+
+    def desde(self, desde, espera=0, limite=1000, sala=SALA_GENERAL):
+        """
+        Hasta 'limite' mensajes de la sala con id mayor que 'desde', en orden.
+        Si no hay ninguno y se indica 'espera', bloquea hasta que llegue alguno
+        o pase ese tiempo.
+        """
+        self.esperar(desde, espera, sala)
+        sala = self.sala(sala)
+
+        resultado = []
+        while len(resultado) < limite:
+            with sala.nuevos:
+                primero = sala.recientes[0]['id'] if sala.recientes else sala.ultimo_id + 1
+                if desde + 1 >= primero:
+                    inicio = desde + 1 - primero
+                    resultado += itertools.islice(sala.recientes, inicio,
+                                                  inicio + limite - len(resultado))
+                    break
+
+            # Lo que ya no está en memoria se lee de la base de datos; mientras
+            # tanto el búfer puede haber avanzado, así que se vuelve a mirar
+            filas = self.historial(sala, desde, primero - 1, limite - len(resultado))
+            resultado += filas
+            desde = filas[-1]['id'] if filas else primero - 1
+        return resultado
+
+    def historial(self, sala, desde, hasta, limite):
+        """Mensajes de la sala con id en (desde, hasta] leídos de SQLite"""
+        # Un mensaje puede haber salido del búfer antes de que el hilo lo guarde
+        with self.guardados:
+            self.guardados.wait_for(lambda: sala.persistido >= hasta, timeout=5)
+        filas = self.conexion().execute(
+            "SELECT id, usuario, mensaje FROM mensajes WHERE sala = ? AND id > ? AND id <= ? "
+            "ORDER BY id LIMIT ?", (sala.nombre, desde, hasta, limite)).fetchall()
+        return [{'id': id, 'mensaje': mensaje, 'usuario': usuario} for id, usuario, mensaje in filas]
+
+    def buscar(self, texto, sala=None, antes=None, limite=50):
+        """
+        Mensajes que contienen todas las palabras de 'texto' (cada una como
+        prefijo) en el mensaje o en el usuario, del más reciente al más
+        antiguo. Devuelve (resultados, cursor): el cursor se pasa como
+        'antes' para pedir la página siguiente y es None en la última.
+        """
+        palabras = PALABRA.findall(texto)
+        if not palabras:
+            return [], None
+        # Cada palabra entre comillas (sin operadores de FTS5) y con * de prefijo
+        consulta = ' '.join('"' + palabra.replace('"', '""') + '"*' for palabra in palabras)
+
+        sql = ("SELECT f.rowid, m.sala, m.id, m.usuario, m.mensaje, m.fecha "
+               "FROM mensajes_fts f JOIN mensajes m ON m.rowid = f.rowid "
+               "WHERE mensajes_fts MATCH ?")
+        parametros = [consulta]
+        if sala is not None:
+            sql += " AND m.sala = ?"
+            parametros.append(sala)
+        if antes is not None:
+            sql += " AND f.rowid < ?"
+            parametros.append(antes)
+        # Paginación por cursor (rowid) en lugar de OFFSET: cada página cuesta lo mismo
+        sql += " ORDER BY f.rowid DESC LIMIT ?"
+        parametros.append(limite + 1)
+
+        filas = self.conexion().execute(sql, parametros).fetchall()
+        resultados = [{'sala': sala, 'id': id, 'usuario': usuario, 'mensaje': mensaje, 'fecha': fecha}
+                      for _, sala, id, usuario, mensaje, fecha in filas[:limite]]
+        cursor = filas[limite - 1][0] if len(filas) > limite else None
+        return resultados, cursor
@@ -0,0 +1,91 @@
+"""
+Benchmark de /buscar: llena una base de datos temporal con millones de
+mensajes (el trigger mantiene el índice FTS5 igual que en el servidor) y
+mide la latencia de varias búsquedas típicas y de paginar hasta la página 20.
+
+    python bench_busqueda.py --mensajes 2000000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from almacen_chat import AlmacenChat
+
+PALABRAS = ("hola adiós gracias mañana tarde noche clase examen práctica proyecto servidor "
+            "cliente hilo proceso memoria mensaje sala python flask base datos índice canción "
+            "película partido comida café reunión viaje tren coche casa trabajo equipo").split()
+SALAS = ['general'] + [f'sala{i}' for i in range(50)]
+
+def llenar(almacen, total, semilla=1):
+    """Inserta mensajes sintéticos en lotes grandes (dispara el trigger del índice)"""
+    aleatorio = random.Random(semilla)
+    conexion = almacen.conexion()
+    siguientes = dict.fromkeys(SALAS, 0)
+    for inicio in range(0, total, 50000):
+        filas = []
+        for _ in range(min(50000, total - inicio)):
+            sala = aleatorio.choice(SALAS)
+            siguientes[sala] += 1
+            texto = ' '.join(aleatorio.choices(PALABRAS, k=aleatorio.randint(3, 15)))
+            if aleatorio.random() < 0.0001:
+                texto += ' supercalifragilístico'
+            filas.append((sala, siguientes[sala], f'usuario{aleatorio.randint(1, 5000)}', texto, time.time()))
+        with conexion:
+            conexion.executemany(
+                "INSERT INTO mensajes (sala, id, usuario, mensaje, fecha) VALUES (?, ?, ?, ?, ?)", filas)
+
+def medir(almacen, texto, sala=None, repeticiones=20):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultados, _ = almacen.buscar(texto, sala)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'consulta': texto, 'sala': sala, 'resultados': len(resultados),
+            'ms_p50': round(statistics.median(tiempos), 2), 'ms_max': round(max(tiempos), 2)}
+
+def paginar(almacen, texto, paginas=20):
+    antes, tiempos = None, []
+    for _ in range(paginas):
+        inicio = time.perf_counter()
+        _, antes = almacen.buscar(texto, antes=antes)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {'consulta': texto, 'paginas': paginas, 'ms_por_pagina_max': round(max(tiempos), 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de búsqueda del chat')
+    parser.add_argument('--mensajes', type=int, default=2000000)
+    args = parser.parse_args()
+
+    ruta = os.path.join(tempfile.mkdtemp(prefix='chat_busqueda_'), 'chat.db')
+    almacen = AlmacenChat(ruta)
+    inicio = time.perf_counter()
+    llenar(almacen, args.mensajes)
+    carga = time.perf_counter() - inicio
+
+    resultado = {
+        'mensajes': args.mensajes,
+        'mensajes_por_segundo_con_indice': round(args.mensajes / carga),
+        'tamano_db_mb': round(sum(os.path.getsize(ruta + sufijo) for sufijo in ('', '-wal')
+                                  if os.path.exists(ruta + sufijo)) / 1024 / 1024),
+        'busquedas': [
+            medir(almacen, 'supercalifragilístico'),
+            medir(almacen, 'canción'),
+            medir(almacen, 'ca'),
+            medir(almacen, 'hola servidor'),
+            medir(almacen, 'proyecto', 'sala7'),
+            medir(almacen, 'usuario42'),
+            medir(almacen, 'inexistente')
+        ],
+        'paginacion': paginar(almacen, 'examen')
+    }
+    almacen.cerrar()
+    os.remove(ruta)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
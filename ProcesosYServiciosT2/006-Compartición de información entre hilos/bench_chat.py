@@ -0,0 +1,374 @@
+"""
+Banco de pruebas de carga del chat: cuántos clientes aguanta una instancia.
+
+Arranca el servidor del chat (ver carga_chat.arrancar) sobre una base de
+datos temporal y lanza desde un único proceso asyncio muchos clientes
+concurrentes con conexiones HTTP/1.1 persistentes escritas a mano (sin
+dependencias, para que el cliente gaste poca CPU):
+
+  - 'escritores' que llaman a /toma a un ritmo fijo (o tan rápido como
+    puedan con --ritmo 0),
+  - 'lectores' que siguen su sala con /dame según la estrategia elegida:
+
+        completo   /dame sin 'desde' cada --intervalo (los últimos LIMITE)
+        corto      /dame?desde=<último visto> cada --intervalo
+        etag       como corto, con If-None-Match (304 si no hay nada nuevo)
+        largo      /dame?desde=...&espera=<s> (long-polling, sin pausa)
+        ws         WebSocket /ws: el servidor envía cada mensaje (solo con
+                   --servidor async, 008-chat-websocket.py; usa aiohttp)
+
+Los lectores no decodifican el JSON: el ETag "desde-hasta" ya dice qué
+ids trae cada respuesta. Con él se mide también la latencia de entrega
+(desde que un escritor envía un mensaje hasta que cada lector de la sala
+lo recibe).
+
+Para cada estrategia informa de peticiones por segundo, percentiles de
+latencia, tamaño medio de respuesta y códigos por ruta, latencia de
+entrega, CPU del servidor y su memoria (RSS de gunicorn y sus workers,
+leída de /proc) a lo largo de la prueba. Las opciones de almacenamiento
+se cambian con --capacidad, --lote, --workers y --precarga, y el
+servidor con --servidor: 'flask' (007-chat.py con gunicorn) o 'async'
+(008-chat-websocket.py, un proceso con aiohttp).
+
+    python bench_chat.py --modo completo corto etag largo --lectores 200 --escritores 4
+    python bench_chat.py --modo largo --capacidad 100 --precarga 200000
+    python bench_chat.py --servidor async --modo largo ws --lectores 1000
+
+El cliente comparte la máquina con el servidor: con pocas CPU conviene
+mirar también la CPU del servidor, no solo las peticiones por segundo.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import Counter
+
+from almacen_chat import AlmacenChat
+from carga_chat import arrancar, parar, puerto_libre
+
+MODOS = ('completo', 'corto', 'etag', 'largo', 'ws')
+
+class ConexionHTTP:
+    """Conexión HTTP/1.1 persistente mínima: GET y lectura de la respuesta"""
+
+    def __init__(self, puerto):
+        self.puerto = puerto
+        self.lector = self.escritor = None
+
+    async def get(self, ruta, cabeceras=()):
+        """Devuelve (estado, cabeceras, cuerpo, bytes recibidos); reconecta si hace falta"""
+        if self.escritor is None:
+            self.lector, self.escritor = await asyncio.open_connection('127.0.0.1', self.puerto)
+
+        extra = ''.join(f"{nombre}: {valor}\r\n" for nombre, valor in cabeceras)
+        self.escritor.write(f"GET {ruta} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                            f"Accept-Encoding: gzip\r\n{extra}\r\n".encode('latin-1'))
+
+        linea = await self.lector.readline()
+        if not linea:
+            raise ConnectionError("El servidor cerró la conexión")
+        estado = int(linea.split()[1])
+        recibidos = len(linea)
+
+        respuesta = {}
+        while True:
+            linea = await self.lector.readline()
+            recibidos += len(linea)
+            if linea in (b'\r\n', b'\n', b''):
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            respuesta[nombre.strip().lower()] = valor.strip()
+
+        if 'content-length' in respuesta:
+            cuerpo = await self.lector.readexactly(int(respuesta['content-length']))
+        elif respuesta.get('transfer-encoding') == 'chunked':
+            cuerpo = await self.leer_trozos()
+        else:
+            cuerpo = b''
+        recibidos += len(cuerpo)
+
+        if respuesta.get('connection', '').lower() == 'close':
+            self.cerrar()
+        return estado, respuesta, cuerpo, recibidos
+
+    async def leer_trozos(self):
+        partes = []
+        while True:
+            tamano = int((await self.lector.readline()).split(b';')[0], 16)
+            partes.append(await self.lector.readexactly(tamano + 2))
+            if not tamano:
+                return b''.join(p[:-2] for p in partes)
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.lector = self.escritor = None
+
+def percentiles(valores, escala=1000):
+    """p50/p90/p99/máximo de una lista de segundos, en milisegundos"""
+    if not valores:
+        return None
+    valores = sorted(valores)
+    def p(q):
+        return round(valores[min(int(q * len(valores)), len(valores) - 1)] * escala, 2)
+    return {'p50': p(0.50), 'p90': p(0.90), 'p99': p(0.99), 'max': round(valores[-1] * escala, 2)}
+
+class Estadisticas:
+    """Latencias, bytes y códigos de estado de las peticiones a una ruta"""
+
+    def __init__(self):
+        self.peticiones = 0
+        self.latencias = []
+        self.bytes = 0
+        self.estados = Counter()
+        self.errores = 0
+
+    def registrar(self, segundos, estado, recibidos):
+        """Una respuesta (o un mensaje recibido por WebSocket, sin latencia: segundos=None)"""
+        self.peticiones += 1
+        if segundos is not None:
+            self.latencias.append(segundos)
+        self.bytes += recibidos
+        self.estados[estado] += 1
+
+    def resumen(self, duracion):
+        hechas = self.peticiones
+        return {
+            'peticiones': hechas,
+            'por_segundo': round(hechas / duracion, 1),
+            'latencia_ms': percentiles(self.latencias),
+            'bytes_medios': round(self.bytes / hechas) if hechas else 0,
+            'estados': dict(sorted(self.estados.items())),
+            'errores': self.errores
+        }
+
+def procesos(pid):
+    """El proceso 'pid' y todos sus descendientes (gunicorn y sus workers)"""
+    encontrados = [pid]
+    for actual in encontrados:
+        try:
+            with open(f"/proc/{actual}/task/{actual}/children") as f:
+                encontrados += [int(hijo) for hijo in f.read().split()]
+        except OSError:
+            pass
+    return encontrados
+
+def rss_y_cpu(pid):
+    """RSS total en bytes y segundos de CPU (usuario + sistema) del árbol de procesos"""
+    rss = cpu = 0
+    pagina, reloj = os.sysconf('SC_PAGE_SIZE'), os.sysconf('SC_CLK_TCK')
+    for actual in procesos(pid):
+        try:
+            with open(f"/proc/{actual}/statm") as f:
+                rss += int(f.read().split()[1]) * pagina
+            with open(f"/proc/{actual}/stat") as f:
+                campos = f.read().rsplit(')', 1)[1].split()
+            cpu += (int(campos[11]) + int(campos[12])) / reloj
+        except OSError:
+            pass  # Un worker que acaba de terminar
+    return rss, cpu
+
+async def escritor(puerto, indice, sala, args, fin, stats, enviados):
+    """Envía mensajes a su sala y anota cuándo salió cada id"""
+    conexion = ConexionHTTP(puerto)
+    periodo = 1 / args.ritmo if args.ritmo else 0
+    proximo = time.monotonic() + random.random() * periodo
+    n = 0
+    while time.monotonic() < fin:
+        if periodo:
+            await asyncio.sleep(max(0, proximo - time.monotonic()))
+            proximo += periodo
+        texto = urllib.parse.quote(f"mensaje {n} de e{indice} ".ljust(args.tamano, 'x'))
+        inicio = time.perf_counter()
+        try:
+            estado, _, cuerpo, recibidos = await conexion.get(
+                f"/toma?mensaje={texto}&usuario=e{indice}&sala={sala}")
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            stats.errores += 1
+            conexion.cerrar()
+            await asyncio.sleep(0.1)
+            continue
+        stats.registrar(time.perf_counter() - inicio, estado, recibidos)
+        if estado == 200:
+            enviados[sala, json.loads(cuerpo)['id']] = inicio
+        n += 1
+
+async def lector(puerto, sala, args, fin, stats, enviados, entregas):
+    """Sigue una sala con /dame según args.modo y mide la latencia de entrega"""
+    conexion = ConexionHTTP(puerto)
+    visto = None
+    anterior = etiqueta = None
+    # Los lectores de sondeo no empiezan todos a la vez
+    await asyncio.sleep(random.random() * args.intervalo)
+    while time.monotonic() < fin:
+        ruta = f"/dame?sala={sala}"
+        if args.modo != 'completo' and visto is not None:
+            ruta += f"&desde={visto}"
+        if args.modo == 'largo':
+            ruta += f"&espera={args.espera}"
+        cabeceras = ()
+        if args.modo in ('etag', 'completo') and ruta == anterior and etiqueta:
+            cabeceras = (('If-None-Match', etiqueta),)
+
+        inicio = time.perf_counter()
+        try:
+            estado, respuesta, _, recibidos = await conexion.get(ruta, cabeceras)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            stats.errores += 1
+            conexion.cerrar()
+            await asyncio.sleep(0.1)
+            continue
+        ahora = time.perf_counter()
+        stats.registrar(ahora - inicio, estado, recibidos)
+
+        anterior, etiqueta = ruta, respuesta.get('etag')
+        if estado in (200, 304) and etiqueta:
+            desde, hasta = map(int, etiqueta.strip('W/"').split('-'))
+            primero = desde if visto is None else max(desde, visto)
+            if visto is not None:
+                for id in range(primero + 1, hasta + 1):
+                    enviado = enviados.get((sala, id))
+                    if enviado is not None:
+                        entregas.append(ahora - enviado)
+            visto = hasta if visto is None else max(visto, hasta)
+
+        if args.modo != 'largo':
+            await asyncio.sleep(args.intervalo)
+
+async def lector_ws(puerto, sala, fin, stats, enviados, entregas):
+    """Sigue una sala por WebSocket: cada mensaje llega sin pedirlo"""
+    import aiohttp
+
+    async with aiohttp.ClientSession() as sesion:
+        while time.monotonic() < fin:
+            try:
+                async with sesion.ws_connect(f"http://127.0.0.1:{puerto}/ws?sala={sala}") as ws:
+                    async for recibido in ws:
+                        ahora = time.perf_counter()
+                        stats.registrar(None, 'mensaje', len(recibido.data))
+                        enviado = enviados.get((sala, json.loads(recibido.data)['id']))
+                        if enviado is not None:
+                            entregas.append(ahora - enviado)
+                    # Cerrado por el servidor (p. ej. 1013: cola de envío llena)
+                    stats.estados[f'cierre {ws.close_code}'] += 1
+            except (OSError, aiohttp.ClientError):
+                stats.errores += 1
+                await asyncio.sleep(0.1)
+
+async def escenario(proceso, puerto, args):
+    """Lanza los clientes durante args.segundos y recoge los resultados"""
+    salas = [f"sala{i}" for i in range(args.salas)]
+    enviados, entregas = {}, []
+    toma, dame = Estadisticas(), Estadisticas()
+    memoria = []
+
+    rss_inicial, cpu_inicial = rss_y_cpu(proceso.pid)
+    inicio = time.monotonic()
+    fin = inicio + args.segundos
+    tareas = [asyncio.create_task(escritor(puerto, i, salas[i % args.salas], args, fin, toma, enviados))
+              for i in range(args.escritores)]
+    if args.modo == 'ws':
+        tareas += [asyncio.create_task(lector_ws(puerto, salas[i % args.salas], fin, dame, enviados, entregas))
+                   for i in range(args.lectores)]
+    else:
+        tareas += [asyncio.create_task(lector(puerto, salas[i % args.salas], args, fin, dame, enviados, entregas))
+                   for i in range(args.lectores)]
+
+    while time.monotonic() < fin:
+        rss, _ = rss_y_cpu(proceso.pid)
+        memoria.append([round(time.monotonic() - inicio, 1), round(rss / 1024 / 1024, 1)])
+        await asyncio.sleep(args.muestreo)
+    rss_final, cpu_final = rss_y_cpu(proceso.pid)
+
+    # Los long-polling que siguen esperando no cuentan
+    for tarea in tareas:
+        tarea.cancel()
+    await asyncio.gather(*tareas, return_exceptions=True)
+
+    duracion = time.monotonic() - inicio
+    return {
+        'servidor': args.servidor,
+        'modo': args.modo,
+        'toma': toma.resumen(duracion),
+        'ws' if args.modo == 'ws' else 'dame': dame.resumen(duracion),
+        'entrega_ms': percentiles(entregas),
+        'cpu_servidor_s': round(cpu_final - cpu_inicial, 2),
+        'memoria_mb': {
+            'inicial': round(rss_inicial / 1024 / 1024, 1),
+            'maxima': max(m[1] for m in memoria) if memoria else None,
+            'final': round(rss_final / 1024 / 1024, 1),
+            'serie': memoria
+        }
+    }
+
+def precargar(ruta_db, mensajes, salas):
+    """Historial previo en la base de datos, repartido entre las salas"""
+    almacen = AlmacenChat(ruta_db, capacidad=100, lote=1024)
+    for i in range(mensajes):
+        almacen.agregar(f"p{i % 50}", f"mensaje de precarga {i}", f"sala{i % salas}")
+    almacen.cerrar()
+
+def medir(modo, args):
+    args = argparse.Namespace(**{**vars(args), 'modo': modo})
+    puerto = puerto_libre()
+    directorio = tempfile.mkdtemp(prefix='chat_bench_')
+    ruta_db = os.path.join(directorio, 'chat.db')
+    if args.precarga:
+        precargar(ruta_db, args.precarga, args.salas)
+
+    # Cada long-polling en espera ocupa un hilo de gunicorn
+    hilos = args.hilos or max(32, (args.lectores + args.escritores) // args.workers + 8)
+    orden = [sys.executable, '008-chat-websocket.py'] if args.servidor == 'async' else None
+    proceso = arrancar(args.workers, puerto, ruta_db, {
+        'CHAT_HILOS': str(hilos),
+        'CHAT_CAPACIDAD': str(args.capacidad),
+        'CHAT_LOTE': str(args.lote)
+    }, orden)
+    try:
+        return asyncio.run(escenario(proceso, puerto, args))
+    finally:
+        parar(proceso)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Banco de pruebas de carga del chat')
+    parser.add_argument('--modo', choices=MODOS, nargs='+', default=list(MODOS),
+                        help='Estrategias de lectura a comparar (una ejecución por cada una)')
+    parser.add_argument('--servidor', choices=('flask', 'async'), default='flask')
+    parser.add_argument('--escritores', type=int, default=4)
+    parser.add_argument('--lectores', type=int, default=100)
+    parser.add_argument('--salas', type=int, default=4)
+    parser.add_argument('--ritmo', type=float, default=5, help='Mensajes/s por escritor (0 = sin pausa)')
+    parser.add_argument('--tamano', type=int, default=64, help='Caracteres por mensaje')
+    parser.add_argument('--intervalo', type=float, default=1, help='Pausa entre sondeos (completo, corto, etag)')
+    parser.add_argument('--espera', type=float, default=25, help='Espera de cada long-polling')
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--muestreo', type=float, default=0.5, help='Cada cuánto se mide la memoria')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--hilos', type=int, default=0, help='Hilos por worker (0 = según los clientes)')
+    parser.add_argument('--capacidad', type=int, default=1000, help='Mensajes en memoria por sala')
+    parser.add_argument('--lote', type=int, default=256, help='Mensajes por escritura en SQLite')
+    parser.add_argument('--precarga', type=int, default=0, help='Mensajes en la base de datos antes de empezar')
+    args = parser.parse_args()
+    if 'ws' in args.modo and args.servidor != 'async':
+        parser.error("El modo 'ws' necesita --servidor async")
+
+    # Cada cliente es un descriptor de archivo
+    _, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (maximo, maximo))
+
+    configuracion = {k: v for k, v in vars(args).items() if k != 'modo'}
+    resultado = {'cpus': os.cpu_count(), 'configuracion': configuracion,
+                 'mediciones': [medir(modo, args) for modo in args.modo]}
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
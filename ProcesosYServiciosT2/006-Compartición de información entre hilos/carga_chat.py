@@ -0,0 +1,150 @@
+"""
+Prueba de carga del chat desplegado con gunicorn y N workers.
+
+Para cada número de workers arranca gunicorn sobre una base de datos
+temporal y lanza varios procesos cliente con conexiones persistentes que
+mezclan /toma y /dame?desde= durante unos segundos. Después comprueba la
+coherencia entre workers:
+
+  - cada mensaje recién enviado aparece al leer por otra conexión (que
+    puede atenderla otro worker),
+  - todas las conexiones ven el mismo historial, con ids 1..N sin huecos.
+
+    python carga_chat.py --workers 1 2 4 --clientes 8 --segundos 5
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def arrancar(workers, puerto, ruta_db, extra=None, orden=None):
+    """
+    Arranca gunicorn (u 'orden', p. ej. el servidor asíncrono); 'extra' son
+    variables de entorno adicionales (CHAT_HILOS...)
+    """
+    entorno = {**os.environ, 'CHAT_BIND': f'127.0.0.1:{puerto}',
+               'CHAT_WORKERS': str(workers), 'CHAT_DB': ruta_db, **(extra or {})}
+    proceso = subprocess.Popen(orden or [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                               cwd=DIRECTORIO, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 15
+    while time.monotonic() < limite:
+        try:
+            peticion(http.client.HTTPConnection('127.0.0.1', puerto), '/')
+            return proceso
+        except OSError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El servidor no arrancó a tiempo")
+
+def parar(proceso):
+    proceso.terminate()
+    proceso.wait(timeout=30)
+
+def peticion(conexion, ruta):
+    conexion.request('GET', ruta)
+    respuesta = conexion.getresponse()
+    cuerpo = respuesta.read()
+    return json.loads(cuerpo) if respuesta.headers.get_content_type() == 'application/json' else cuerpo
+
+def cliente(puerto, segundos, escrituras, indice):
+    """Bucle de un proceso cliente: devuelve (peticiones, errores)"""
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto)
+    hechas = errores = visto = 0
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        try:
+            if hechas % 100 < escrituras * 100:
+                texto = urllib.parse.quote(f'mensaje {hechas} del cliente {indice}')
+                peticion(conexion, f'/toma?mensaje={texto}&usuario=c{indice}')
+            else:
+                nuevos = peticion(conexion, f'/dame?desde={visto}')
+                if nuevos:
+                    visto = nuevos[-1]['id']
+        except (OSError, http.client.HTTPException, ValueError):
+            errores += 1
+            conexion.close()
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto)
+        hechas += 1
+    return hechas, errores
+
+def coherencia(puerto, pruebas=200):
+    """Lee cada mensaje recién escrito por una conexión nueva y compara historiales"""
+    escritura = http.client.HTTPConnection('127.0.0.1', puerto)
+    fallos = 0
+    for i in range(pruebas):
+        nuevo_id = peticion(escritura, f'/toma?mensaje=coherencia{i}&usuario=prueba')['id']
+        lectura = http.client.HTTPConnection('127.0.0.1', puerto)
+        leidos = peticion(lectura, f'/dame?desde={nuevo_id - 1}')
+        lectura.close()
+        if not leidos or leidos[0]['id'] != nuevo_id:
+            fallos += 1
+
+    historiales = []
+    for _ in range(4):
+        conexion = http.client.HTTPConnection('127.0.0.1', puerto)
+        ids, desde = [], 0
+        while True:
+            pagina = peticion(conexion, f'/dame?desde={desde}')
+            if not pagina:
+                break
+            ids += [m['id'] for m in pagina]
+            desde = ids[-1]
+        conexion.close()
+        historiales.append(ids)
+
+    return {
+        'lecturas_tras_escritura_fallidas': fallos,
+        'historiales_iguales': all(h == historiales[0] for h in historiales),
+        'ids_sin_huecos': historiales[0] == list(range(1, len(historiales[0]) + 1)),
+        'mensajes': len(historiales[0])
+    }
+
+def medir(workers, args):
+    puerto = puerto_libre()
+    directorio = tempfile.mkdtemp(prefix='chat_carga_')
+    proceso = arrancar(workers, puerto, os.path.join(directorio, 'chat.db'))
+    try:
+        with multiprocessing.Pool(args.clientes) as pool:
+            inicio = time.perf_counter()
+            resultados = pool.starmap(cliente, [(puerto, args.segundos, args.escrituras, i)
+                                                for i in range(args.clientes)])
+            duracion = time.perf_counter() - inicio
+        peticiones = sum(r[0] for r in resultados)
+        return {
+            'workers': workers,
+            'peticiones_por_segundo': round(peticiones / duracion, 1),
+            'errores': sum(r[1] for r in resultados),
+            'coherencia': coherencia(puerto)
+        }
+    finally:
+        parar(proceso)
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga del chat con varios workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clientes', type=int, default=8, help='Procesos cliente')
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--escrituras', type=float, default=0.2, help='Fracción de peticiones /toma')
+    args = parser.parse_args()
+
+    resultado = {'cpus': os.cpu_count(), 'mediciones': [medir(n, args) for n in args.workers]}
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
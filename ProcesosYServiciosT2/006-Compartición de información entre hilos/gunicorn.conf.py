@@ -0,0 +1,17 @@
+# Despliegue del chat con varios procesos:
+#
+#     gunicorn -c gunicorn.conf.py
+#     CHAT_WORKERS=8 gunicorn -c gunicorn.conf.py
+#
+# Cada worker es un proceso con su propio almacén en memoria; todos comparten
+# chat.db (CHAT_COMPARTIDO=1), así que /dame devuelve lo mismo sea cual sea
+# el worker que atiende la petición.
+import os
+
+wsgi_app = '007-chat:app'
+bind = os.environ.get('CHAT_BIND', '192.168.1.41:5000')
+workers = int(os.environ.get('CHAT_WORKERS', 4))
+# Hilos por worker: cada long-polling o SSE abierto ocupa uno mientras espera
+worker_class = 'gthread'
+threads = int(os.environ.get('CHAT_HILOS', 32))
+raw_env = ['CHAT_COMPARTIDO=1']
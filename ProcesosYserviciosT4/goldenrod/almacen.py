@@ -0,0 +1,498 @@
+"""
+Almacén segmentado de mensajes de Goldenrod.
+
+Los mensajes se guardan en segmentos de tamaño fijo dentro de un
+directorio; cada segmento se llama como su offset base (posición en bytes
+del primer registro dentro del log completo):
+
+    00000000000000000000.log   registros binarios
+    00000000000000000000.idx   índices del segmento (al sellarlo)
+    00000000000067108864.log   segmento activo
+
+Formato de cada registro:
+
+    +----------------+--------------+--------------+-----+---------+
+    | longitud (u32) | tiempo (f64) | len IP (u8)  | IP  | mensaje |
+    +----------------+--------------+--------------+-----+---------+
+
+Cada segmento mantiene un índice disperso por tiempo (una entrada cada
+'index_interval' bytes) y un índice de posiciones por IP de origen, de modo
+que las consultas saltan directamente a la zona del segmento que interesa
+(memoria mapeada con mmap) en lugar de recorrer todo el histórico.
+Un hilo de mantenimiento comprime con gzip los segmentos antiguos y aplica
+la retención configurada.
+"""
+
+import bisect
+import gzip
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+
+RECORD = struct.Struct('!IdB')
+
+def parse_records(data, start=0):
+    """Itera (posición, timestamp, ip, mensaje) de los registros completos de 'data'"""
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        length, timestamp, ip_length = RECORD.unpack_from(data, offset)
+        if offset + length > len(data):
+            break
+        ip_start = offset + RECORD.size
+        ip = data[ip_start:ip_start + ip_length].decode('ascii')
+        message = data[ip_start + ip_length:offset + length].decode('utf-8')
+        yield start + offset, timestamp, ip, message
+        offset += length
+
+def complete_prefix(data):
+    """Longitud de la parte de 'data' formada por registros completos"""
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        length = RECORD.unpack_from(data, offset)[0]
+        if offset + length > len(data):
+            break
+        offset += length
+    return offset
+
+class DecompressedCache:
+    """Segmentos comprimidos de un almacén cuyo contenido se mantiene en memoria"""
+
+    def __init__(self, size=2):
+        self.size = size
+        self.segments = deque()
+        self.lock = threading.Lock()
+
+    def add(self, segment):
+        """Anota un segmento recién descomprimido y libera el más antiguo"""
+        with self.lock:
+            if segment in self.segments:
+                return
+            self.segments.append(segment)
+            if len(self.segments) > self.size:
+                # Un lector que ya tenga el contenido conserva su referencia
+                self.segments.popleft().buffer = None
+
+class Segment:
+    """Un archivo de segmento con sus índices"""
+
+    def __init__(self, directory, base, cache):
+        self.base = base
+        self.path = os.path.join(directory, f"{base:020d}.log")
+        self.index_path = os.path.join(directory, f"{base:020d}.idx")
+        self.gz_path = self.path + '.gz'
+        self.size = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.ts_index = []      # [(timestamp, posición)] disperso
+        self.ts_keys = []       # timestamps del índice, para bisect
+        self.ip_index = {}      # ip -> array de posiciones
+        self.last_indexed = None
+        self.sealed = False
+        self.compressed = False
+        self.buffer = None      # mmap (sellado) o bytes (comprimido)
+        self.reader = None      # descriptor de lectura del segmento activo
+        self.readers = 0        # pread en curso sobre 'reader'
+        self.expired = False    # borrado por la retención
+        self.cache = cache
+        # Protege los cambios de archivo (sellado, compresión, retención)
+        # frente a los lectores que abren el segmento en ese momento
+        self.lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Escritura (sólo desde el hilo escritor)
+    # ------------------------------------------------------------------
+    def add_to_index(self, position, timestamp, ip, index_interval):
+        if self.first_ts is None:
+            self.first_ts = timestamp
+        self.last_ts = timestamp
+        if self.last_indexed is None or position - self.last_indexed >= index_interval:
+            self.ts_index.append((timestamp, position))
+            self.ts_keys.append(timestamp)
+            self.last_indexed = position
+        self.ip_index.setdefault(ip, array('Q')).append(position)
+
+    def save_index(self):
+        """Persiste los índices al sellar el segmento"""
+        data = {
+            'size': self.size,
+            'first_ts': self.first_ts,
+            'last_ts': self.last_ts,
+            'ts_index': self.ts_index,
+            'ip_index': {ip: positions.tolist() for ip, positions in self.ip_index.items()},
+            'compressed': self.compressed
+        }
+        temporal = self.index_path + '.tmp'
+        with open(temporal, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temporal, self.index_path)
+
+    def load_index(self):
+        with open(self.index_path) as f:
+            data = json.load(f)
+        self.size = data['size']
+        self.first_ts = data['first_ts']
+        self.last_ts = data['last_ts']
+        self.ts_index = [tuple(entry) for entry in data['ts_index']]
+        self.ts_keys = [ts for ts, _ in self.ts_index]
+        self.ip_index = {ip: array('Q', positions) for ip, positions in data['ip_index'].items()}
+        self.compressed = data.get('compressed', False) or not os.path.exists(self.path)
+        self.sealed = True
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def read(self, start, end):
+        """Bytes [start, end) del segmento (posiciones relativas)"""
+        with self.lock:
+            reader = None
+            if not self.sealed:
+                if self.reader is None:
+                    self.reader = open(self.path, 'rb')
+                reader = self.reader
+                self.readers += 1
+        if reader is not None:
+            try:
+                return os.pread(reader.fileno(), end - start, start)
+            finally:
+                self.release_reader()
+
+        buffer = self.buffer
+        if buffer is None:
+            buffer = self.load_buffer()
+        return buffer[start:end]
+
+    def release_reader(self):
+        """Fin de un pread; el último lector cierra el descriptor si se selló entretanto"""
+        with self.lock:
+            self.readers -= 1
+            if self.sealed and not self.readers and self.reader is not None:
+                self.reader.close()
+                self.reader = None
+
+    def load_buffer(self):
+        """Abre el segmento sellado (mmap) o lo descomprime, sin cruzarse con la compactación"""
+        with self.lock:
+            if self.buffer is not None:
+                return self.buffer
+            if self.expired:
+                return b''
+            if self.compressed:
+                with gzip.open(self.gz_path, 'rb') as f:
+                    self.buffer = f.read()
+                self.cache.add(self)
+            else:
+                with open(self.path, 'rb') as f:
+                    self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+            return self.buffer
+
+    def seal(self):
+        """Marca el segmento como sellado; a partir de aquí se lee con mmap"""
+        self.save_index()
+        with self.lock:
+            self.sealed = True
+            # Con un pread en curso, el descriptor lo cierra release_reader()
+            if self.reader is not None and not self.readers:
+                self.reader.close()
+                self.reader = None
+
+    def records(self, start, end):
+        """Itera (posición, timestamp, ip, mensaje) entre dos posiciones"""
+        return parse_records(self.read(start, end), start)
+
+    def record_at(self, position):
+        """Registro completo que empieza en 'position' (None si el segmento ya expiró)"""
+        header = self.read(position, position + RECORD.size)
+        if len(header) < RECORD.size:
+            return None
+        length = RECORD.unpack(header)[0]
+        for record in self.records(position, position + length):
+            return record
+
+    def position_for(self, timestamp):
+        """Posición desde la que empezar a buscar registros >= timestamp"""
+        i = bisect.bisect_left(self.ts_keys, timestamp)
+        return self.ts_index[i - 1][1] if i > 0 else 0
+
+class SegmentedStore:
+    """Log segmentado con índices por tiempo e IP y consultas por rango"""
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, index_interval=4096,
+                 compress_after=2, retention_segments=0):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+        self.compress_after = compress_after
+        self.retention_segments = retention_segments
+        self.lock = threading.RLock()
+        self.segments = []
+        self.active_file = None
+        self.maintenance = None
+        self.stopping = threading.Event()
+        # Avisa a los lectores que esperan datos nuevos (réplicas)
+        self.appended = threading.Condition()
+        self.decompressed = DecompressedCache()
+
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    # ------------------------------------------------------------------
+    # Arranque y recuperación
+    # ------------------------------------------------------------------
+    def load(self):
+        bases = sorted({int(name[:20]) for name in os.listdir(self.directory)
+                        if name[:20].isdigit() and not name.endswith('.tmp')})
+        for base in bases:
+            segment = Segment(self.directory, base, self.decompressed)
+            if os.path.exists(segment.index_path):
+                segment.load_index()
+            elif os.path.exists(segment.path):
+                self.recover(segment)
+            else:
+                continue
+            self.segments.append(segment)
+
+        if not self.segments or self.segments[-1].sealed:
+            self.roll()
+        else:
+            self.active_file = open(self.segments[-1].path, 'ab')
+
+    def recover(self, segment):
+        """Reconstruye los índices del segmento activo y descarta un registro a medias"""
+        size = os.path.getsize(segment.path)
+        valid = 0
+        for position, timestamp, ip, _ in segment.records(0, size):
+            segment.add_to_index(position, timestamp, ip, self.index_interval)
+            valid = position
+        if segment.first_ts is not None:
+            valid += RECORD.unpack(segment.read(valid, valid + RECORD.size))[0]
+        if valid < size:
+            with open(segment.path, 'r+b') as f:
+                f.truncate(valid)
+        segment.size = valid
+
+    def roll(self):
+        """Sella el segmento activo y abre uno nuevo"""
+        with self.lock:
+            base = 0
+            if self.segments:
+                active = self.segments[-1]
+                if self.active_file:
+                    self.active_file.close()
+                active.seal()
+                base = active.base + active.size
+            segment = Segment(self.directory, base, self.decompressed)
+            self.active_file = open(segment.path, 'ab')
+            self.segments.append(segment)
+
+    # ------------------------------------------------------------------
+    # Interfaz de destino del GroupCommitWriter
+    # ------------------------------------------------------------------
+    def write_batch(self, records):
+        """Añade (timestamp, ip, mensaje) en una sola escritura por segmento"""
+        chunks = []
+        entries = []
+        active = self.segments[-1]
+        position = active.size
+        for timestamp, ip, message in records:
+            ip_bytes = ip.encode('ascii')
+            body = message.encode('utf-8')
+            length = RECORD.size + len(ip_bytes) + len(body)
+
+            if position > 0 and position + length > self.segment_size:
+                self.flush_chunks(active, chunks, position, entries)
+                self.roll()
+                active = self.segments[-1]
+                position = 0
+                chunks = []
+                entries = []
+
+            chunks.append(RECORD.pack(length, timestamp, len(ip_bytes)) + ip_bytes + body)
+            entries.append((position, timestamp, ip))
+            position += length
+
+        self.flush_chunks(active, chunks, position, entries)
+
+    def flush_chunks(self, segment, chunks, size, entries):
+        if chunks:
+            self.active_file.write(b''.join(chunks))
+            self.active_file.flush()
+        # El tamaño visible para los lectores se publica después del flush, y
+        # los índices después del tamaño: nunca apuntan más allá de lo legible
+        segment.size = size
+        for position, timestamp, ip in entries:
+            segment.add_to_index(position, timestamp, ip, self.index_interval)
+        with self.appended:
+            self.appended.notify_all()
+
+    def sync(self):
+        if self.active_file:
+            os.fsync(self.active_file.fileno())
+
+    def close(self):
+        self.stopping.set()
+        if self.maintenance:
+            self.maintenance.join()
+        with self.lock:
+            if self.active_file:
+                self.active_file.close()
+                self.active_file = None
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    @property
+    def end_offset(self):
+        """Offset global tras el último registro escrito"""
+        active = self.segments[-1]
+        return active.base + active.size
+
+    def snapshot(self):
+        with self.lock:
+            return [(segment, segment.size) for segment in self.segments]
+
+    @property
+    def start_offset(self):
+        """Offset del registro más antiguo que se conserva"""
+        return self.segments[0].base
+
+    def wait_for(self, offset, timeout):
+        """Espera hasta que haya datos más allá de 'offset' o venza el tiempo"""
+        with self.appended:
+            return self.appended.wait_for(lambda: self.end_offset > offset, timeout)
+
+    def read_from(self, offset, max_bytes=1024 * 1024):
+        """
+        Bytes crudos de registros completos desde un offset global, sin cruzar
+        de segmento. Devuelve b'' si no hay nada nuevo. Base de la réplica.
+        """
+        if offset < self.start_offset or offset > self.end_offset:
+            raise ValueError(f"Offset {offset} fuera del almacén "
+                             f"[{self.start_offset}, {self.end_offset}]")
+
+        for segment, size in self.snapshot():
+            if segment.base <= offset < segment.base + size:
+                position = offset - segment.base
+                data = segment.read(position, min(size, position + max_bytes))
+                if not data:
+                    return b''
+                end = complete_prefix(data)
+                if end == 0:
+                    # Un registro mayor que max_bytes se envía entero
+                    length = RECORD.unpack(segment.read(position, position + RECORD.size))[0]
+                    return bytes(segment.read(position, position + length))
+                return bytes(data[:end])
+        return b''
+
+    def since(self, timestamp=0, ip=None, limit=None):
+        """Registros con tiempo >= timestamp, opcionalmente de una IP"""
+        results = []
+        for segment, size in self.snapshot():
+            if segment.last_ts is None or segment.last_ts < timestamp:
+                continue
+            # El índice puede haber crecido después de la instantánea
+            start = min(segment.position_for(timestamp), size)
+
+            if ip is None:
+                matches = segment.records(start, size)
+            else:
+                positions = segment.ip_index.get(ip, ())
+                first = bisect.bisect_left(positions, start)
+                matches = (segment.record_at(p) for p in positions[first:] if p < size)
+                matches = (record for record in matches if record is not None)
+
+            for _, ts, record_ip, message in matches:
+                if ts >= timestamp:
+                    results.append((ts, record_ip, message))
+                    if limit and len(results) >= limit:
+                        return results
+        return results
+
+    def last(self, count, ip=None):
+        """Los 'count' registros más recientes (en orden cronológico)"""
+        results = []
+        for segment, size in reversed(self.snapshot()):
+            missing = count - len(results)
+            if missing <= 0:
+                break
+            if ip is not None:
+                positions = [p for p in segment.ip_index.get(ip, ()) if p < size]
+                for position in reversed(positions[-missing:]):
+                    record = segment.record_at(position)
+                    if record is not None:
+                        results.append(record[1:])
+                continue
+
+            # Se recorre el índice disperso hacia atrás, tramo a tramo
+            end = size
+            for _, start in reversed(segment.ts_index):
+                if start >= end:
+                    continue
+                chunk = [(ts, record_ip, message)
+                         for _, ts, record_ip, message in segment.records(start, end)]
+                results.extend(reversed(chunk))
+                end = start
+                if len(results) >= count:
+                    break
+        return list(reversed(results[:count]))
+
+    # ------------------------------------------------------------------
+    # Mantenimiento en segundo plano
+    # ------------------------------------------------------------------
+    def start_maintenance(self, interval=60):
+        """Arranca el hilo que comprime y aplica la retención"""
+        if self.maintenance is None:
+            self.maintenance = threading.Thread(target=self.maintenance_loop, args=(interval,),
+                                                name='goldenrod-store', daemon=True)
+            self.maintenance.start()
+
+    def maintenance_loop(self, interval):
+        while not self.stopping.wait(interval):
+            try:
+                self.compact()
+            except OSError:
+                pass
+
+    def compact(self):
+        """Comprime los segmentos sellados antiguos y elimina los que exceden la retención"""
+        with self.lock:
+            sealed = self.segments[:-1]
+            candidates = [s for s in sealed[:max(0, len(sealed) - self.compress_after)]
+                          if not s.compressed]
+
+        for segment in candidates:
+            temporal = segment.gz_path + '.tmp'
+            with open(segment.path, 'rb') as src, gzip.open(temporal, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(temporal, segment.gz_path)
+            # Con el cerrojo del segmento ningún lector está abriendo el .log:
+            # los que ya lo tienen mapeado siguen leyendo el archivo borrado
+            with self.lock, segment.lock:
+                segment.compressed = True
+                segment.buffer = None
+                segment.save_index()
+                os.remove(segment.path)
+
+        if self.retention_segments:
+            with self.lock:
+                expired = self.segments[:max(0, len(self.segments) - self.retention_segments)]
+                self.segments = self.segments[len(expired):]
+            for segment in expired:
+                with segment.lock:
+                    segment.expired = True
+                    for path in (segment.path, segment.gz_path, segment.index_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+
+def parse_since(value):
+    """Acepta un timestamp epoch o una fecha 'YYYY-mm-dd HH:MM:SS'"""
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return float(value)
+    return time.mktime(time.strptime(value, '%Y-%m-%d %H:%M:%S'))
@@ -0,0 +1,110 @@
+"""
+Benchmark de clientes: SimpleTCPClient (un mensaje por ida y vuelta)
+frente a ClientPool.send_many() y AsyncGoldenrodClient.send().
+
+    python bench_cliente.py --mensajes 20000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_comun import arrancar_servidor, parar_servidor
+from cliente import SimpleTCPClient
+from cliente_pool import AsyncGoldenrodClient, ClientPool
+from histograma import Histogram
+
+def medir_simple(config, mensajes):
+    """Cliente original: cada mensaje espera a su respuesta"""
+    client = SimpleTCPClient()
+    client.config = {'server_host': config['host'], 'server_port': config['port']}
+    client.connect()
+    histogram = Histogram()
+    enviados = 0
+    inicio = time.perf_counter()
+    for i in range(mensajes):
+        t = time.perf_counter()
+        # send_message devuelve "" si el mensaje no llegó a confirmarse
+        if client.send_message(f"mensaje {i}"):
+            enviados += 1
+            histogram.record((time.perf_counter() - t) * 1_000_000)
+    duracion = time.perf_counter() - inicio
+    client.close()
+    return enviados, duracion, histogram
+
+def medir_pool(config, mensajes, hilos, lote):
+    """Varios hilos productores compartiendo un pool con envíos por lotes"""
+    histogram = Histogram()
+    with ClientPool(config['host'], config['port'], size=hilos, batch_size=lote) as pool:
+        def productor(n):
+            enviados = 0
+            for inicio_lote in range(0, n, lote):
+                t = time.perf_counter()
+                enviados += pool.send_many(f"mensaje {i}"
+                                           for i in range(inicio_lote, min(n, inicio_lote + lote)))
+                histogram.record((time.perf_counter() - t) * 1_000_000)
+            return enviados
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(hilos) as executor:
+            enviados = sum(executor.map(productor, repartir(mensajes, hilos)))
+        return enviados, time.perf_counter() - inicio, histogram
+
+async def medir_async(config, mensajes, concurrencia):
+    """Corrutinas concurrentes usando send() con agrupación automática"""
+    client = AsyncGoldenrodClient(config['host'], config['port'])
+    histogram = Histogram()
+
+    async def productor(n):
+        for i in range(n):
+            t = time.perf_counter()
+            await client.send(f"mensaje {i}")
+            histogram.record((time.perf_counter() - t) * 1_000_000)
+        return n
+
+    inicio = time.perf_counter()
+    enviados = sum(await asyncio.gather(*(productor(n) for n in repartir(mensajes, concurrencia))))
+    duracion = time.perf_counter() - inicio
+    await client.close()
+    return enviados, duracion, histogram
+
+def repartir(mensajes, partes):
+    """Reparte los mensajes entre productores sin perder el resto de la división"""
+    cociente, resto = divmod(mensajes, partes)
+    return [cociente + (i < resto) for i in range(partes)]
+
+def resumen(nombre, enviados, duracion, histogram, unidad):
+    """El throughput se calcula con los mensajes confirmados, no con los pedidos"""
+    return {
+        'cliente': nombre,
+        'mensajes': enviados,
+        'mensajes_por_segundo': round(enviados / duracion, 1),
+        f"latencia_{unidad}_ms": histogram.summary(scale=1000)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de clientes de Goldenrod')
+    parser.add_argument('--mensajes', type=int, default=20000)
+    parser.add_argument('--hilos', type=int, default=4, help='Hilos productores del pool')
+    parser.add_argument('--lote', type=int, default=1024, help='Mensajes por send_many()')
+    parser.add_argument('--concurrencia', type=int, default=256, help='Corrutinas del cliente asyncio')
+    args = parser.parse_args()
+
+    proceso, config, _ = arrancar_servidor('servidor_async.AsyncTCPServer', {"max_connections": 64})
+    try:
+        resultados = [
+            resumen('SimpleTCPClient', *medir_simple(config, args.mensajes), 'mensaje'),
+            resumen('ClientPool.send_many',
+                    *medir_pool(config, args.mensajes, args.hilos, args.lote), 'lote'),
+            resumen('AsyncGoldenrodClient.send',
+                    *asyncio.run(medir_async(config, args.mensajes, args.concurrencia)), 'mensaje'),
+        ]
+    finally:
+        parar_servidor(proceso)
+
+    print(json.dumps(resultados, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Utilidades compartidas por los benchmarks de Goldenrod"""
+
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def subir_limite_descriptores():
+    """Sube el límite de descriptores abiertos al máximo permitido"""
+    blando, duro = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (duro, duro))
+    return duro
+
+def puerto_libre():
+    """Devuelve un puerto TCP libre en localhost"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def rss_kb(pid):
+    """Memoria residente (VmRSS) de un proceso en KB"""
+    with open(f"/proc/{pid}/status") as f:
+        for linea in f:
+            if linea.startswith('VmRSS:'):
+                return int(linea.split()[1])
+    return 0
+
+def percentiles(muestras, puntos=(50, 90, 99, 99.9)):
+    """Percentiles simples (ms) de una lista de latencias en segundos"""
+    if not muestras:
+        return {}
+    ordenadas = sorted(muestras)
+    return {
+        f"p{p}": round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))] * 1000, 3)
+        for p in puntos
+    }
+
+def arrancar_servidor(clase, config, timeout=10):
+    """
+    Lanza 'modulo.Clase' en un subproceso con una configuración temporal.
+    Devuelve (proceso, config, directorio temporal).
+    """
+    directorio = tempfile.mkdtemp(prefix='goldenrod_bench_')
+    config = {
+        "host": "127.0.0.1",
+        "port": puerto_libre(),
+        "log_file": os.path.join(directorio, 'server.log'),
+        "message_file": os.path.join(directorio, 'messages.txt'),
+        "store_dir": os.path.join(directorio, 'store'),
+        **config
+    }
+    with open(os.path.join(directorio, 'server_config.json'), 'w') as f:
+        json.dump(config, f)
+    return reanudar_servidor(clase, directorio, timeout)
+
+def reanudar_servidor(clase, directorio, timeout=10):
+    """
+    Vuelve a lanzar un servidor con la configuración y los datos que dejó
+    arrancar_servidor() en 'directorio'. Devuelve lo mismo que aquélla.
+    """
+    ruta_config = os.path.join(directorio, 'server_config.json')
+    with open(ruta_config) as f:
+        config = json.load(f)
+
+    modulo, nombre = clase.rsplit('.', 1)
+    codigo = ("import resource; l = resource.getrlimit(resource.RLIMIT_NOFILE)[1]; "
+              "resource.setrlimit(resource.RLIMIT_NOFILE, (l, l)); "
+              f"from {modulo} import {nombre}; {nombre}({ruta_config!r}).start()")
+    proceso = subprocess.Popen([sys.executable, '-c', codigo], cwd=BASE_DIR,
+                               stdout=subprocess.DEVNULL)
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection((config['host'], config['port']), timeout=0.2).close()
+            return proceso, config, directorio
+        except OSError:
+            time.sleep(0.05)
+
+    proceso.kill()
+    raise RuntimeError(f"El servidor {clase} no arrancó en {timeout}s")
+
+def parar_servidor(proceso):
+    """Detiene el subproceso del servidor"""
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
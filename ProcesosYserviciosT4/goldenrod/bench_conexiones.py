@@ -0,0 +1,83 @@
+"""
+Benchmark de conexiones: memoria y latencia del servidor con muchas
+conexiones inactivas y un grupo de conexiones activas.
+
+    python bench_conexiones.py --engine asyncio --idle 10000 --active 1000
+    python bench_conexiones.py --engine threads --idle 2000 --active 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from bench_comun import (arrancar_servidor, parar_servidor, percentiles,
+                         rss_kb, subir_limite_descriptores)
+
+CLASES = {
+    'threads': 'servidor.TCPServer',
+    'asyncio': 'servidor_async.AsyncTCPServer'
+}
+
+async def abrir_conexiones(config, total, lote=500):
+    """Abre 'total' conexiones en lotes para no desbordar el backlog"""
+    conexiones = []
+    for inicio in range(0, total, lote):
+        conexiones += await asyncio.gather(*(
+            asyncio.open_connection(config['host'], config['port'])
+            for _ in range(min(lote, total - inicio))
+        ))
+    return conexiones
+
+async def cliente_activo(reader, writer, mensajes, latencias):
+    """Envía mensajes de uno en uno y mide el tiempo hasta la respuesta"""
+    for i in range(mensajes):
+        inicio = time.perf_counter()
+        writer.write(f"mensaje {i}".encode('utf-8'))
+        await writer.drain()
+        await reader.read(4096)
+        latencias.append(time.perf_counter() - inicio)
+
+async def ejecutar(args):
+    subir_limite_descriptores()
+    proceso, config, _ = arrancar_servidor(CLASES[args.engine], {
+        "max_connections": args.idle + args.active + 16,
+        "backlog": 4096
+    })
+    resultado = {'engine': args.engine, 'idle': args.idle, 'active': args.active}
+    try:
+        resultado['rss_inicial_kb'] = rss_kb(proceso.pid)
+
+        inactivas = await abrir_conexiones(config, args.idle)
+        await asyncio.sleep(1)
+        resultado['rss_idle_kb'] = rss_kb(proceso.pid)
+
+        activas = await abrir_conexiones(config, args.active)
+        latencias = []
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente_activo(r, w, args.mensajes, latencias) for r, w in activas))
+        duracion = time.perf_counter() - inicio
+
+        resultado['rss_final_kb'] = rss_kb(proceso.pid)
+        resultado['mensajes_por_segundo'] = round(len(latencias) / duracion, 1)
+        resultado['latencia_ms'] = percentiles(latencias)
+
+        for _, writer in inactivas + activas:
+            writer.close()
+    finally:
+        parar_servidor(proceso)
+
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de conexiones de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--idle', type=int, default=10000, help='Conexiones inactivas')
+    parser.add_argument('--active', type=int, default=1000, help='Conexiones activas')
+    parser.add_argument('--mensajes', type=int, default=20, help='Mensajes por conexión activa')
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(ejecutar(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark del comando export: sendfile (el kernel copia del archivo al
+socket) frente a un bucle read()/sendall() en el servidor, con un
+messages.txt de varios GB. Mide el caudal y el tiempo de CPU del proceso
+servidor durante la transferencia, y comprueba una reanudación a mitad.
+
+    python bench_exportacion.py --gb 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import time
+
+import protocolo
+from bench_comun import arrancar_servidor, parar_servidor
+from bench_protocolo import CLASES
+
+def crear_archivo(ruta, gb):
+    """messages.txt sintético de 'gb' GB"""
+    linea = f"{time.strftime('%Y-%m-%d %H:%M:%S')} | 127.0.0.1 | {'x' * 64}\n"
+    bloque = (linea * (1024 * 1024 // len(linea) + 1))[:1024 * 1024].encode('utf-8')
+    with open(ruta, 'wb') as f:
+        for _ in range(int(gb * 1024)):
+            f.write(bloque)
+
+def cpu_proceso(pid):
+    """Segundos de CPU (usuario + sistema) consumidos por un proceso"""
+    with open(f"/proc/{pid}/stat") as f:
+        campos = f.read().rsplit(')', 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+
+def exportar(config, offset=0, length=None, resumen=None):
+    """Pide un export de messages.txt y descarta (o resume con hash) los bytes"""
+    with socket.create_connection((config['host'], config['port'])) as s:
+        peticion = {'cmd': 'export', 'source': 'messages', 'offset': offset, 'length': length}
+        s.sendall(protocolo.encode_json(protocolo.COMMAND, peticion))
+        _, payload = protocolo.read_frame(s)
+        respuesta = protocolo.decode_json(payload)
+
+        buffer = bytearray(4 * 1024 * 1024)
+        view = memoryview(buffer)
+        faltan = respuesta['length']
+        while faltan > 0:
+            recibidos = s.recv_into(view[:min(faltan, len(buffer))])
+            if not recibidos:
+                raise ConnectionError(f"Export incompleto: faltan {faltan} bytes")
+            if resumen is not None:
+                resumen.update(view[:recibidos])
+            faltan -= recibidos
+    return respuesta['length']
+
+def medir(ruta, engine, sendfile):
+    proceso, config, _ = arrancar_servidor(CLASES[engine], {
+        "message_file": ruta,
+        "export_sendfile": sendfile
+    })
+    try:
+        cpu = cpu_proceso(proceso.pid)
+        inicio = time.perf_counter()
+        total = exportar(config)
+        duracion = time.perf_counter() - inicio
+        cpu = cpu_proceso(proceso.pid) - cpu
+
+        # Reanudación: dos mitades deben dar el mismo contenido que el archivo
+        muestra = 64 * 1024 * 1024
+        resumen = hashlib.sha256()
+        exportar(config, 0, muestra // 2, resumen)
+        exportar(config, muestra // 2, muestra - muestra // 2, resumen)
+        with open(ruta, 'rb') as f:
+            reanudacion_ok = resumen.digest() == hashlib.sha256(f.read(muestra)).digest()
+    finally:
+        parar_servidor(proceso)
+
+    return {
+        'bytes': total,
+        'duracion_s': round(duracion, 3),
+        'mb_por_segundo': round(total / duracion / 1024 / 1024, 1),
+        'cpu_servidor_s': round(cpu, 3),
+        'reanudacion_ok': reanudacion_ok
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de export de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--gb', type=float, default=2, help='Tamaño del messages.txt sintético')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='goldenrod_export_')
+    ruta = os.path.join(directorio, 'messages.txt')
+    crear_archivo(ruta, args.gb)
+    try:
+        resultado = {
+            'engine': args.engine,
+            'gb': args.gb,
+            'sendfile': medir(ruta, args.engine, True),
+            'read_sendall': medir(ruta, args.engine, False)
+        }
+    finally:
+        os.remove(ruta)
+
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark del protocolo: mensajes/segundo sobre loopback en modo de línea
+(una ida y vuelta por mensaje) frente a tramas en pipeline con ACKs en bloque.
+
+    python bench_protocolo.py --conexiones 16 --mensajes 20000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import protocolo
+from bench_comun import arrancar_servidor, parar_servidor
+
+CLASES = {
+    'threads': 'servidor.TCPServer',
+    'asyncio': 'servidor_async.AsyncTCPServer'
+}
+
+async def cliente_linea(config, mensajes, tamano):
+    reader, writer = await asyncio.open_connection(config['host'], config['port'])
+    message = b'x' * tamano
+    for _ in range(mensajes):
+        writer.write(message)
+        await writer.drain()
+        await reader.read(4096)
+    writer.close()
+
+async def cliente_tramas(config, mensajes, tamano, ventana):
+    reader, writer = await asyncio.open_connection(config['host'], config['port'])
+    frame = protocolo.encode_frame(protocolo.MSG, b'x' * tamano)
+    decoder = protocolo.FrameDecoder()
+    sent = acked = 0
+
+    while acked < mensajes:
+        # Se rellena la ventana con una sola escritura
+        pending = min(ventana - (sent - acked), mensajes - sent)
+        if pending > 0:
+            writer.write(frame * pending)
+            sent += pending
+            await writer.drain()
+
+        for frame_type, payload in decoder.feed(await reader.read(65536)):
+            if frame_type == protocolo.ACK:
+                acked = protocolo.decode_ack(payload)
+    writer.close()
+
+async def medir(modo, config, args):
+    por_conexion = args.mensajes // args.conexiones
+    if modo == 'linea':
+        clientes = [cliente_linea(config, por_conexion, args.tamano) for _ in range(args.conexiones)]
+    else:
+        clientes = [cliente_tramas(config, por_conexion, args.tamano, args.ventana)
+                    for _ in range(args.conexiones)]
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*clientes)
+    duracion = time.perf_counter() - inicio
+    return round(por_conexion * args.conexiones / duracion, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de protocolo de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--conexiones', type=int, default=16)
+    parser.add_argument('--mensajes', type=int, default=20000, help='Mensajes totales por modo')
+    parser.add_argument('--tamano', type=int, default=64, help='Bytes por mensaje')
+    parser.add_argument('--ventana', type=int, default=512, help='Mensajes en vuelo por conexión')
+    args = parser.parse_args()
+
+    resultado = {'engine': args.engine, 'conexiones': args.conexiones, 'tamano': args.tamano}
+    proceso, config, _ = arrancar_servidor(CLASES[args.engine], {"max_connections": args.conexiones + 16})
+    try:
+        for modo in ('linea', 'tramas'):
+            resultado[f"{modo}_mensajes_por_segundo"] = asyncio.run(medir(modo, config, args))
+    finally:
+        parar_servidor(proceso)
+
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == "__main__":
+    main()
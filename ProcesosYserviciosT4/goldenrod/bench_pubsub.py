@@ -0,0 +1,126 @@
+"""
+Benchmark de publicación/suscripción: N suscriptores en un topic y un
+publicador que envía M mensajes. Mide entregas/segundo y la latencia
+desde la publicación hasta la recepción (marca de tiempo en el mensaje).
+
+    python bench_pubsub.py --suscriptores 1000 --mensajes 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import protocolo
+from bench_comun import arrancar_servidor, parar_servidor, percentiles, subir_limite_descriptores
+
+CLASES = {
+    'threads': 'servidor.TCPServer',
+    'asyncio': 'servidor_async.AsyncTCPServer'
+}
+
+async def suscriptor(config, topic, mensajes, listo, latencias, timeout):
+    reader, writer = await asyncio.open_connection(config['host'], config['port'])
+    writer.write(protocolo.encode_json(protocolo.COMMAND, {'cmd': 'subscribe', 'topic': topic}))
+    await writer.drain()
+
+    decoder = protocolo.FrameDecoder()
+    recibidos = 0
+    suscrito = False
+    limite = time.monotonic() + timeout
+    try:
+        while recibidos < mensajes and time.monotonic() < limite:
+            try:
+                data = await asyncio.wait_for(reader.read(65536), limite - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if not data:
+                break
+            ahora = time.time()
+            for frame_type, payload in decoder.feed(data):
+                if frame_type == protocolo.RESPONSE and not suscrito:
+                    suscrito = True
+                    listo()
+                elif frame_type == protocolo.DELIVER:
+                    _, message = protocolo.decode_publish(payload)
+                    latencias.append(ahora - float(message.split('|', 1)[0]))
+                    recibidos += 1
+    finally:
+        writer.close()
+    return recibidos
+
+async def publicador(config, topic, mensajes, tamano, ventana):
+    reader, writer = await asyncio.open_connection(config['host'], config['port'])
+    decoder = protocolo.FrameDecoder()
+    relleno = 'x' * tamano
+    sent = acked = 0
+
+    while acked < mensajes:
+        pending = min(ventana - (sent - acked), mensajes - sent)
+        if pending > 0:
+            writer.write(b''.join(protocolo.encode_publish(topic, f"{time.time()}|{relleno}")
+                                  for _ in range(pending)))
+            sent += pending
+            await writer.drain()
+
+        for frame_type, payload in decoder.feed(await reader.read(65536)):
+            if frame_type == protocolo.ACK:
+                acked = protocolo.decode_ack(payload)
+    writer.close()
+
+async def medir(config, args):
+    suscritos = 0
+    todos = asyncio.Event()
+
+    def listo():
+        nonlocal suscritos
+        suscritos += 1
+        if suscritos == args.suscriptores:
+            todos.set()
+
+    latencias = []
+    tareas = [asyncio.create_task(suscriptor(config, 'bench', args.mensajes, listo, latencias, args.timeout))
+              for _ in range(args.suscriptores)]
+    await todos.wait()
+
+    inicio = time.perf_counter()
+    await publicador(config, 'bench', args.mensajes, args.tamano, args.ventana)
+    recibidos = await asyncio.gather(*tareas)
+    duracion = time.perf_counter() - inicio
+
+    entregas = sum(recibidos)
+    return {
+        'entregas': entregas,
+        'esperadas': args.suscriptores * args.mensajes,
+        'duracion_s': round(duracion, 3),
+        'entregas_por_segundo': round(entregas / duracion, 1),
+        'latencia_ms': percentiles(latencias)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de pub/sub de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--suscriptores', type=int, default=1000)
+    parser.add_argument('--mensajes', type=int, default=2000, help='Mensajes publicados')
+    parser.add_argument('--tamano', type=int, default=64, help='Bytes por mensaje')
+    parser.add_argument('--ventana', type=int, default=64, help='Publicaciones en vuelo')
+    parser.add_argument('--cola', type=int, default=10000, help='Cola máxima por suscriptor')
+    parser.add_argument('--timeout', type=float, default=60, help='Espera máxima de los suscriptores')
+    args = parser.parse_args()
+
+    subir_limite_descriptores()
+    resultado = {'engine': args.engine, 'suscriptores': args.suscriptores, 'mensajes': args.mensajes}
+    proceso, config, _ = arrancar_servidor(CLASES[args.engine], {
+        "max_connections": args.suscriptores + 16,
+        "backlog": args.suscriptores + 16,
+        "subscriber_queue": args.cola
+    })
+    try:
+        resultado.update(asyncio.run(medir(config, args)))
+    finally:
+        parar_servidor(proceso)
+
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == "__main__":
+    main()
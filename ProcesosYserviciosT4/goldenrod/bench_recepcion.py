@@ -0,0 +1,97 @@
+"""
+Benchmark de la ruta de recepción con tramas: lectura con recv() +
+FrameDecoder (copia de cada lectura y de cada contenido, ACK codificado en
+cada lote) frente a FrameReader (recv_into sobre un búfer reutilizable,
+contenido como memoryview y ACK sobre plantilla).
+
+Se mide solo la recepción, el troceado en tramas, el decode del texto y el
+ACK, sobre un socketpair, con tracemalloc para comparar la memoria
+asignada durante la prueba.
+
+    python bench_recepcion.py --mensajes 500000 --tamano 64
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+import tracemalloc
+
+import protocolo
+
+def emisor(sock, mensajes, tamano, lote=512):
+    frame = protocolo.encode_message('x' * tamano)
+    enviados = 0
+    while enviados < mensajes:
+        n = min(lote, mensajes - enviados)
+        sock.sendall(frame * n)
+        enviados += n
+    sock.shutdown(socket.SHUT_WR)
+
+def descartar_acks(sock):
+    while sock.recv(65536):
+        pass
+
+def recepcion_copias(conn):
+    decoder = protocolo.FrameDecoder()
+    acked = 0
+    data = conn.recv(65536)
+    while data:
+        for _, payload in decoder.feed(data):
+            payload.decode('utf-8')
+            acked += 1
+        conn.sendall(protocolo.encode_ack(acked))
+        data = conn.recv(65536)
+    return acked
+
+def recepcion_sin_copias(conn):
+    reader = protocolo.FrameReader()
+    ack = bytearray(protocolo.ACK_TEMPLATE)
+    acked = 0
+    while reader.recv(conn):
+        for _, payload in reader.frames():
+            str(payload, 'utf-8')
+            acked += 1
+        conn.sendall(protocolo.fill_ack(ack, acked))
+    return acked
+
+def medir(funcion, args):
+    servidor, cliente = socket.socketpair()
+    hilos = [threading.Thread(target=emisor, args=(cliente, args.mensajes, args.tamano)),
+             threading.Thread(target=descartar_acks, args=(cliente,))]
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    recibidos = funcion(servidor)
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    servidor.close()
+    for hilo in hilos:
+        hilo.join()
+    cliente.close()
+    return {
+        'mensajes': recibidos,
+        'mensajes_por_segundo': round(recibidos / duracion, 1),
+        'pico_memoria_kb': round(pico / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la ruta de recepción de Goldenrod')
+    parser.add_argument('--mensajes', type=int, default=500000)
+    parser.add_argument('--tamano', type=int, default=64, help='Bytes por mensaje')
+    args = parser.parse_args()
+
+    resultado = {
+        'copias': medir(recepcion_copias, args),
+        'sin_copias': medir(recepcion_sin_copias, args)
+    }
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de ingesta UDP frente a TCP sobre loopback.
+
+UDP: se envían N datagramas lo más rápido posible o a un ritmo fijo
+(uno o varios mensajes por datagrama) y se consulta el comando stats hasta
+que el contador de mensajes deja de crecer; se informa de lo ingerido, lo
+perdido y las pérdidas del kernel. TCP: los mismos N mensajes en modo de
+línea (una ida y vuelta por mensaje) y con tramas en pipeline.
+
+    python bench_udp.py --mensajes 200000 --por-datagrama 1
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+import protocolo
+from bench_comun import arrancar_servidor, parar_servidor, puerto_libre
+from bench_protocolo import CLASES, cliente_linea, cliente_tramas
+
+def estadisticas(config):
+    """Métricas del servidor mediante el comando stats"""
+    with socket.create_connection((config['host'], config['port'])) as s:
+        s.sendall(protocolo.encode_json(protocolo.COMMAND, {'cmd': 'stats'}))
+        decoder = protocolo.FrameDecoder()
+        while True:
+            for frame_type, payload in decoder.feed(s.recv(65536)):
+                if frame_type == protocolo.RESPONSE:
+                    return protocolo.decode_json(payload)['stats']
+
+def medir_udp(config, args):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    destino = (config['host'], config['udp_port'])
+    mensaje = 'x' * args.tamano
+    if args.por_datagrama > 1:
+        datagrama = protocolo.encode_message(mensaje) * args.por_datagrama
+    else:
+        datagrama = mensaje.encode('utf-8')
+    datagramas = args.mensajes // args.por_datagrama
+
+    base = estadisticas(config)['messages_total']
+    inicio = time.perf_counter()
+    for i in range(datagramas):
+        sock.sendto(datagrama, destino)
+        # Con --rate se espera cada 64 datagramas hasta su instante previsto
+        if args.rate and i % 64 == 63:
+            espera = inicio + (i + 1) * args.por_datagrama / args.rate - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+    envio = time.perf_counter() - inicio
+    sock.close()
+
+    # Se espera a que el servidor termine de vaciar la cola de recepción
+    ingeridos, ultimo_cambio = 0, time.perf_counter()
+    while time.perf_counter() - ultimo_cambio < 0.5:
+        stats = estadisticas(config)
+        total = stats['messages_total'] - base
+        if total != ingeridos:
+            ingeridos, ultimo_cambio = total, time.perf_counter()
+        if ingeridos >= datagramas * args.por_datagrama:
+            break
+        time.sleep(0.05)
+    duracion = ultimo_cambio - inicio
+
+    enviados = datagramas * args.por_datagrama
+    return {
+        'enviados': enviados,
+        'ingeridos': ingeridos,
+        'perdidos': enviados - ingeridos,
+        'datagramas_perdidos_kernel': stats['udp_kernel_drops'],
+        'envio_mensajes_por_segundo': round(enviados / envio, 1),
+        'mensajes_por_segundo': round(ingeridos / duracion, 1)
+    }
+
+def medir_tcp(modo, config, args):
+    inicio = time.perf_counter()
+    if modo == 'linea':
+        asyncio.run(cliente_linea(config, args.mensajes, args.tamano))
+    else:
+        asyncio.run(cliente_tramas(config, args.mensajes, args.tamano, 512))
+    return {'mensajes_por_segundo': round(args.mensajes / (time.perf_counter() - inicio), 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de ingesta UDP de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--mensajes', type=int, default=200000)
+    parser.add_argument('--tamano', type=int, default=64, help='Bytes por mensaje')
+    parser.add_argument('--por-datagrama', type=int, default=1, help='Mensajes (tramas MSG) por datagrama')
+    parser.add_argument('--rate', type=float, default=0, help='Mensajes/s UDP; 0 = sin límite')
+    parser.add_argument('--lote', type=int, default=256, help='Datagramas por despertar (udp_batch)')
+    args = parser.parse_args()
+
+    proceso, config, _ = arrancar_servidor(CLASES[args.engine], {
+        "udp_port": puerto_libre(),
+        "udp_batch": args.lote
+    })
+    try:
+        resultado = {
+            'engine': args.engine,
+            'tamano': args.tamano,
+            'udp': medir_udp(config, args),
+            'tcp_tramas': medir_tcp('tramas', config, args),
+            'tcp_linea': medir_tcp('linea', config, args)
+        }
+    finally:
+        parar_servidor(proceso)
+
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark del modo pre-fork: mensajes/segundo según el número de workers.
+
+    python bench_workers.py --workers 1 2 4 8 --conexiones 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from bench_comun import arrancar_servidor, parar_servidor
+from bench_protocolo import cliente_tramas
+
+async def medir(config, args):
+    por_conexion = args.mensajes // args.conexiones
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente_tramas(config, por_conexion, args.tamano, args.ventana)
+                           for _ in range(args.conexiones)))
+    return round(por_conexion * args.conexiones / (time.perf_counter() - inicio), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pre-fork de Goldenrod')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--engine', choices=('threads', 'asyncio'), default='asyncio')
+    parser.add_argument('--conexiones', type=int, default=64)
+    parser.add_argument('--mensajes', type=int, default=200000, help='Mensajes totales por medida')
+    parser.add_argument('--tamano', type=int, default=64, help='Bytes por mensaje')
+    parser.add_argument('--ventana', type=int, default=512, help='Mensajes en vuelo por conexión')
+    args = parser.parse_args()
+
+    resultados = []
+    for workers in sorted(set(args.workers)):
+        proceso, config, _ = arrancar_servidor('prefork.PreforkSupervisor', {
+            "workers": workers,
+            "engine": args.engine,
+            "max_connections": args.conexiones + 16
+        })
+        try:
+            # Margen para que todos los workers hayan hecho bind
+            time.sleep(0.5)
+            resultados.append({
+                'workers': workers,
+                'mensajes_por_segundo': asyncio.run(medir(config, args))
+            })
+        finally:
+            parar_servidor(proceso)
+
+    print(json.dumps({'cpus': os.cpu_count(), 'engine': args.engine, 'resultados': resultados}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,34 @@
+import argparse
+import asyncio
 import socket
 import json
+import logging
+import os
 import sys
+import time
+from collections import deque
+from datetime import datetime
+import protocolo
+from histograma import Histogram
+from rotacion import SharedRotatingHandler
 from colorama import Fore, Style, init
 
 # Inicializar colores para la terminal
 init(autoreset=True)
 
+log = logging.getLogger('goldenrod.cliente')
+
+def configure_logging(path='client.log'):
+    """
+    Errores del cliente en client.log, rotado al llegar a 1 MB (3 copias
+    comprimidas). Varios clientes pueden escribir a la vez: se coordinan con
+    un flock (ver SharedRotatingHandler)
+    """
+    handler = SharedRotatingHandler(path, 1024 * 1024, backups=3)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
 def load_config(config_path='client_config_sample.json'):
     """Carga la configuración del cliente"""
     try:
@@ -33,10 +56,11 @@ class SimpleTCPClient:
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.settimeout(5)  # Evita bloqueos en la conexión
             self.sock.connect((self.config['server_host'], self.config['server_port']))
-            print(f"{Fore.GREEN}✅ Conexión exitosa a {
-                  self.config['server_host']}:{self.config['server_port']}{Style.RESET_ALL}")
+            print(f"{Fore.GREEN}✅ Conexión exitosa a "
+                  f"{self.config['server_host']}:{self.config['server_port']}{Style.RESET_ALL}")
             return True
         except Exception as e:
+            log.error(f"Error de conexión: {str(e)}")
             print(f"{Fore.RED}❌ Error de conexión: {str(e)}{Style.RESET_ALL}")
             return False
 
@@ -47,9 +71,11 @@ class SimpleTCPClient:
             response = self.sock.recv(4096).decode('utf-8')  # Buffer grande para recibir datos completos
             return response
         except socket.timeout:
+            log.error("Tiempo de espera agotado al recibir la respuesta")
             print(f"{Fore.RED}⚠️ Tiempo de espera agotado al recibir la respuesta.{Style.RESET_ALL}")
             return ""
         except Exception as e:
+            log.error(f"Error en la comunicación: {str(e)}")
             print(f"{Fore.RED}⚠️ Error en la comunicación: {str(e)}{Style.RESET_ALL}")
             return ""
 
@@ -83,8 +109,364 @@ class SimpleTCPClient:
             self.sock.close()
             print(f"{Fore.YELLOW}🔌 Conexión cerrada{Style.RESET_ALL}")
 
+class FramedTCPClient(SimpleTCPClient):
+    """Cliente con tramas: envía mensajes en pipeline y espera ACKs acumulativos"""
+
+    def __init__(self):
+        super().__init__()
+        self.decoder = protocolo.FrameDecoder()
+        self.sent = 0
+        self.acked = 0
+
+        self.responses = []
+        self.deliveries = []
+
+    def read_acks(self):
+        """Lee del socket y actualiza el último ACK acumulativo recibido"""
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError("El servidor cerró la conexión")
+        for frame_type, payload in self.decoder.feed(data):
+            if frame_type == protocolo.ACK:
+                self.acked = protocolo.decode_ack(payload)
+            elif frame_type == protocolo.RESPONSE:
+                self.responses.append(protocolo.decode_json(payload))
+            elif frame_type == protocolo.DELIVER:
+                self.deliveries.append(protocolo.decode_publish(payload))
+            elif frame_type == protocolo.ERROR:
+                log.error(f"Error del servidor: {payload.decode('utf-8')}")
+                print(f"{Fore.RED}⚠️ Error del servidor: {payload.decode('utf-8')}{Style.RESET_ALL}")
+
+    def command(self, cmd, **params):
+        """Envía una trama COMMAND y devuelve la respuesta JSON"""
+        self.sock.sendall(protocolo.encode_json(protocolo.COMMAND, {'cmd': cmd, **params}))
+        while not self.responses:
+            self.read_acks()
+        return self.responses.pop(0)
+
+    def query(self, last=None, ip=None, since=None, limit=1000):
+        """Consulta el histórico: últimos N mensajes o desde una fecha, opcionalmente por IP"""
+        params = {'limit': limit}
+        if last is not None:
+            params['last'] = last
+        if ip is not None:
+            params['ip'] = ip
+        if since is not None:
+            params['since'] = since
+        return self.command('query', **params)
+
+    def export(self, path, source='store', offset=0, length=None):
+        """
+        Descarga el histórico ('store' o 'messages') a un archivo desde 'offset'.
+        Si el archivo ya existe se reanuda a partir de lo que ya contiene. El
+        servidor cierra la conexión al terminar el envío.
+        """
+        done = os.path.getsize(path) if os.path.exists(path) else 0
+        request = {'cmd': 'export', 'source': source, 'offset': offset + done}
+        if length is not None:
+            request['length'] = max(0, length - done)
+        self.sock.sendall(protocolo.encode_json(protocolo.COMMAND, request))
+
+        frame_type, payload = protocolo.read_frame(self.sock)
+        if frame_type != protocolo.RESPONSE:
+            raise ConnectionError(f"Respuesta inesperada del servidor: {frame_type}")
+        result = protocolo.decode_json(payload)
+        if not result['ok']:
+            return result
+
+        buffer = bytearray(1024 * 1024)
+        view = memoryview(buffer)
+        missing = result['length']
+        with open(path, 'ab') as f:
+            while missing > 0:
+                received = self.sock.recv_into(view[:min(missing, len(buffer))])
+                if not received:
+                    raise ConnectionError(f"Export interrumpido: faltan {missing} bytes (se puede reanudar)")
+                f.write(view[:received])
+                missing -= received
+        return result
+
+    def subscribe(self, topic):
+        """Se suscribe a un topic; las publicaciones llegan a self.deliveries"""
+        return self.command('subscribe', topic=topic)
+
+    def publish(self, topic, message):
+        """Publica un mensaje en un topic y espera su confirmación"""
+        self.sock.sendall(protocolo.encode_publish(topic, message))
+        self.sent += 1
+        while self.acked < self.sent:
+            self.read_acks()
+        return self.acked
+
+    def listen(self, topic):
+        """Muestra las publicaciones de un topic hasta Ctrl+C"""
+        result = self.subscribe(topic)
+        if not result['ok']:
+            print(f"{Fore.RED}❌ {result['error']}{Style.RESET_ALL}")
+            return
+        print(f"{Fore.CYAN}📡 Suscrito a '{topic}' (Ctrl+C para salir){Style.RESET_ALL}")
+        self.sock.settimeout(None)
+        try:
+            while True:
+                self.read_acks()
+                for topic, message in self.deliveries:
+                    print(f"[{topic}] {message}")
+                self.deliveries.clear()
+        except KeyboardInterrupt:
+            pass
+
+    def send_pipelined(self, messages, window=1024):
+        """Envía todos los mensajes sin esperar respuesta entre ellos"""
+        messages = list(messages)
+        for start in range(0, len(messages), window):
+            chunk = messages[start:start + window]
+            self.sock.sendall(b''.join(protocolo.encode_message(m) for m in chunk))
+            self.sent += len(chunk)
+            # Como mucho 'window' mensajes pendientes de confirmación
+            while self.sent - self.acked > window:
+                self.read_acks()
+
+        while self.acked < self.sent:
+            self.read_acks()
+        return self.acked
+
+    def send_message(self, message):
+        """Envía un mensaje como trama y espera su confirmación"""
+        try:
+            ack = self.send_pipelined([message])
+            return f"Confirmado (ack {ack})"
+        except socket.timeout:
+            log.error("Tiempo de espera agotado al recibir la respuesta")
+            print(f"{Fore.RED}⚠️ Tiempo de espera agotado al recibir la respuesta.{Style.RESET_ALL}")
+            return ""
+        except Exception as e:
+            log.error(f"Error en la comunicación: {str(e)}")
+            print(f"{Fore.RED}⚠️ Error en la comunicación: {str(e)}{Style.RESET_ALL}")
+            return ""
+
+class LoadGenerator:
+    """
+    Modo --bench: abre M conexiones asyncio con tramas y mide la latencia
+    de cada mensaje hasta su ACK acumulativo en un histograma HDR.
+
+    Con 'rate' > 0 el bucle es abierto: los envíos siguen un calendario
+    fijo, no esperan a las respuestas y la latencia se mide desde el
+    instante programado (sin omisión coordinada). Con rate = 0 el bucle es
+    cerrado: cada conexión envía tan rápido como permite su ventana de
+    mensajes sin confirmar, así que un servidor lento frena la carga.
+    """
+
+    def __init__(self, host, port, connections=10, messages=100000, size=64, rate=0, window=256):
+        if connections < 1 or messages < connections:
+            raise ValueError(f"Se necesita al menos un mensaje por conexión "
+                             f"({messages} mensajes, {connections} conexiones)")
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.messages = messages
+        self.size = size
+        self.rate = rate
+        self.window = window
+        self.histogram = Histogram()
+        self.bytes_sent = 0
+
+    async def run_connection(self, index, count):
+        """Envía 'count' mensajes por una conexión y registra sus latencias"""
+        loop = asyncio.get_running_loop()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        frame = protocolo.encode_frame(protocolo.MSG, b'x' * self.size)
+        pending = deque()
+        progress = asyncio.Event()
+        state = {'acked': 0}
+
+        async def receive_acks():
+            decoder = protocolo.FrameDecoder()
+            while state['acked'] < count:
+                data = await reader.read(65536)
+                if not data:
+                    raise ConnectionError("El servidor cerró la conexión")
+                now = loop.time()
+                for frame_type, payload in decoder.feed(data):
+                    if frame_type != protocolo.ACK:
+                        continue
+                    ack = protocolo.decode_ack(payload)
+                    for _ in range(ack - state['acked']):
+                        self.histogram.record((now - pending.popleft()) * 1_000_000)
+                    state['acked'] = ack
+                progress.set()
+
+        receiver = asyncio.create_task(receive_acks())
+        sent = 0
+        if self.rate:
+            interval = self.connections / self.rate
+            start = loop.time() + index * interval / self.connections
+            while sent < count:
+                scheduled = start + sent * interval
+                delay = scheduled - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                pending.append(scheduled)
+                writer.write(frame)
+                sent += 1
+        else:
+            while sent < count:
+                batch = min(self.window - (sent - state['acked']), count - sent)
+                if batch <= 0:
+                    progress.clear()
+                    await progress.wait()
+                    continue
+                now = loop.time()
+                pending.extend([now] * batch)
+                writer.write(frame * batch)
+                sent += batch
+                await writer.drain()
+
+        await receiver
+        self.bytes_sent += sent * len(frame)
+        writer.close()
+
+    async def run(self):
+        # El resto de la división se reparte entre las primeras conexiones
+        per_connection, remainder = divmod(self.messages, self.connections)
+        start = time.perf_counter()
+        await asyncio.gather(*(self.run_connection(i, per_connection + (i < remainder))
+                               for i in range(self.connections)))
+        duration = time.perf_counter() - start
+        total = self.messages
+
+        return {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'servidor': f"{self.host}:{self.port}",
+            'conexiones': self.connections,
+            'mensajes': total,
+            'tamano': self.size,
+            'rate': self.rate or 'cerrado',
+            'duracion_s': round(duration, 3),
+            'mensajes_por_segundo': round(total / duration, 1),
+            'mb_por_segundo': round(self.bytes_sent / duration / 1_000_000, 3),
+            'latencia_ms': self.histogram.summary(scale=1000)
+        }
+
+def run_bench(args):
+    """Ejecuta el benchmark, lo muestra, lo guarda y lo compara con uno anterior"""
+    config = load_config()
+    try:
+        generator = LoadGenerator(
+            args.host or config['server_host'], args.port or config['server_port'],
+            connections=args.conexiones, messages=args.mensajes, size=args.tamano,
+            rate=args.rate, window=args.ventana
+        )
+    except ValueError as e:
+        print(f"{Fore.RED}Error en los parámetros del bench: {str(e)}{Style.RESET_ALL}")
+        sys.exit(1)
+    result = asyncio.run(generator.run())
+
+    latency = result['latencia_ms']
+    print(f"{Fore.CYAN}📊 {result['mensajes']} mensajes en {result['duracion_s']}s "
+          f"con {result['conexiones']} conexiones{Style.RESET_ALL}")
+    print(f"   Throughput: {result['mensajes_por_segundo']} msg/s ({result['mb_por_segundo']} MB/s)")
+    print(f"   Latencia (ms): p50={latency['p50']} p90={latency['p90']} "
+          f"p99={latency['p99']} p99.9={latency['p99.9']} max={latency['max']}")
+
+    output = args.salida or f"bench_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"{Fore.GREEN}💾 Resultado guardado en {output}{Style.RESET_ALL}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            previous = json.load(f)
+        for label, now, before in (
+            ('msg/s', result['mensajes_por_segundo'], previous['mensajes_por_segundo']),
+            ('p99 ms', latency['p99'], previous['latencia_ms']['p99'])
+        ):
+            change = (now - before) / before * 100 if before else 0
+            print(f"   {label}: {before} -> {now} ({change:+.1f}%)")
+
 if __name__ == "__main__":
-    client = SimpleTCPClient()
+    parser = argparse.ArgumentParser(description='Cliente TCP de Goldenrod')
+    parser.add_argument('--framed', action='store_true',
+                        help='Usar el protocolo con tramas en lugar del modo de línea')
+    parser.add_argument('--ultimos', type=int, metavar='N',
+                        help='Consultar los últimos N mensajes del histórico')
+    parser.add_argument('--desde', metavar='"YYYY-mm-dd HH:MM:SS"',
+                        help='Consultar los mensajes desde una fecha')
+    parser.add_argument('--ip', help='Filtrar la consulta por IP de origen')
+    parser.add_argument('--suscribir', metavar='TOPIC',
+                        help='Suscribirse a un topic y mostrar sus publicaciones')
+    parser.add_argument('--publicar', nargs=2, metavar=('TOPIC', 'MENSAJE'),
+                        help='Publicar un mensaje en un topic')
+    parser.add_argument('--exportar', metavar='ARCHIVO',
+                        help='Descargar el histórico a un archivo (reanuda si ya existe)')
+    parser.add_argument('--origen', choices=('store', 'messages'), default='store',
+                        help='Qué exportar: el almacén segmentado o messages.txt')
+    parser.add_argument('--offset', type=int, default=0, help='Offset inicial del export')
+    parser.add_argument('--stats', action='store_true',
+                        help='Mostrar las métricas del servidor')
+    parser.add_argument('--bench', action='store_true',
+                        help='Modo de generación de carga y medida de latencia')
+    parser.add_argument('--host', help='Servidor (por defecto, el del archivo de configuración)')
+    parser.add_argument('--port', type=int, help='Puerto (por defecto, el del archivo de configuración)')
+    parser.add_argument('--conexiones', type=int, default=10, help='Conexiones concurrentes (bench)')
+    parser.add_argument('--mensajes', type=int, default=100000, help='Mensajes totales (bench)')
+    parser.add_argument('--tamano', type=int, default=64, help='Bytes por mensaje (bench)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Mensajes/s totales a ritmo fijo (bucle abierto); '
+                             '0 = bucle cerrado por ventana (bench)')
+    parser.add_argument('--ventana', type=int, default=256,
+                        help='Mensajes sin confirmar por conexión en bucle cerrado (bench)')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (bench)')
+    parser.add_argument('--comparar', help='JSON de un benchmark anterior para comparar (bench)')
+    args = parser.parse_args()
+    configure_logging()
+
+    if args.bench:
+        run_bench(args)
+        sys.exit(0)
+
+    if args.ultimos is not None or args.desde or args.ip:
+        client = FramedTCPClient()
+        if client.connect():
+            result = client.query(last=args.ultimos, ip=args.ip, since=args.desde)
+            if result['ok']:
+                for m in result['messages']:
+                    print(f"{m['timestamp']} | {m['ip']} | {m['message']}")
+            else:
+                print(f"{Fore.RED}❌ {result['error']}{Style.RESET_ALL}")
+        client.close()
+        sys.exit(0)
+
+    if args.exportar:
+        client = FramedTCPClient()
+        if client.connect():
+            client.sock.settimeout(None)
+            result = client.export(args.exportar, source=args.origen, offset=args.offset)
+            if result['ok']:
+                print(f"{Fore.GREEN}💾 {result['length']} bytes exportados a {args.exportar}{Style.RESET_ALL}")
+            else:
+                print(f"{Fore.RED}❌ {result['error']}{Style.RESET_ALL}")
+        client.close()
+        sys.exit(0)
+
+    if args.stats:
+        client = FramedTCPClient()
+        if client.connect():
+            result = client.command('stats')
+            print(json.dumps(result.get('stats', result), indent=2, ensure_ascii=False))
+        client.close()
+        sys.exit(0)
+
+    if args.suscribir or args.publicar:
+        client = FramedTCPClient()
+        if client.connect():
+            if args.suscribir:
+                client.listen(args.suscribir)
+            else:
+                client.publish(*args.publicar)
+        client.close()
+        sys.exit(0)
+
+    client = FramedTCPClient() if args.framed else SimpleTCPClient()
     if client.connect():
         client.interactive_session()
     client.close()
@@ -0,0 +1,307 @@
+"""
+Biblioteca cliente de Goldenrod para productores.
+
+    from cliente_pool import ClientPool
+    with ClientPool('localhost', 808, size=4) as pool:
+        pool.send_many(f"evento {i}" for i in range(10000))
+
+    from cliente_pool import AsyncGoldenrodClient
+    client = AsyncGoldenrodClient('localhost', 808)
+    await client.send("hola")          # espera al ACK
+    await client.send_many(mensajes)
+
+Usa el protocolo con tramas: los mensajes se agrupan en el menor número
+posible de escrituras y se confirman con ACKs acumulativos. Si la conexión
+se pierde se reconecta con espera exponencial y se reenvían los mensajes
+no confirmados (entrega al menos una vez). Un timeout esperando el ACK o
+una trama ERROR del servidor no se reintentan: se devuelven al llamante.
+"""
+
+import asyncio
+import logging
+import queue
+import random
+import socket
+import time
+from collections import deque
+
+import protocolo
+
+logger = logging.getLogger('goldenrod.cliente')
+
+class ServerError(Exception):
+    """El servidor rechazó los mensajes con una trama ERROR (no habrá ACK)"""
+
+class Backoff:
+    """Esperas exponenciales con jitter entre reintentos"""
+
+    def __init__(self, initial=0.1, maximum=10.0, retries=8):
+        self.initial = initial
+        self.maximum = maximum
+        self.retries = retries
+
+    def delays(self):
+        delay = self.initial
+        for _ in range(self.retries):
+            yield delay * random.uniform(0.5, 1.5)
+            delay = min(delay * 2, self.maximum)
+
+class PooledConnection:
+    """Conexión bloqueante con tramas, reconexión y reenvío de lo no confirmado"""
+
+    # Reconexiones con reenvío por llamada a send_frames antes de rendirse
+    MAX_RESENDS = 3
+
+    def __init__(self, host, port, timeout=5, backoff=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.backoff = backoff or Backoff()
+        self.sock = None
+        self.decoder = None
+        self.acked = 0
+
+    def connect(self):
+        """Conecta reintentando con espera exponencial"""
+        last_error = None
+        for delay in [0, *self.backoff.delays()]:
+            time.sleep(delay)
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.decoder = protocolo.FrameDecoder()
+                self.acked = 0
+                return
+            except OSError as e:
+                last_error = e
+                logger.warning(f"Error de conexión con {self.host}:{self.port}: {e}")
+        raise ConnectionError(f"No se pudo conectar a {self.host}:{self.port}: {last_error}")
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def wait_acks(self, target):
+        """Lee ACKs hasta que el acumulado alcance 'target'"""
+        while self.acked < target:
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("El servidor cerró la conexión")
+            for frame_type, payload in self.decoder.feed(data):
+                if frame_type == protocolo.ACK:
+                    self.acked = protocolo.decode_ack(payload)
+                elif frame_type == protocolo.ERROR:
+                    raise ServerError(f"Error del servidor: {payload.decode('utf-8')}")
+
+    def send_frames(self, frames):
+        """Envía una lista de tramas en una escritura y espera su confirmación"""
+        pending = list(frames)
+        resends = 0
+        while pending:
+            if self.sock is None:
+                self.connect()
+            base = self.acked
+            try:
+                self.sock.sendall(b''.join(pending))
+                self.wait_acks(base + len(pending))
+                return
+            except (socket.timeout, ServerError):
+                # El servidor puede haber guardado lo enviado: reenviarlo lo
+                # duplicaría. La conexión se descarta porque el ACK acumulado
+                # ya no corresponde a las tramas enviadas
+                self.close()
+                raise
+            except OSError as e:
+                pending = pending[self.acked - base:]
+                self.close()
+                resends += 1
+                if resends > self.MAX_RESENDS:
+                    raise ConnectionError(f"Conexión perdida {resends} veces con {len(pending)} "
+                                          f"mensajes sin confirmar: {e}") from e
+                # Se reenvían sólo las tramas que el servidor no llegó a confirmar
+                logger.warning(f"Conexión perdida ({e}), reenviando {len(pending)} mensajes")
+
+class ClientPool:
+    """Pool de conexiones bloqueantes reutilizables y seguro entre hilos"""
+
+    def __init__(self, host, port, size=4, timeout=5, backoff=None, batch_size=1024):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.idle = queue.LifoQueue()
+        self.slots = queue.Queue()
+        for _ in range(size):
+            self.slots.put(None)
+
+    def acquire(self):
+        """Toma una conexión libre (las crea bajo demanda hasta 'size')"""
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        self.slots.get()
+        return PooledConnection(self.host, self.port, self.timeout, self.backoff)
+
+    def release(self, connection):
+        self.idle.put(connection)
+
+    def send(self, message):
+        """Envía un mensaje y espera su confirmación"""
+        return self.send_many([message])
+
+    def send_many(self, messages):
+        """Envía mensajes en lotes de 'batch_size' tramas por escritura"""
+        connection = self.acquire()
+        total = 0
+        try:
+            batch = []
+            for message in messages:
+                batch.append(protocolo.encode_message(message))
+                if len(batch) >= self.batch_size:
+                    connection.send_frames(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                connection.send_frames(batch)
+                total += len(batch)
+        finally:
+            self.release(connection)
+        return total
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class AsyncGoldenrodClient:
+    """
+    Cliente asyncio: send() devuelve cuando el servidor confirma el mensaje.
+    Los mensajes enviados desde varias corrutinas en la misma vuelta del
+    bucle se agrupan en una sola escritura.
+    """
+
+    def __init__(self, host, port, backoff=None, max_in_flight=4096):
+        self.host = host
+        self.port = port
+        self.backoff = backoff or Backoff()
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.reader = None
+        self.writer = None
+        self.outbox = []        # tramas pendientes de escribir
+        self.unacked = deque()  # (trama, futuro) escritas y sin confirmar
+        self.acked = 0
+        self.flush_scheduled = False
+        self.receiver = None
+        self.connecting = None
+
+    async def connect(self):
+        """Conecta reintentando con espera exponencial y reenvía lo no confirmado"""
+        last_error = None
+        for delay in [0, *self.backoff.delays()]:
+            await asyncio.sleep(delay)
+            try:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                break
+            except OSError as e:
+                last_error = e
+                logger.warning(f"Error de conexión con {self.host}:{self.port}: {e}")
+        else:
+            error = ConnectionError(f"No se pudo conectar a {self.host}:{self.port}: {last_error}")
+            self.fail_pending(error)
+            raise error
+
+        self.acked = 0
+        self.receiver = asyncio.create_task(self.receive_acks())
+        if self.unacked:
+            self.writer.write(b''.join(frame for frame, _ in self.unacked))
+        self.flush()
+
+    async def ensure_connected(self):
+        if self.writer is None:
+            if self.connecting is None:
+                self.connecting = asyncio.ensure_future(self.connect())
+            try:
+                await asyncio.shield(self.connecting)
+            finally:
+                self.connecting = None
+
+    async def receive_acks(self):
+        decoder = protocolo.FrameDecoder()
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    raise ConnectionError("El servidor cerró la conexión")
+                for frame_type, payload in decoder.feed(data):
+                    if frame_type == protocolo.ACK:
+                        ack = protocolo.decode_ack(payload)
+                        for _ in range(ack - self.acked):
+                            _, future = self.unacked.popleft()
+                            if not future.done():
+                                future.set_result(True)
+                        self.acked = ack
+                    elif frame_type == protocolo.ERROR:
+                        raise ServerError(f"Error del servidor: {payload.decode('utf-8')}")
+        except ServerError as e:
+            # Lo rechazado no tendrá ACK: se falla lo pendiente sin reenviarlo
+            logger.error(str(e))
+            self.writer.close()
+            self.writer = None
+            self.fail_pending(e)
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Conexión perdida ({e}), reconectando")
+            self.writer.close()
+            self.writer = None
+            if self.unacked:
+                await self.ensure_connected()
+
+    def fail_pending(self, error):
+        """Resuelve con 'error' los futuros de los mensajes sin confirmar"""
+        for _, future in [*self.unacked, *self.outbox]:
+            if not future.done():
+                future.set_exception(error)
+        self.unacked.clear()
+        self.outbox = []
+
+    def flush(self):
+        """Escribe de una vez todas las tramas acumuladas"""
+        self.flush_scheduled = False
+        if self.outbox and self.writer is not None:
+            self.writer.write(b''.join(frame for frame, _ in self.outbox))
+            self.unacked.extend(self.outbox)
+            self.outbox = []
+
+    async def send(self, message):
+        """Envía un mensaje y espera su ACK"""
+        async with self.in_flight:
+            await self.ensure_connected()
+            future = asyncio.get_running_loop().create_future()
+            self.outbox.append((protocolo.encode_message(message), future))
+            if not self.flush_scheduled:
+                self.flush_scheduled = True
+                asyncio.get_running_loop().call_soon(self.flush)
+            await future
+
+    async def send_many(self, messages):
+        """Envía muchos mensajes concurrentemente y espera a todos los ACKs"""
+        await asyncio.gather(*(self.send(m) for m in messages))
+
+    async def close(self):
+        """Cierra la conexión; los send() pendientes fallan con ConnectionError"""
+        if self.receiver:
+            self.receiver.cancel()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.fail_pending(ConnectionError("Cliente cerrado con mensajes sin confirmar"))
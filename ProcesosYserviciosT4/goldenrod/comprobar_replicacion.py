@@ -0,0 +1,133 @@
+"""
+Comprobación automática de la réplica, sin intervención: a diferencia de
+demo_replicacion.py no mide nada, solo verifica y termina con código 0 si
+todo se cumple o 1 en cuanto algo falla.
+
+  - el seguidor alcanza el offset del líder,
+  - tras reiniciar el líder, el seguidor se reconecta y lo vuelve a alcanzar,
+  - tras reiniciar el seguidor, continúa desde su offset con lo escrito
+    mientras estaba parado,
+  - al final ambos almacenes contienen los mismos bytes (con segmentos
+    cortados en puntos distintos) y el mismo messages.txt.
+
+    python comprobar_replicacion.py --engine threads
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+
+from almacen import SegmentedStore
+from bench_comun import arrancar_servidor, reanudar_servidor
+from bench_protocolo import CLASES, cliente_tramas
+from demo_replicacion import Conexion, esperar_replica, estadisticas
+
+def comprobar(condicion, descripcion):
+    """Como assert, pero sin desaparecer con python -O"""
+    if not condicion:
+        raise AssertionError(descripcion)
+    print(f"✔ {descripcion}")
+
+def detener(proceso):
+    """Ctrl+C: el servidor vacía su escritor y cierra el almacén antes de salir"""
+    proceso.send_signal(signal.SIGINT)
+    proceso.wait(timeout=10)
+
+def escribir(config, mensajes, tamano):
+    asyncio.run(cliente_tramas(config, mensajes, tamano, 512))
+
+def offsets(lider, seguidor):
+    return estadisticas(lider)['store_bytes'], estadisticas(seguidor)['replication_offset']
+
+def contenido_almacen(directorio):
+    """Bytes de todos los registros del almacén, en el orden de los offsets"""
+    store = SegmentedStore(directorio)
+    try:
+        partes = []
+        offset = store.start_offset
+        while offset < store.end_offset:
+            datos = store.read_from(offset)
+            partes.append(datos)
+            offset += len(datos)
+        return b''.join(partes)
+    finally:
+        store.close()
+
+def leer(ruta):
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+def main():
+    parser = argparse.ArgumentParser(description='Comprobación automática de la réplica de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--mensajes', type=int, default=20000, help='Mensajes por fase')
+    parser.add_argument('--tamano', type=int, default=64)
+    args = parser.parse_args()
+    clase = CLASES[args.engine]
+
+    # Segmentos pequeños y distintos en cada lado: los offsets deben coincidir igualmente
+    lider, config_lider, dir_lider = arrancar_servidor(clase, {"segment_size": 64 * 1024})
+    seguidor, config_seguidor, dir_seguidor = arrancar_servidor(clase, {
+        "segment_size": 48 * 1024,
+        "replicate_from": f"{config_lider['host']}:{config_lider['port']}"
+    })
+    try:
+        escribir(config_lider, args.mensajes, args.tamano)
+        comprobar(esperar_replica(config_lider, config_seguidor, timeout=30),
+                  "el seguidor alcanza al líder")
+        final_lider, final_seguidor = offsets(config_lider, config_seguidor)
+        comprobar(final_lider == final_seguidor > 0,
+                  f"offsets iguales tras la primera carga ({final_lider})")
+
+        # El líder se reinicia: el seguidor pierde la conexión y reconecta solo
+        detener(lider)
+        time.sleep(1)
+        lider, _, _ = reanudar_servidor(clase, dir_lider)
+        escribir(config_lider, args.mensajes, args.tamano)
+        comprobar(esperar_replica(config_lider, config_seguidor, timeout=30),
+                  "el seguidor reconecta con el líder reiniciado y lo alcanza")
+        anterior = final_lider
+        final_lider, final_seguidor = offsets(config_lider, config_seguidor)
+        comprobar(final_lider == final_seguidor > anterior,
+                  f"offsets iguales tras reiniciar el líder ({final_lider})")
+
+        # El seguidor se reinicia con lo escrito mientras estaba parado
+        detener(seguidor)
+        escribir(config_lider, args.mensajes, args.tamano)
+        seguidor, _, _ = reanudar_servidor(clase, dir_seguidor)
+        comprobar(esperar_replica(config_lider, config_seguidor, timeout=30),
+                  "el seguidor reiniciado continúa desde su offset y alcanza al líder")
+        anterior = final_lider
+        final_lider, final_seguidor = offsets(config_lider, config_seguidor)
+        comprobar(final_lider == final_seguidor > anterior,
+                  f"offsets iguales tras reiniciar el seguidor ({final_lider})")
+
+        consultas = []
+        for config in (config_lider, config_seguidor):
+            conexion = Conexion(config)
+            consultas.append(conexion.comando('query', last=100)['messages'])
+            conexion.close()
+        comprobar(consultas[0] == consultas[1] and len(consultas[0]) == 100,
+                  "las consultas devuelven lo mismo en ambos")
+    finally:
+        for proceso in (seguidor, lider):
+            if proceso.poll() is None:
+                detener(proceso)
+
+    datos_lider = contenido_almacen(os.path.join(dir_lider, 'store'))
+    datos_seguidor = contenido_almacen(os.path.join(dir_seguidor, 'store'))
+    comprobar(len(datos_lider) == final_lider, "el almacén del líder llega hasta su offset final")
+    comprobar(datos_lider == datos_seguidor, "los almacenes contienen los mismos bytes")
+    comprobar(leer(os.path.join(dir_lider, 'messages.txt')) ==
+              leer(os.path.join(dir_seguidor, 'messages.txt')),
+              "messages.txt es igual en ambos")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except AssertionError as e:
+        print(f"✘ {e}")
+        sys.exit(1)
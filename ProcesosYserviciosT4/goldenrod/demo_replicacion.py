@@ -0,0 +1,154 @@
+"""
+Prueba de réplica en localhost: arranca un líder y un seguidor, escribe
+en el líder y comprueba sobre el seguidor:
+
+  - que alcanza al líder (offset y tiempo de puesta al día),
+  - que sus consultas devuelven lo mismo que las del líder,
+  - que rechaza mensajes de clientes,
+  - que entrega a sus suscriptores lo publicado en el líder,
+  - el retraso de réplica con carga continua.
+
+    python demo_replicacion.py --mensajes 100000
+
+La comprobación automática, con reinicios del líder y del seguidor, está
+en comprobar_replicacion.py.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+
+import protocolo
+from bench_comun import arrancar_servidor, parar_servidor
+from bench_protocolo import CLASES, cliente_tramas
+
+class Conexion:
+    """Conexión con tramas mínima para las comprobaciones"""
+
+    def __init__(self, config):
+        self.sock = socket.create_connection((config['host'], config['port']), timeout=10)
+        self.decoder = protocolo.FrameDecoder()
+        self.frames = []
+
+    def esperar(self, tipo):
+        while True:
+            for i, (frame_type, payload) in enumerate(self.frames):
+                if frame_type == tipo:
+                    del self.frames[i]
+                    return payload
+            self.frames.extend(self.decoder.feed(self.sock.recv(1024 * 1024)))
+
+    def comando(self, cmd, **params):
+        self.sock.sendall(protocolo.encode_json(protocolo.COMMAND, {'cmd': cmd, **params}))
+        return protocolo.decode_json(self.esperar(protocolo.RESPONSE))
+
+    def close(self):
+        self.sock.close()
+
+def estadisticas(config):
+    conexion = Conexion(config)
+    try:
+        return conexion.comando('stats')['stats']
+    finally:
+        conexion.close()
+
+def esperar_replica(lider, seguidor, timeout=60):
+    """Espera a que el seguidor alcance el offset actual del líder"""
+    objetivo = estadisticas(lider)['store_bytes']
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        stats = estadisticas(seguidor)
+        if stats['replication_offset'] >= objetivo and stats['replication_lag_bytes'] == 0:
+            return True
+        time.sleep(0.05)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de réplica líder/seguidor de Goldenrod')
+    parser.add_argument('--engine', choices=CLASES, default='asyncio')
+    parser.add_argument('--mensajes', type=int, default=100000)
+    parser.add_argument('--tamano', type=int, default=64)
+    parser.add_argument('--segundos', type=float, default=3, help='Duración de la carga continua')
+    args = parser.parse_args()
+
+    resultado = {'engine': args.engine}
+    comprobaciones = {}
+    lider, config_lider, _ = arrancar_servidor(CLASES[args.engine], {"max_connections": 64})
+    seguidor, config_seguidor, _ = arrancar_servidor(CLASES[args.engine], {
+        "max_connections": 64,
+        "replicate_from": f"{config_lider['host']}:{config_lider['port']}"
+    })
+    try:
+        # Puesta al día de un lote grande escrito en el líder
+        asyncio.run(cliente_tramas(config_lider, args.mensajes, args.tamano, 512))
+        inicio = time.perf_counter()
+        comprobaciones['alcanza_al_lider'] = esperar_replica(config_lider, config_seguidor)
+        duracion = time.perf_counter() - inicio
+        resultado['puesta_al_dia_s'] = round(duracion, 3)
+        resultado['bytes_replicados'] = estadisticas(config_seguidor)['replication_offset']
+
+        # Mismas consultas en ambos
+        consultas = []
+        for config in (config_lider, config_seguidor):
+            conexion = Conexion(config)
+            consultas.append(conexion.comando('query', last=100)['messages'])
+            conexion.close()
+        comprobaciones['consultas_iguales'] = consultas[0] == consultas[1] and len(consultas[0]) == 100
+
+        # El seguidor no acepta escrituras
+        conexion = Conexion(config_seguidor)
+        conexion.sock.sendall(protocolo.encode_message('no debería guardarse'))
+        comprobaciones['rechaza_escrituras'] = b'solo lectura' in conexion.esperar(protocolo.ERROR)
+        conexion.close()
+
+        # Suscripción en el seguidor, publicación en el líder
+        suscriptor = Conexion(config_seguidor)
+        suscriptor.comando('subscribe', topic='replica')
+        # El seguidor reenvía la suscripción al líder tras la petición de réplica en curso
+        time.sleep(1)
+        publicador = Conexion(config_lider)
+        publicador.sock.sendall(protocolo.encode_publish('replica', 'hola desde el líder'))
+        publicador.esperar(protocolo.ACK)
+        entrega = protocolo.decode_publish(suscriptor.esperar(protocolo.DELIVER))
+        comprobaciones['entrega_en_seguidor'] = entrega == ('replica', 'hola desde el líder')
+        publicador.close()
+        suscriptor.close()
+
+        # Retraso con carga continua en el líder
+        retrasos = []
+
+        async def carga():
+            limite = time.monotonic() + args.segundos
+            while time.monotonic() < limite:
+                await cliente_tramas(config_lider, 2000, args.tamano, 512)
+
+        async def muestreo():
+            limite = time.monotonic() + args.segundos
+            while time.monotonic() < limite:
+                stats = await asyncio.to_thread(estadisticas, config_seguidor)
+                retrasos.append(stats['replication_lag_bytes'])
+                await asyncio.sleep(0.1)
+
+        async def con_carga():
+            await asyncio.gather(carga(), muestreo())
+
+        asyncio.run(con_carga())
+        retrasos.sort()
+        resultado['retraso_bytes'] = {
+            'p50': retrasos[len(retrasos) // 2],
+            'max': retrasos[-1]
+        }
+        comprobaciones['alcanza_tras_la_carga'] = esperar_replica(config_lider, config_seguidor)
+    finally:
+        parar_servidor(seguidor)
+        parar_servidor(lider)
+
+    resultado['comprobaciones'] = comprobaciones
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(comprobaciones.values()) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import os
+import queue
+import sys
+import threading
+import time
+
+from histograma import Histogram
+from rotacion import RotatingFile
+
+class GroupCommitWriter:
+    """
+    Etapa de escritura dedicada: los manejadores encolan líneas y un único
+    hilo las agrupa por archivo, las escribe en lotes sobre archivos que
+    permanecen abiertos y aplica la política de fsync configurada.
+
+    El destino puede ser una ruta (se escriben líneas de texto) o un objeto
+    con write_batch(items) y sync(), como el almacén segmentado. Las rutas
+    se abren como RotatingFile con los parámetros de 'rotation': la rotación
+    ocurre en este hilo y la compresión en el de fondo de rotacion.
+
+    Si una escritura o un fsync fallan, el hilo no termina: anota el error
+    en 'error' (y en stderr) y sigue vaciando la cola. El error no se borra,
+    porque no se sabe qué parte del lote llegó al disco: el servidor deja de
+    aceptar mensajes hasta que se reinicie.
+
+    La cola se limita a 'max_queue' elementos (0 = sin límite) para que un
+    disco lento no haga crecer la memoria sin control; encolar nunca
+    bloquea. Con la cola llena el servidor rechaza los mensajes nuevos
+    (full()) y las líneas de log se descartan y se cuentan en 'shed'
+    (offer()). El límite se comprueba antes de aceptar cada lote, así que
+    puede superarse en lo que ya se estaba procesando.
+    """
+
+    POLICIES = ('never', 'messages', 'interval')
+
+    def __init__(self, fsync_policy='never', fsync_messages=1000,
+                 fsync_interval_ms=100, max_batch=4096, max_queue=0, rotation=None):
+        if fsync_policy not in self.POLICIES:
+            raise ValueError(f"Política de fsync no válida: {fsync_policy}")
+
+        self.fsync_policy = fsync_policy
+        self.fsync_messages = fsync_messages
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.rotation = rotation or {}
+
+        self.queue = queue.SimpleQueue()
+        # Se notifica tras cada lote escrito, para quien espera sitio en la cola
+        self.room = threading.Condition()
+        self.shed = 0
+        self.files = {}
+        self.sinks = set()
+        # Mensajes escritos desde el último fsync (las líneas de log no cuentan)
+        self.pending_sync = 0
+        self.dirty = False
+        self.last_sync = time.monotonic()
+        self.error = None
+        self.lost = 0
+        self.fsync_latency = Histogram()
+        self.thread = None
+
+    def start(self):
+        """Arranca el hilo escritor"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='goldenrod-writer', daemon=True)
+            self.thread.start()
+
+    def pending(self):
+        """Elementos en cola pendientes de escribir"""
+        return self.queue.qsize()
+
+    def write(self, target, item, messages=0):
+        """
+        Encola una línea (o un registro para un destino); nunca bloquea al
+        llamante. 'messages' es cuántos mensajes cuenta para fsync_messages:
+        cada mensaje se escribe en varios destinos, pero cuenta una vez.
+        """
+        self.queue.put((target, item, messages))
+
+    def full(self):
+        """True si la cola ha llegado a 'max_queue'"""
+        return bool(self.max_queue) and self.queue.qsize() >= self.max_queue
+
+    def offer(self, target, item):
+        """Como write(), pero con la cola llena descarta el elemento y lo cuenta"""
+        if self.full():
+            self.shed += 1
+            return False
+        self.queue.put((target, item, 0))
+        return True
+
+    def wait_for_room(self, timeout):
+        """Espera a que la cola baje de 'max_queue'; False si vence el tiempo"""
+        with self.room:
+            return self.room.wait_for(lambda: not self.full(), timeout)
+
+    def close(self):
+        """Vacía la cola, sincroniza y cierra los archivos"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def open_file(self, path):
+        f = self.files.get(path)
+        if f is None:
+            f = self.files[path] = RotatingFile(path, **self.rotation)
+        return f
+
+    def next_batch(self):
+        """Espera el primer elemento y recoge sin bloquear los que ya estén en cola"""
+        timeout = None
+        if self.fsync_policy == 'interval' and self.dirty:
+            timeout = max(0, self.last_sync + self.fsync_interval - time.monotonic())
+
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def fail(self, target, error, lost=0):
+        """Pasa al estado de error (solo se avisa del primero)"""
+        self.lost += lost
+        if self.error is None:
+            print(f"Error del escritor en {target}: {error}. El servidor deja de aceptar mensajes",
+                  file=sys.stderr)
+        self.error = error
+
+    def write_batch(self, batch):
+        """Escribe un lote con una sola llamada write() por destino"""
+        grouped = {}
+        for target, item, messages in batch:
+            grouped.setdefault(target, []).append(item)
+            self.pending_sync += messages
+
+        for target, items in grouped.items():
+            try:
+                if isinstance(target, str):
+                    f = self.open_file(target)
+                    f.write(''.join(items))
+                    f.flush()
+                else:
+                    self.sinks.add(target)
+                    target.write_batch(items)
+            except Exception as e:  # OSError del disco o errores del almacén
+                self.fail(target, e, len(items))
+
+        self.dirty = True
+
+    def sync(self, force=False):
+        """Aplica la política de fsync"""
+        if not self.dirty or (self.fsync_policy == 'never' and not force):
+            return
+
+        due = (force
+               or (self.fsync_policy == 'messages' and self.pending_sync >= self.fsync_messages)
+               or (self.fsync_policy == 'interval'
+                   and time.monotonic() - self.last_sync >= self.fsync_interval))
+        if due:
+            started = time.perf_counter()
+            # Un fsync fallido no se reintenta: tras el error, el kernel puede
+            # haber descartado las páginas sucias, y un segundo fsync
+            # "correcto" no garantiza nada sobre ellas
+            for path, f in self.files.items():
+                try:
+                    os.fsync(f.fileno())
+                except OSError as e:
+                    self.fail(path, e)
+            for sink in self.sinks:
+                try:
+                    sink.sync()
+                except Exception as e:
+                    self.fail(sink, e)
+            self.fsync_latency.record((time.perf_counter() - started) * 1_000_000)
+            self.pending_sync = 0
+            self.dirty = False
+            self.last_sync = time.monotonic()
+
+    def run(self):
+        """Bucle del hilo escritor"""
+        closing = False
+        while not closing:
+            batch = self.next_batch()
+            if None in batch:
+                batch = [item for item in batch if item is not None]
+                closing = True
+            if batch:
+                self.write_batch(batch)
+            self.sync()
+            with self.room:
+                self.room.notify_all()
+
+        self.sync(force=self.fsync_policy != 'never')
+        for path, f in self.files.items():
+            try:
+                f.close()
+            except OSError as e:
+                self.fail(path, e)
+        self.files.clear()
+        if self.lost:
+            print(f"El escritor no pudo escribir {self.lost} elementos", file=sys.stderr)
@@ -0,0 +1,81 @@
+class Histogram:
+    """
+    Histograma de latencias al estilo HDR: cubetas lineales hasta
+    2^bits y, a partir de ahí, cubetas cuyo ancho se duplica con cada
+    potencia de dos. Con bits=7 el error relativo es inferior al 1% y el
+    registro de un valor es O(1) sin guardar las muestras.
+    Los valores son enteros (por convención, microsegundos).
+    """
+
+    def __init__(self, bits=7, max_value=3_600_000_000):
+        self.bits = bits
+        self.sub_count = 1 << bits
+        self.half = self.sub_count >> 1
+        self.counts = [0] * (self.index(max_value) + 1)
+        self.max_value = max_value
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def index(self, value):
+        """Cubeta en la que cae un valor"""
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.bits
+        return self.sub_count + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def value_at(self, index):
+        """Valor representativo (punto medio) de una cubeta"""
+        if index < self.sub_count:
+            return index
+        shift, offset = divmod(index - self.sub_count, self.half)
+        shift += 1
+        return ((offset + self.half) << shift) + (1 << (shift - 1))
+
+    def record(self, value, count=1):
+        """Registra un valor (se recorta al rango del histograma)"""
+        value = min(max(int(value), 0), self.max_value)
+        self.counts[self.index(value)] += count
+        self.total += count
+        self.sum += value * count
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def merge(self, other):
+        """Suma otro histograma con la misma configuración"""
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+
+    def percentile(self, p):
+        """Valor por debajo del cual está el p% de las muestras"""
+        if not self.total:
+            return 0
+        target = max(1, round(self.total * p / 100))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.value_at(i), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def summary(self, points=(50, 90, 99, 99.9), scale=1):
+        """Resumen con percentiles; 'scale' divide los valores (p. ej. 1000 para us -> ms)"""
+        result = {
+            'count': self.total,
+            'min': (self.min or 0) / scale,
+            'mean': round(self.mean() / scale, 3),
+            'max': self.max / scale
+        }
+        for p in points:
+            result[f"p{p}"] = self.percentile(p) / scale
+        return result
@@ -0,0 +1,114 @@
+"""
+Ingesta por UDP para productores de telemetría: sin conexión ni ACK.
+
+Cada datagrama es un mensaje de texto o, si empieza por el byte de
+versión del protocolo, una secuencia de tramas MSG (para agrupar varios
+mensajes en un datagrama). Un hilo espera a que haya datos y, en cada
+despertar, vacía sin bloquear hasta 'udp_batch' datagramas sobre un
+búfer reutilizable antes de pasarlos al escritor, como el resto de
+mensajes. Como no hay control de flujo, se cuentan las pérdidas: las del
+kernel (cola de recepción llena, de /proc/net/udp), los datagramas no
+válidos y los descartados con la cola del escritor llena.
+"""
+
+import os
+import select
+import socket
+import threading
+import time
+
+import protocolo
+
+class UDPListener:
+    """Socket UDP junto al de TCP que alimenta el mismo servidor"""
+
+    def __init__(self, server, host, port, batch=256, rcvbuf=4 * 1024 * 1024, reuse_port=False):
+        self.server = server
+        self.batch = batch
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if reuse_port:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+        self.buffer = bytearray(65535)
+        self.view = memoryview(self.buffer)
+        self.datagrams = 0
+        self.messages = 0
+        self.invalid = 0
+        self.shed = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='goldenrod-udp', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.sock.close()
+
+    def kernel_drops(self):
+        """Datagramas descartados por el kernel para este socket (Linux)"""
+        inode = str(os.fstat(self.sock.fileno()).st_ino)
+        try:
+            with open('/proc/net/udp') as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[9] == inode:
+                        return int(fields[-1])
+        except (OSError, IndexError, ValueError):
+            pass
+        return 0
+
+    def run(self):
+        """Espera datos y procesa los datagramas por lotes"""
+        while self.running:
+            ready, _, _ = select.select([self.sock], [], [], 0.5)
+            if ready:
+                self.drain()
+
+    def drain(self):
+        """Lee y procesa los datagramas pendientes (como mucho 'batch')"""
+        started = time.perf_counter()
+        datagrams = messages = received = 0
+        while datagrams < self.batch:
+            try:
+                size, addr = self.sock.recvfrom_into(self.view)
+            except BlockingIOError:
+                break
+            datagrams += 1
+            received += size
+            if self.server.writer.full():
+                self.shed += 1
+                continue
+            try:
+                messages += self.process_datagram(self.view[:size], addr)
+            except protocolo.ProtocolError:
+                self.invalid += 1
+
+        self.datagrams += datagrams
+        self.messages += messages
+        self.server.metrics.record(messages, received, 0, time.perf_counter() - started)
+
+    def process_datagram(self, data, addr):
+        """Entrega los mensajes de un datagrama al servidor y devuelve cuántos eran"""
+        if not protocolo.is_framed(data):
+            self.server.process_message(protocolo.decode_text(data).strip(), addr)
+            return 1
+
+        # Se valida el datagrama entero antes de entregar nada: o todo o nada
+        messages = []
+        for frame_type, payload in protocolo.split_frames(data):
+            if frame_type != protocolo.MSG:
+                raise protocolo.ProtocolError(f"Trama no admitida por UDP: {frame_type}")
+            messages.append(protocolo.decode_text(payload))
+        for message in messages:
+            self.server.process_message(message, addr)
+        return len(messages)
@@ -0,0 +1,132 @@
+"""
+Control de admisión y límites de caudal por IP de origen.
+
+Cada IP tiene dos cubetas de tokens (mensajes/s y bytes/s) compartidas
+por todas sus conexiones y un máximo de conexiones simultáneas. Lo
+recibido en una lectura ya está procesado, así que las cubetas pueden
+quedar en negativo: el manejador espera lo que indique consume() antes de
+volver a leer y el exceso se frena en el propio TCP del cliente, sin
+descartar mensajes ni afectar a las demás conexiones.
+"""
+
+import threading
+import time
+
+class AdmissionRefused(Exception):
+    """Conexión rechazada por el control de admisión"""
+
+class TokenBucket:
+    """Cubeta de tokens con capacidad 'rate * burst' que admite deuda"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, burst=1.0):
+        self.rate = rate
+        self.capacity = rate * burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, amount, now):
+        """Descuenta 'amount' y devuelve los segundos hasta salir de la deuda"""
+        self.refill(now)
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class ClientLimits:
+    """Estado de una IP: conexiones abiertas y cubetas"""
+
+    __slots__ = ('ip', 'connections', 'lock', 'messages', 'bytes')
+
+    def __init__(self, ip, messages_per_second, bytes_per_second, burst):
+        self.ip = ip
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.messages = TokenBucket(messages_per_second, burst) if messages_per_second else None
+        self.bytes = TokenBucket(bytes_per_second, burst) if bytes_per_second else None
+
+    def idle(self, now):
+        """Sin conexiones y con las cubetas llenas: se puede olvidar"""
+        for bucket in (self.messages, self.bytes):
+            if bucket is not None:
+                bucket.refill(now)
+                if bucket.tokens < bucket.capacity:
+                    return False
+        return self.connections == 0
+
+class RateLimiter:
+    """Límites por IP configurados en server_config.json (0 = sin límite)"""
+
+    def __init__(self, messages_per_second=0, bytes_per_second=0, burst_seconds=1.0,
+                 max_connections_per_ip=0):
+        self.messages_per_second = messages_per_second
+        self.bytes_per_second = bytes_per_second
+        self.burst_seconds = burst_seconds
+        self.max_connections_per_ip = max_connections_per_ip
+        self.throttling = bool(messages_per_second or bytes_per_second)
+
+        self.clients = {}
+        self.lock = threading.Lock()
+        self.refused = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    PRUNE_EVERY = 1024
+
+    def connect(self, ip):
+        """Registra una conexión de 'ip'; lanza AdmissionRefused si supera el máximo"""
+        with self.lock:
+            client = self.clients.get(ip)
+            if client is None:
+                if len(self.clients) % self.PRUNE_EVERY == self.PRUNE_EVERY - 1:
+                    self.prune()
+                client = self.clients[ip] = ClientLimits(
+                    ip, self.messages_per_second, self.bytes_per_second, self.burst_seconds)
+            if self.max_connections_per_ip and client.connections >= self.max_connections_per_ip:
+                self.refused += 1
+                raise AdmissionRefused(f"máximo de {self.max_connections_per_ip} conexiones por IP")
+            client.connections += 1
+            return client
+
+    def disconnect(self, client):
+        """Da de baja una conexión y olvida la IP si ya no tiene deuda"""
+        with self.lock, client.lock:
+            client.connections -= 1
+            if client.idle(time.monotonic()):
+                self.clients.pop(client.ip, None)
+
+    def prune(self):
+        """Olvida las IPs sin conexiones que ya han pagado su deuda (con self.lock)"""
+        now = time.monotonic()
+        for ip, client in list(self.clients.items()):
+            with client.lock:
+                if client.idle(now):
+                    del self.clients[ip]
+
+    def refuse(self):
+        """Anota un rechazo decidido fuera del limitador (servidor saturado)"""
+        with self.lock:
+            self.refused += 1
+
+    def consume(self, client, messages, nbytes):
+        """Descuenta una lectura y devuelve los segundos que debe esperar la conexión"""
+        if not self.throttling:
+            return 0.0
+
+        now = time.monotonic()
+        delay = 0.0
+        with client.lock:
+            if client.messages is not None and messages:
+                delay = client.messages.consume(messages, now)
+            if client.bytes is not None and nbytes:
+                delay = max(delay, client.bytes.consume(nbytes, now))
+
+        if delay:
+            # Los contadores son globales: varias conexiones los actualizan a la vez
+            with self.lock:
+                self.throttled += 1
+                self.throttled_seconds += delay
+        return delay
@@ -0,0 +1,149 @@
+"""
+Métricas de Goldenrod.
+
+Los manejadores anotan una vez por lectura del socket (no por mensaje)
+los mensajes procesados, los bytes de entrada/salida y el tiempo de
+proceso, así que el coste en el camino caliente es un lock y un registro
+en el histograma por lote. Los indicadores instantáneos (profundidad de
+la cola del escritor, suscriptores...) se calculan al pedir las métricas.
+
+Se consultan con el comando {"cmd": "stats"} o, si "metrics_port" no es
+0, en http://127.0.0.1:<metrics_port>/metrics en formato de Prometheus.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from histograma import Histogram
+
+QUANTILES = (50, 90, 99, 99.9)
+
+class Metrics:
+    """Contadores, indicadores e histogramas del servidor"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.connections_total = 0
+        self.connections_active = 0
+        self.messages = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # Latencia de proceso por mensaje en microsegundos (tiempo del lote / mensajes)
+        self.handling = Histogram()
+        self.gauges = {}
+        self.histograms = {'handling': self.handling}
+        self.rate_sample = (time.monotonic(), 0)
+        self.rate = 0.0
+
+    def connection_opened(self):
+        with self.lock:
+            self.connections_total += 1
+            self.connections_active += 1
+            return self.connections_active
+
+    def connection_closed(self):
+        with self.lock:
+            self.connections_active -= 1
+
+    def record(self, messages, bytes_in, bytes_out, elapsed):
+        """Anota una lectura: mensajes procesados, bytes y segundos de proceso"""
+        with self.lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            if messages:
+                self.messages += messages
+                self.handling.record(elapsed * 1_000_000 / messages, messages)
+
+    def gauge(self, name, function):
+        """Registra un indicador que se evalúa al pedir las métricas"""
+        self.gauges[name] = function
+
+    def histogram(self, name, histogram):
+        """Publica un histograma (en microsegundos) mantenido por otro componente"""
+        self.histograms[name] = histogram
+
+    def messages_per_second(self):
+        """Mensajes/s desde la muestra anterior (se renueva como mucho cada segundo)"""
+        now = time.monotonic()
+        with self.lock:
+            last_time, last_messages = self.rate_sample
+            if now - last_time >= 1:
+                self.rate = (self.messages - last_messages) / (now - last_time)
+                self.rate_sample = (now, self.messages)
+            return self.rate
+
+    def snapshot(self):
+        """Estado actual de todas las métricas"""
+        rate = self.messages_per_second()
+        with self.lock:
+            result = {
+                'uptime_s': round(time.time() - self.started, 1),
+                'connections_total': self.connections_total,
+                'connections_active': self.connections_active,
+                'messages_total': self.messages,
+                'messages_per_second': round(rate, 1),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out
+            }
+            histograms = {name: h.summary(QUANTILES, scale=1000) for name, h in self.histograms.items()}
+
+        for name, function in self.gauges.items():
+            result[name] = function()
+        result['latency_ms'] = histograms
+        return result
+
+    def prometheus(self):
+        """Métricas en formato de texto de Prometheus"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, value, help_text):
+            lines.append(f"# HELP goldenrod_{name} {help_text}")
+            lines.append(f"# TYPE goldenrod_{name} {kind}")
+            lines.append(f"goldenrod_{name} {value}")
+
+        metric('connections_total', 'counter', snapshot['connections_total'], 'Conexiones aceptadas')
+        metric('connections_active', 'gauge', snapshot['connections_active'], 'Conexiones abiertas')
+        metric('messages_total', 'counter', snapshot['messages_total'], 'Mensajes procesados')
+        metric('messages_per_second', 'gauge', snapshot['messages_per_second'], 'Mensajes por segundo')
+        metric('bytes_in_total', 'counter', snapshot['bytes_in'], 'Bytes recibidos')
+        metric('bytes_out_total', 'counter', snapshot['bytes_out'], 'Bytes enviados')
+        for name in self.gauges:
+            metric(name, 'gauge', snapshot[name], f"Indicador {name}")
+
+        for name, histogram in self.histograms.items():
+            lines.append(f"# HELP goldenrod_{name}_seconds Latencia de {name}")
+            lines.append(f"# TYPE goldenrod_{name}_seconds summary")
+            for p in QUANTILES:
+                lines.append(f'goldenrod_{name}_seconds{{quantile="{p / 100}"}} '
+                             f"{histogram.percentile(p) / 1_000_000}")
+            lines.append(f"goldenrod_{name}_seconds_sum {histogram.sum / 1_000_000}")
+            lines.append(f"goldenrod_{name}_seconds_count {histogram.total}")
+        return '\n'.join(lines) + '\n'
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics en formato de Prometheus"""
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http(metrics, port, host='127.0.0.1'):
+    """Sirve las métricas por HTTP en un hilo aparte (solo en la interfaz local)"""
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpd.daemon_threads = True
+    httpd.metrics = metrics
+    threading.Thread(target=httpd.serve_forever, name='goldenrod-metrics', daemon=True).start()
+    return httpd
@@ -0,0 +1,197 @@
+import gzip
+import heapq
+import multiprocessing
+import os
+import re
+import signal
+import time
+from datetime import datetime
+
+from servidor import TCPServer
+from servidor_async import AsyncTCPServer
+from rotacion import RotatingFile, rotated_files
+
+# Inicio de cada registro en messages.txt ("2025-02-20 23:34:50 | ...") y
+# en server.log ("[2025-02-20 23:34:50] ..."); las demás líneas son la
+# continuación de un mensaje con saltos de línea
+RECORD_START = re.compile(r'\[?(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+
+def worker_path(path, index):
+    """Archivo propio de cada worker (messages.txt -> messages.txt.w0)"""
+    return f"{path}.w{index}"
+
+def worker_segments(path):
+    """
+    Archivos de un worker en orden: los rotados (comprimidos o no) y el
+    activo. Si el worker murió entre escribir el .gz y borrar el original
+    quedan los dos; se usa el .gz, que ya está completo.
+    """
+    segments = [p for p in rotated_files(path) if not os.path.exists(p + '.gz')]
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+def read_records(segments):
+    """Registros completos (con sus líneas de continuación) de los segmentos"""
+    record = None
+    for segment in segments:
+        opener = gzip.open if segment.endswith('.gz') else open
+        with opener(segment, 'rt', encoding='utf-8') as f:
+            for line in f:
+                match = RECORD_START.match(line)
+                if match or record is None:
+                    if record is not None:
+                        yield record
+                    record = (match[1] if match else '', line)
+                else:
+                    record = (record[0], record[1] + line)
+    if record is not None:
+        yield record
+
+def run_worker(config_file, index):
+    """Punto de entrada de un proceso worker"""
+    # SIGTERM se trata como Ctrl+C para que el servidor vacíe su escritor al salir
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    server = TCPServer(config_file)
+    if server.config['engine'] == 'asyncio':
+        server = AsyncTCPServer(config_file)
+
+    server.config['reuse_port'] = True
+    server.config['log_file'] = worker_path(server.config['log_file'], index)
+    server.config['message_file'] = worker_path(server.config['message_file'], index)
+    if server.config['workers'] > 1:
+        server.worker_index = index
+    # Cada worker expone sus métricas en el puerto siguiente al del anterior
+    if server.config['metrics_port']:
+        server.config['metrics_port'] += index
+    server.start()
+
+class PreforkSupervisor:
+    """
+    Modo pre-fork: arranca N procesos worker que hacen bind al mismo
+    host/puerto con SO_REUSEPORT, de modo que el kernel reparte los accept()
+    entre ellos. El supervisor reinicia los workers caídos y, al terminar,
+    espera a que salgan y fusiona por orden temporal los messages.txt /
+    server.log de cada worker, incluidos sus archivos rotados.
+
+    Cada worker es un servidor independiente que solo ve las conexiones que
+    le tocan, así que con más de un worker no hay nada que necesite ver todo
+    el tráfico: no se admite el almacén segmentado (store_dir) ni ser
+    seguidor (replicate_from); sin almacén tampoco se puede ser líder. Los
+    workers rechazan suscripciones, PUBLISH y la exportación de messages, y
+    stats y las métricas son las de cada worker.
+    """
+
+    RESTART_DELAY = 1.0
+
+    def __init__(self, config_file='server_config.json'):
+        self.config_file = config_file
+        self.config = TCPServer(config_file).config
+        if self.config['workers'] > 1 and self.config['replicate_from']:
+            raise ValueError("Un seguidor no admite el modo pre-fork: cada worker "
+                             "replicaría el líder por su cuenta")
+        if self.config['workers'] > 1 and self.config['store_dir']:
+            raise ValueError("El modo pre-fork no admite 'store_dir': cada worker "
+                             "tendría solo una parte de los mensajes")
+        self.workers = {}
+        self.log = None
+        self.running = False
+
+    def log_activity(self, message):
+        """Registra la actividad del supervisor (se fusiona con la de los workers)"""
+        if self.log is None:
+            self.log = RotatingFile(worker_path(self.config['log_file'], 'sup'),
+                                    self.config['rotate_max_bytes'], self.config['rotate_interval_s'],
+                                    self.config['rotate_backups'], self.config['rotate_compress'])
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.log.write(f"[{timestamp}] {message}\n")
+        self.log.flush()
+
+    def spawn(self, index):
+        process = multiprocessing.Process(target=run_worker, args=(self.config_file, index),
+                                          name=f"goldenrod-worker-{index}")
+        process.start()
+        self.workers[index] = (process, time.monotonic())
+        self.log_activity(f"Worker {index} iniciado (pid {process.pid})")
+
+    def supervise(self):
+        """Reinicia los workers que hayan terminado"""
+        for index, (process, started) in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            self.log_activity(f"Worker {index} terminado con código {process.exitcode}, reiniciando")
+            # Evita un bucle de reinicios si el worker cae nada más arrancar
+            if time.monotonic() - started < self.RESTART_DELAY:
+                time.sleep(self.RESTART_DELAY)
+            self.spawn(index)
+
+    def merge_outputs(self):
+        """
+        Fusiona los archivos de cada worker (incluidos sus rotados) en los
+        archivos principales. Solo debe llamarse sin workers vivos.
+        """
+        sources = [(self.config['message_file'], range(self.config['workers'])),
+                   (self.config['log_file'], [*range(self.config['workers']), 'sup'])]
+
+        for path, indices in sources:
+            workers = [worker_segments(worker_path(path, i)) for i in indices]
+            workers = [segments for segments in workers if segments]
+            if not workers:
+                continue
+
+            # Cada worker ya está en orden: se fusiona por la marca de tiempo
+            # de cada registro, que puede ocupar varias líneas
+            with open(path, 'a', encoding='utf-8') as out:
+                merged = heapq.merge(*map(read_records, workers), key=lambda record: record[0])
+                out.writelines(text for _, text in merged)
+
+            for segments in workers:
+                for segment in segments:
+                    os.remove(segment)
+                    if os.path.exists(segment.removesuffix('.gz') + '.gz.tmp'):
+                        os.remove(segment.removesuffix('.gz') + '.gz.tmp')
+
+    def start(self):
+        """Arranca los workers y los supervisa hasta Ctrl+C / SIGTERM"""
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.running = True
+
+        # Restos de una ejecución anterior interrumpida
+        self.merge_outputs()
+
+        print(f"Servidor pre-fork con {self.config['workers']} workers en "
+              f"{self.config['host']}:{self.config['port']}")
+        try:
+            for index in range(self.config['workers']):
+                self.spawn(index)
+            while self.running:
+                time.sleep(0.5)
+                self.supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Detiene los workers y fusiona su salida"""
+        self.running = False
+        for process, _ in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for index, (process, _) in self.workers.items():
+            process.join(timeout=10)
+            if process.is_alive():
+                self.log_activity(f"Worker {index} no terminó a tiempo, se fuerza su salida")
+                process.kill()
+                process.join()
+        self.workers.clear()
+
+        self.log_activity("Servidor pre-fork detenido")
+        self.log.close()
+        self.log = None
+        self.merge_outputs()
+        print("\nServidor detenido")
+
+if __name__ == "__main__":
+    PreforkSupervisor().start()
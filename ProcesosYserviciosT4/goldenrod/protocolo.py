@@ -0,0 +1,250 @@
+"""
+Protocolo con tramas de Goldenrod.
+
+Cada trama lleva una cabecera fija seguida del contenido:
+
+    +---------+------+-----------------+-----------------+
+    | versión | tipo | longitud (u32)  | contenido       |
+    | 1 byte  | 1 b  | 4 bytes, red    | 'longitud' bytes|
+    +---------+------+-----------------+-----------------+
+
+El primer byte de una conexión decide el modo: si es VERSION la conexión
+usa tramas; en otro caso se mantiene el modo de línea original (cada
+lectura es un mensaje y se responde con "Mensaje recibido: ...").
+
+Los clientes pueden enviar muchas tramas MSG seguidas sin esperar; el
+servidor responde con una única trama ACK por lectura cuyo contenido es
+el número acumulado de mensajes procesados en la conexión.
+
+Las tramas COMMAND llevan un objeto JSON {"cmd": ..., ...} y se contestan
+con una trama RESPONSE, también JSON, en el orden en que llegaron.
+
+Las tramas FETCH (seguidor -> líder) piden los registros del almacén a
+partir de un offset y se contestan con una trama REPLICA con los bytes
+crudos y el offset final del líder (ver replica.py).
+
+Las tramas PUBLISH (cliente -> servidor) y DELIVER (servidor -> suscriptor)
+comparten contenido: longitud del topic (u8), topic y mensaje. Un PUBLISH
+cuenta como mensaje a efectos del ACK acumulativo.
+"""
+
+import json
+import struct
+
+VERSION = 0x01
+
+# Tipos de trama
+MSG = 0x01
+ACK = 0x02
+COMMAND = 0x03
+RESPONSE = 0x04
+PUBLISH = 0x05
+DELIVER = 0x06
+FETCH = 0x07
+REPLICA = 0x08
+ERROR = 0x7F
+
+HEADER = struct.Struct('!BBI')
+ACK_ID = struct.Struct('!Q')
+FETCH_REQUEST = struct.Struct('!QII')   # offset, bytes máximos, espera (ms)
+REPLICA_HEADER = struct.Struct('!QQ')   # offset de los datos, offset final del líder
+MAX_FRAME = 16 * 1024 * 1024
+
+class ProtocolError(Exception):
+    """Trama mal formada o de una versión no soportada"""
+
+def encode_frame(frame_type, payload=b''):
+    """Codifica una trama completa"""
+    return HEADER.pack(VERSION, frame_type, len(payload)) + payload
+
+def encode_message(message):
+    """Trama MSG a partir de un texto"""
+    return encode_frame(MSG, message.encode('utf-8'))
+
+def encode_ack(ack_id):
+    """Trama ACK acumulativa"""
+    return encode_frame(ACK, ACK_ID.pack(ack_id))
+
+def decode_ack(payload):
+    return ACK_ID.unpack(payload)[0]
+
+# Plantilla de ACK: basta con sobrescribir el identificador (ver fill_ack)
+ACK_TEMPLATE = encode_ack(0)
+
+def fill_ack(buffer, ack_id):
+    """Escribe el identificador en un bytearray copiado de ACK_TEMPLATE y lo devuelve"""
+    ACK_ID.pack_into(buffer, HEADER.size, ack_id)
+    return buffer
+
+def encode_json(frame_type, data):
+    """Trama COMMAND/RESPONSE con contenido JSON"""
+    return encode_frame(frame_type, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+def decode_text(payload):
+    """Texto UTF-8 de un contenido (bytes o memoryview); si no es válido, ProtocolError"""
+    try:
+        return str(payload, 'utf-8')
+    except UnicodeDecodeError as e:
+        raise ProtocolError(f"Texto UTF-8 no válido: {e}") from None
+
+def decode_json(payload):
+    return json.loads(decode_text(payload))
+
+def encode_publish(topic, message):
+    """Trama PUBLISH de un mensaje en un topic"""
+    topic = topic.encode('utf-8')
+    if len(topic) > 255:
+        raise ProtocolError("El nombre del topic no puede superar 255 bytes")
+    return encode_frame(PUBLISH, bytes([len(topic)]) + topic + message.encode('utf-8'))
+
+def decode_publish(payload):
+    """Contenido de PUBLISH/DELIVER (bytes o memoryview) -> (topic, mensaje)"""
+    if not payload:
+        raise ProtocolError("Trama de publicación vacía")
+    end = 1 + payload[0]
+    return decode_text(payload[1:end]), decode_text(payload[end:])
+
+def split_frames(data):
+    """Divide un bloque que debe contener tramas completas (p. ej. un datagrama)"""
+    frames = []
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < HEADER.size:
+            raise ProtocolError("Trama incompleta")
+        version, frame_type, length = HEADER.unpack_from(data, offset)
+        if version != VERSION:
+            raise ProtocolError(f"Versión de protocolo no soportada: {version}")
+        start = offset + HEADER.size
+        if len(data) - start < length:
+            raise ProtocolError("Trama incompleta")
+        frames.append((frame_type, data[start:start + length]))
+        offset = start + length
+    return frames
+
+def encode_fetch(offset, max_bytes, wait_ms):
+    return encode_frame(FETCH, FETCH_REQUEST.pack(offset, max_bytes, wait_ms))
+
+def decode_fetch(payload):
+    """-> (offset, bytes máximos, espera en ms)"""
+    return FETCH_REQUEST.unpack(payload)
+
+def encode_replica(offset, end_offset, data):
+    return encode_frame(REPLICA, REPLICA_HEADER.pack(offset, end_offset) + data)
+
+def decode_replica(payload):
+    """-> (offset, offset final del líder, datos)"""
+    offset, end_offset = REPLICA_HEADER.unpack_from(payload)
+    return offset, end_offset, payload[REPLICA_HEADER.size:]
+
+def recv_exactly(sock, size):
+    """Lee exactamente 'size' bytes de un socket bloqueante"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Conexión cerrada a mitad de una trama")
+        data += chunk
+    return bytes(data)
+
+def read_frame(sock):
+    """Lee una sola trama sin consumir nada de lo que venga detrás (p. ej. un export)"""
+    version, frame_type, length = HEADER.unpack(recv_exactly(sock, HEADER.size))
+    if version != VERSION:
+        raise ProtocolError(f"Versión de protocolo no soportada: {version}")
+    return frame_type, recv_exactly(sock, length)
+
+def is_framed(first_bytes):
+    """Indica si los primeros bytes de una conexión son de una trama"""
+    return len(first_bytes) > 0 and first_bytes[0] == VERSION
+
+class FrameDecoder:
+    """Acumula bytes recibidos y extrae las tramas completas"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Añade datos y devuelve la lista de tramas (tipo, contenido) completas"""
+        self.buffer += data
+        frames = []
+        offset = 0
+        end = len(self.buffer)
+
+        while end - offset >= HEADER.size:
+            version, frame_type, length = HEADER.unpack_from(self.buffer, offset)
+            if version != VERSION:
+                raise ProtocolError(f"Versión de protocolo no soportada: {version}")
+            if length > MAX_FRAME:
+                raise ProtocolError(f"Trama demasiado grande: {length} bytes")
+            if end - offset - HEADER.size < length:
+                break
+
+            start = offset + HEADER.size
+            frames.append((frame_type, bytes(self.buffer[start:start + length])))
+            offset = start + length
+
+        del self.buffer[:offset]
+        return frames
+
+class FrameReader:
+    """
+    Lectura sin copias para sockets bloqueantes: recv_into sobre un búfer
+    preasignado por conexión y tramas devueltas como memoryview sobre ese
+    mismo búfer. Las vistas solo son válidas hasta la siguiente lectura.
+    """
+
+    def __init__(self, size=64 * 1024):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def recv(self, sock, size=None):
+        """Lee del socket a continuación de lo pendiente; devuelve los bytes leídos"""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif len(self.buffer) - self.end < len(self.buffer) // 4:
+            self.compact()
+
+        stop = len(self.buffer) if size is None else min(len(self.buffer), self.end + size)
+        received = sock.recv_into(self.view[self.end:stop])
+        self.end += received
+        return received
+
+    def compact(self):
+        """Lleva la trama incompleta al principio (y agranda el búfer si no cabe)"""
+        pending = self.end - self.start
+        needed = pending
+        if pending >= HEADER.size:
+            needed = max(needed, HEADER.size + HEADER.unpack_from(self.buffer, self.start)[2])
+
+        if needed * 4 > len(self.buffer) * 3:
+            buffer = bytearray(max(len(self.buffer) * 2, needed * 2))
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            self.view[:pending] = bytes(self.view[self.start:self.end])
+        self.start = 0
+        self.end = pending
+
+    def is_framed(self):
+        return self.end > self.start and self.buffer[self.start] == VERSION
+
+    def frames(self):
+        """
+        Genera las tramas (tipo, memoryview del contenido) completas. Es un
+        generador para que cada vista se libere en cuanto se procesa.
+        """
+        while self.end - self.start >= HEADER.size:
+            version, frame_type, length = HEADER.unpack_from(self.buffer, self.start)
+            if version != VERSION:
+                raise ProtocolError(f"Versión de protocolo no soportada: {version}")
+            if length > MAX_FRAME:
+                raise ProtocolError(f"Trama demasiado grande: {length} bytes")
+            if self.end - self.start - HEADER.size < length:
+                break
+
+            start = self.start + HEADER.size
+            self.start = start + length
+            yield frame_type, self.view[start:self.start]
@@ -0,0 +1,191 @@
+"""
+Publicación/suscripción de Goldenrod.
+
+Un cliente en modo tramas se suscribe con {"cmd": "subscribe", "topic": T}
+y publica con tramas PUBLISH. Cada mensaje publicado se codifica una sola
+vez como trama DELIVER y ese mismo objeto bytes se encola en todos los
+suscriptores del topic. Cada suscriptor tiene una cola acotada que se
+vacía con una sola escritura por vuelta; si se llena se aplica la
+política de consumidor lento ('drop' descarta, 'disconnect' desconecta).
+"""
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+import protocolo
+
+class Broker:
+    """Registro de topics y suscriptores"""
+
+    def __init__(self):
+        self.topics = {}
+        self.lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, topic, subscriber):
+        with self.lock:
+            self.topics.setdefault(topic, set()).add(subscriber)
+        subscriber.topics.add(topic)
+
+    def unsubscribe(self, topic, subscriber):
+        with self.lock:
+            subscribers = self.topics.get(topic)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+        subscriber.topics.discard(topic)
+
+    def unsubscribe_all(self, subscriber):
+        for topic in list(subscriber.topics):
+            self.unsubscribe(topic, subscriber)
+
+    def publish(self, topic, payload):
+        """Reparte un mensaje (contenido de la trama PUBLISH) y devuelve a cuántos llegó"""
+        # La trama DELIVER reutiliza el mismo contenido: se codifica una vez
+        frame = protocolo.encode_frame(protocolo.DELIVER, payload)
+        with self.lock:
+            subscribers = list(self.topics.get(topic, ()))
+
+        delivered = 0
+        for subscriber in subscribers:
+            if subscriber.offer(frame):
+                delivered += 1
+        # Se publica desde varios hilos (manejadores y réplica): los
+        # contadores se actualizan con el cerrojo, pero no las entregas
+        with self.lock:
+            self.published += 1
+            self.delivered += delivered
+            self.dropped += len(subscribers) - delivered
+        return delivered
+
+class Subscriber(ABC):
+    """Cola de salida acotada de un suscriptor; cada motor implementa el emisor"""
+
+    def __init__(self, max_queue=10000, policy='drop'):
+        if policy not in ('drop', 'disconnect'):
+            raise ValueError(f"Política de consumidor lento no válida: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.queue = deque()
+        self.topics = set()
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, frame):
+        """Encola una trama; aplica la política si la cola está llena"""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            self.dropped += 1
+            if self.policy == 'disconnect':
+                self.close()
+            return False
+        self.queue.append(frame)
+        self.wake()
+        return True
+
+    def take_all(self):
+        """Saca todas las tramas pendientes para escribirlas de una vez"""
+        frames = []
+        while self.queue:
+            frames.append(self.queue.popleft())
+        return frames
+
+    @abstractmethod
+    def wake(self):
+        """Avisa al emisor de que hay tramas en la cola"""
+
+    @abstractmethod
+    def stop(self):
+        """Detiene el emisor sin tocar la conexión (al cerrarse ésta)"""
+
+    @abstractmethod
+    def close(self):
+        """Desconecta al suscriptor; el manejador de la conexión limpia el resto"""
+
+class AsyncSubscriber(Subscriber):
+    """Suscriptor del motor asyncio: una tarea escribe las tramas acumuladas"""
+
+    def __init__(self, writer, max_queue=10000, policy='drop'):
+        super().__init__(max_queue, policy)
+        self.writer = writer
+        self.ready = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.task = self.loop.create_task(self.run())
+
+    def in_loop(self, function):
+        """Ejecuta en el bucle: las publicaciones pueden llegar de otro hilo (réplica)"""
+        if threading.get_ident() == self.loop_thread:
+            function()
+        else:
+            self.loop.call_soon_threadsafe(function)
+
+    def wake(self):
+        self.in_loop(self.ready.set)
+
+    async def run(self):
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                self.ready.clear()
+                frames = self.take_all()
+                if frames:
+                    self.writer.writelines(frames)
+                    await self.writer.drain()
+        except (ConnectionError, OSError):
+            self.closed = True
+
+    def stop(self):
+        self.closed = True
+        self.in_loop(self.task.cancel)
+
+    def close(self):
+        if not self.closed:
+            self.stop()
+            self.in_loop(self.writer.transport.abort)
+
+class ThreadSubscriber(Subscriber):
+    """Suscriptor del motor de hilos: un hilo emisor por suscriptor"""
+
+    def __init__(self, conn, send_lock, max_queue=10000, policy='drop'):
+        super().__init__(max_queue, policy)
+        self.conn = conn
+        self.send_lock = send_lock
+        self.ready = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        with self.ready:
+            self.ready.notify()
+
+    def run(self):
+        try:
+            while not self.closed:
+                with self.ready:
+                    while not self.queue and not self.closed:
+                        self.ready.wait()
+                frames = self.take_all()
+                if frames:
+                    with self.send_lock:
+                        self.conn.sendall(b''.join(frames))
+        except OSError:
+            self.closed = True
+
+    def stop(self):
+        self.closed = True
+        self.wake()
+
+    def close(self):
+        if not self.closed:
+            self.stop()
+            try:
+                self.conn.shutdown(2)
+            except OSError:
+                pass
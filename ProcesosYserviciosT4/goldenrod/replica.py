@@ -0,0 +1,181 @@
+"""
+Réplica seguidora de Goldenrod para repartir las lecturas.
+
+Con "replicate_from": "host:puerto" el servidor arranca como seguidor:
+rechaza los mensajes de los clientes y un hilo copia el almacén del líder
+por una conexión de réplica con tramas. El seguidor pide con FETCH los
+registros desde su propio offset final y el líder contesta con REPLICA
+en lotes de hasta 'replica_fetch_bytes'; si no hay nada nuevo, el líder
+espera hasta 'replica_wait_ms' antes de contestar. Los offsets son bytes
+acumulados del log, iguales en ambos aunque los segmentos se corten en
+otro punto, así que tras un reinicio el seguidor continúa donde lo dejó.
+
+Los registros se escriben en el almacén y en messages.txt del seguidor
+con el mismo escritor que los mensajes locales, de modo que el seguidor
+atiende consultas. Las suscripciones de sus clientes se reenvían por la
+misma conexión al líder y las entregas se reparten localmente.
+"""
+
+import socket
+import threading
+import time
+
+import protocolo
+from almacen import parse_records
+from cliente_pool import Backoff
+
+class Follower:
+    """Hilo de réplica del almacén de un líder"""
+
+    def __init__(self, server, leader, fetch_bytes=1024 * 1024, wait_ms=500, backoff=None):
+        host, port = leader.rsplit(':', 1)
+        self.server = server
+        self.leader = (host, int(port))
+        self.fetch_bytes = fetch_bytes
+        self.wait_ms = wait_ms
+        self.backoff = backoff or Backoff(initial=0.5, maximum=10.0)
+
+        self.sock = None
+        self.send_lock = threading.Lock()
+        self.decoder = None
+        self.topics = set()
+        self.offset = server.store.end_offset
+        self.leader_offset = self.offset
+        self.last_timestamp = None
+        self.connected = False
+        self.running = False
+        self.thread = None
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def lag_bytes(self):
+        """Bytes del líder aún no aplicados"""
+        return max(0, self.leader_offset - self.offset)
+
+    def lag_seconds(self):
+        """Antigüedad del último registro aplicado si aún queda retraso"""
+        if not self.lag_bytes() or self.last_timestamp is None:
+            return 0.0
+        return round(time.time() - self.last_timestamp, 3)
+
+    # ------------------------------------------------------------------
+    # Conexión con el líder
+    # ------------------------------------------------------------------
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='goldenrod-replica', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def send(self, data):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def follow_topic(self, topic):
+        """Reenvía al líder la suscripción a un topic (una vez por topic)"""
+        if topic in self.topics:
+            return
+        self.topics.add(topic)
+        if self.connected:
+            self.send(protocolo.encode_json(protocolo.COMMAND, {'cmd': 'subscribe', 'topic': topic}))
+
+    def connect(self):
+        self.sock = socket.create_connection(self.leader, timeout=5)
+        self.sock.settimeout(self.wait_ms / 1000 + 10)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.decoder = protocolo.FrameDecoder()
+
+        info = self.request({'cmd': 'replica_info'})
+        if self.offset < info['start_offset']:
+            raise RuntimeError(f"El líder ya no conserva el offset {self.offset} "
+                               f"(empieza en {info['start_offset']})")
+
+        self.leader_offset = info['end_offset']
+        self.connected = True
+        for topic in self.topics:
+            self.send(protocolo.encode_json(protocolo.COMMAND, {'cmd': 'subscribe', 'topic': topic}))
+        self.server.log_activity(f"Réplica conectada a {self.leader[0]}:{self.leader[1]} "
+                                 f"desde el offset {self.offset}")
+
+    def request(self, command):
+        """Comando síncrono durante la conexión (antes de empezar a replicar)"""
+        self.send(protocolo.encode_json(protocolo.COMMAND, command))
+        while True:
+            for frame_type, payload in self.read_frames():
+                if frame_type == protocolo.RESPONSE:
+                    response = protocolo.decode_json(payload)
+                    if not response['ok']:
+                        raise RuntimeError(response['error'])
+                    return response
+
+    def read_frames(self):
+        data = self.sock.recv(1024 * 1024)
+        if not data:
+            raise ConnectionError("El líder cerró la conexión de réplica")
+        return self.decoder.feed(data)
+
+    def run(self):
+        """Bucle de réplica con reconexión"""
+        delays = self.backoff.delays()
+        while self.running:
+            try:
+                self.connect()
+                delays = self.backoff.delays()
+                self.replicate()
+            except (OSError, ConnectionError, RuntimeError, protocolo.ProtocolError) as e:
+                if not self.running:
+                    break
+                self.server.log_activity(f"Réplica: {str(e)}")
+                time.sleep(next(delays, self.backoff.maximum))
+            finally:
+                self.connected = False
+                if self.sock is not None:
+                    self.sock.close()
+
+    def replicate(self):
+        """Pide lotes al líder, los aplica y reparte las entregas de pub/sub"""
+        while self.running:
+            self.send(protocolo.encode_fetch(self.offset, self.fetch_bytes, self.wait_ms))
+            replied = False
+            while not replied:
+                for frame_type, payload in self.read_frames():
+                    if frame_type == protocolo.REPLICA:
+                        self.apply(*protocolo.decode_replica(payload))
+                        replied = True
+                    elif frame_type == protocolo.DELIVER:
+                        topic, _ = protocolo.decode_publish(payload)
+                        self.server.broker.publish(topic, payload)
+                    elif frame_type == protocolo.ERROR:
+                        raise RuntimeError(payload.decode('utf-8'))
+
+    def apply(self, offset, leader_offset, data):
+        """Escribe un lote del líder en el almacén y en messages.txt locales"""
+        if offset != self.offset:
+            raise RuntimeError(f"Lote en el offset {offset}, se esperaba {self.offset}")
+
+        server = self.server
+        if server.writer.error is not None:
+            # Se reintenta desde el mismo offset en la próxima conexión
+            raise RuntimeError(f"Error de escritura en la réplica: {server.writer.error}")
+        if not server.writer.wait_for_room(timeout=10):
+            raise RuntimeError("Cola de escritura llena en la réplica")
+        for _, timestamp, ip, message in parse_records(data):
+            server.writer.write(server.store, (timestamp, ip, message))
+            local = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+            server.writer.write(server.config['message_file'], f"{local} | {ip} | {message}\n",
+                                messages=1)
+            self.last_timestamp = timestamp
+
+        self.offset += len(data)
+        self.leader_offset = max(leader_offset, self.offset)
@@ -0,0 +1,269 @@
+"""
+Rotación de los archivos del servidor (server.log y messages.txt).
+
+RotatingFile es un archivo de texto en modo append que se rota por tamaño
+('max_bytes') o por tiempo ('interval', en segundos). Al rotar, el archivo
+activo se renombra con os.replace a
+
+    server.log.20250220-233450      recién rotado
+    server.log.20250220-233450.gz   ya comprimido
+
+y se abre uno nuevo con el nombre original, de modo que quien abra la ruta
+siempre encuentra un archivo completo y quien ya lo tenía abierto sigue
+leyendo el rotado. Un hilo de fondo comprime los rotados (primero a .tmp y
+luego os.replace, igual que los segmentos del almacén) y conserva como
+mucho 'backups' archivos antiguos; quien escribe solo paga el renombrado.
+Al abrir se retoman los rotados que quedaran sin comprimir.
+
+Cada RotatingFile debe tener un único proceso escritor: la rotación
+renombra el archivo y otro proceso seguiría escribiendo en el rotado. Sirve
+para los archivos del servidor (los workers de prefork escriben en archivos
+propios). Los logs de los CLI, que pueden ejecutarse varias veces a la vez,
+usan SharedRotatingHandler, que coordina a los procesos con un flock.
+"""
+
+import gzip
+import logging
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, cada proceso rota por su cuenta
+    fcntl = None
+
+ROTATED = re.compile(r'^(\d{8}-\d{6})(?:-(\d+))?(\.gz)?$')
+
+class Compressor:
+    """Hilo de fondo que comprime los archivos rotados y aplica la retención"""
+
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, rotating, path):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='rotacion-gzip', daemon=True)
+                self.thread.start()
+        self.queue.put((rotating, path))
+
+    def run(self):
+        while True:
+            rotating, path = self.queue.get()
+            try:
+                if rotating.compress:
+                    compress_file(path)
+                rotating.prune()
+            except OSError as e:
+                # El rotado se queda sin comprimir y se reintenta al reabrir
+                print(f"Error al comprimir o podar {path}: {e}", file=sys.stderr)
+
+compressor = Compressor()
+
+def rotated_files(path):
+    """Archivos rotados de 'path', del más antiguo al más reciente"""
+    directory, name = os.path.split(os.path.abspath(path))
+    prefix = name + '.'
+    found = []
+    for f in os.listdir(directory):
+        match = f.startswith(prefix) and ROTATED.match(f[len(prefix):])
+        if match:
+            # Varias rotaciones en el mismo segundo llevan un contador: -1, -2...
+            found.append((match[1], int(match[2] or 0), os.path.join(directory, f)))
+    return [rotated for _, _, rotated in sorted(found)]
+
+def free_name(path, stamp, n=0):
+    """Primer nombre de rotado libre para 'path' con esa marca de tiempo (y su contador)"""
+    while True:
+        candidate = f"{path}.{stamp}-{n}" if n else f"{path}.{stamp}"
+        if not (os.path.exists(candidate) or os.path.exists(candidate + '.gz')):
+            return candidate, n
+        n += 1
+
+def compress_file(path):
+    """Comprime 'path' a 'path.gz' sin dejar nunca un .gz a medias"""
+    temporal = path + '.gz.tmp'
+    with open(path, 'rb') as src, gzip.open(temporal, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(temporal, path + '.gz')
+    os.remove(path)
+
+class RotatingFile:
+    """Archivo de log en modo append con rotación por tamaño o por tiempo"""
+
+    def __init__(self, path, max_bytes=0, interval=0, backups=0, compress=True, encoding='utf-8'):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backups = backups
+        self.compress = compress
+        self.encoding = encoding
+        self.lock = threading.Lock()
+        self.file = None
+        self.last_name = (None, 0)
+        self.open()
+        self.resume()
+
+    def open(self):
+        self.file = open(self.path, 'ab')
+        stat = os.fstat(self.file.fileno())
+        self.size = stat.st_size
+        # Un archivo que ya existía cuenta el intervalo desde su última escritura
+        started = stat.st_mtime if stat.st_size else time.time()
+        self.rollover_at = started + self.interval if self.interval else None
+
+    def rotated(self):
+        """Rutas de los archivos rotados, de la más antigua a la más reciente"""
+        return rotated_files(self.path)
+
+    def resume(self):
+        """Encola los rotados que no se llegaron a comprimir (p. ej. tras un corte)"""
+        pending = [p for p in self.rotated() if not p.endswith('.gz')]
+        for path in pending:
+            if os.path.exists(path + '.gz.tmp'):
+                os.remove(path + '.gz.tmp')
+            compressor.submit(self, path)
+        if not pending:
+            self.prune()
+
+    def prune(self):
+        """Elimina los rotados que exceden 'backups' (0 = se conservan todos)"""
+        if not self.backups:
+            return
+        for path in self.rotated()[:-self.backups]:
+            os.remove(path)
+
+    def should_rotate(self, size):
+        if self.max_bytes and self.size and self.size + size > self.max_bytes:
+            return True
+        return self.rollover_at is not None and time.time() >= self.rollover_at
+
+    def rotate(self):
+        """Renombra el archivo activo y abre uno nuevo; la compresión va aparte"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+        # El contador solo crece dentro del mismo segundo: un nombre ya
+        # podado no se reutiliza y el orden de los rotados se mantiene
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        n = self.last_name[1] + 1 if self.last_name[0] == stamp else 0
+        candidate, n = free_name(self.path, stamp, n)
+        self.last_name = (stamp, n)
+        os.replace(self.path, candidate)
+
+        self.open()
+        compressor.submit(self, candidate)
+
+    def write(self, text):
+        data = text.encode(self.encoding)
+        with self.lock:
+            if self.should_rotate(len(data)):
+                self.rotate()
+            self.file.write(data)
+            self.size += len(data)
+
+    def flush(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+class SharedRotatingHandler(logging.Handler):
+    """
+    Handler de logging para un archivo en el que escriben varios procesos a
+    la vez (varias ejecuciones de un CLI). Cada registro se escribe con un
+    flock sobre '<ruta>.lock', y bajo ese cerrojo:
+
+      - si otro proceso ha rotado el archivo (la ruta ya no es el archivo
+        abierto) se reabre la ruta,
+      - si el registro no cabe en 'max_bytes' se rota: renombrado,
+        compresión y poda, para que dos procesos nunca compriman ni borren
+        el mismo rotado,
+      - se escribe el registro.
+
+    Rotar el log de un CLI es raro y el archivo es pequeño, así que se
+    comprime en el momento en lugar de en un hilo que moriría con el proceso.
+    """
+
+    def __init__(self, path, max_bytes, backups=0, compress=True, encoding='utf-8'):
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.encoding = encoding
+        self.lock_file = open(self.path + '.lock', 'a')
+        self.file = None
+
+    def reopen_if_rotated(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        if self.file is not None:
+            if current is not None and os.path.samestat(current, os.fstat(self.file.fileno())):
+                return
+            self.file.close()
+        self.file = open(self.path, 'ab')
+
+    def rotate(self):
+        self.file.close()
+        candidate, _ = free_name(self.path, time.strftime('%Y%m%d-%H%M%S'))
+        os.replace(self.path, candidate)
+        self.file = open(self.path, 'ab')
+
+        # También los rotados que otro proceso dejara sin comprimir al morir
+        rotated = rotated_files(self.path)
+        if self.compress:
+            for path in rotated:
+                if not path.endswith('.gz'):
+                    compress_file(path)
+            rotated = rotated_files(self.path)
+        if self.backups:
+            for path in rotated[:-self.backups]:
+                os.remove(path)
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + '\n').encode(self.encoding)
+            if fcntl is not None:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            try:
+                self.reopen_if_rotated()
+                size = os.fstat(self.file.fileno()).st_size
+                if self.max_bytes and size and size + len(data) > self.max_bytes:
+                    self.rotate()
+                self.file.write(data)
+                self.file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.lock_file.close()
+        finally:
+            self.release()
+        super().close()
@@ -2,14 +2,85 @@ import socket
 import threading
 import json
 import os
+import time
 from datetime import datetime
+from escritor import GroupCommitWriter
+from almacen import SegmentedStore, parse_since
+from pubsub import Broker, ThreadSubscriber
+from metricas import Metrics, start_http
+from limites import AdmissionRefused, RateLimiter
+from ingesta_udp import UDPListener
+from replica import Follower
+import protocolo
+
+LINE_PREFIX = "Mensaje recibido: ".encode('utf-8')
+WHITESPACE = b' \t\n\r\x0b\x0c'
+
+class Session:
+    """Estado de una conexión en modo tramas"""
+
+    def __init__(self, addr, conn=None):
+        self.addr = addr
+        self.conn = conn
+        self.acked = 0
+        # ACK reutilizable: cada lote solo sobrescribe el identificador
+        self.ack = bytearray(protocolo.ACK_TEMPLATE)
+        self.subscriber = None
+        # (origen, offset, bytes) de un export pendiente de enviar tras la respuesta
+        self.export = None
+        # Las respuestas y las entregas de pub/sub comparten el socket
+        self.send_lock = threading.Lock()
 
 class TCPServer:
     def __init__(self, config_file='server_config.json'):
         self.config = self.load_config(config_file)
-        self.lock = threading.Lock()
+        self.writer = GroupCommitWriter(
+            fsync_policy=self.config['fsync_policy'],
+            fsync_messages=self.config['fsync_messages'],
+            fsync_interval_ms=self.config['fsync_interval_ms'],
+            max_queue=self.config['writer_queue_max'],
+            rotation={
+                'max_bytes': self.config['rotate_max_bytes'],
+                'interval': self.config['rotate_interval_s'],
+                'backups': self.config['rotate_backups'],
+                'compress': self.config['rotate_compress']
+            }
+        )
+        self.store = None
+        self.broker = Broker()
+        self.limiter = RateLimiter(
+            messages_per_second=self.config['rate_limit_messages'],
+            bytes_per_second=self.config['rate_limit_bytes'],
+            burst_seconds=self.config['rate_limit_burst'],
+            max_connections_per_ip=self.config['max_connections_per_ip']
+        )
+        self.metrics = Metrics()
+        self.metrics.gauge('writer_queue_depth', self.writer.pending)
+        self.metrics.gauge('writer_lost_items', lambda: self.writer.lost)
+        self.metrics.gauge('writer_shed_items', lambda: self.writer.shed)
+        self.metrics.gauge('pubsub_topics', lambda: len(self.broker.topics))
+        self.metrics.gauge('pubsub_delivered', lambda: self.broker.delivered)
+        self.metrics.gauge('pubsub_dropped', lambda: self.broker.dropped)
+        self.metrics.gauge('connections_refused', lambda: self.limiter.refused)
+        self.metrics.gauge('throttled_seconds', lambda: round(self.limiter.throttled_seconds, 3))
+        self.metrics.histogram('fsync', self.writer.fsync_latency)
+        self.metrics_http = None
+        self.udp = None
+        self.follower = None
+        # Un seguidor solo atiende lecturas: los mensajes llegan del líder
+        self.read_only = bool(self.config['replicate_from'])
+        # Índice del worker en modo pre-fork (None en un único proceso)
+        self.worker_index = None
+        self.commands = {
+            'query': self.command_query,
+            'subscribe': self.command_subscribe,
+            'unsubscribe': self.command_unsubscribe,
+            'stats': self.command_stats,
+            'replica_info': self.command_replica_info,
+            'export': self.command_export
+        }
         self.running = False
-        
+
     def load_config(self, config_file):
         """Carga y valida la configuración del servidor"""
         default_config = {
@@ -17,7 +88,39 @@ class TCPServer:
             "port": 808,
             "log_file": "server.log",
             "max_connections": 5,
-            "message_file": "messages.txt"
+            "backlog": 128,
+            "engine": "threads",
+            "workers": 1,
+            "reuse_port": False,
+            "message_file": "messages.txt",
+            "fsync_policy": "never",
+            "fsync_messages": 1000,
+            "fsync_interval_ms": 100,
+            "writer_queue_max": 100000,
+            "store_dir": "",
+            "segment_size": 64 * 1024 * 1024,
+            "index_interval": 4096,
+            "compress_after": 2,
+            "retention_segments": 0,
+            "subscriber_queue": 10000,
+            "slow_consumer_policy": "drop",
+            "metrics_port": 0,
+            "rate_limit_messages": 0,
+            "rate_limit_bytes": 0,
+            "rate_limit_burst": 1.0,
+            "max_connections_per_ip": 0,
+            "refuse_when_saturated": False,
+            "udp_port": 0,
+            "udp_batch": 256,
+            "udp_rcvbuf": 4 * 1024 * 1024,
+            "replicate_from": "",
+            "replica_fetch_bytes": 1024 * 1024,
+            "replica_wait_ms": 500,
+            "export_sendfile": True,
+            "rotate_max_bytes": 64 * 1024 * 1024,
+            "rotate_interval_s": 0,
+            "rotate_backups": 0,
+            "rotate_compress": True
         }
         
         try:
@@ -38,50 +141,416 @@ class TCPServer:
         """Registra actividad en el archivo de log"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         log_entry = f"[{timestamp}] {message}\n"
-        
-        with self.lock:
-            with open(self.config['log_file'], 'a') as f:
-                f.write(log_entry)
+        # Con la cola del escritor llena el log cede el sitio a los mensajes
+        self.writer.offer(self.config['log_file'], log_entry)
+
+    def admit(self, conn, addr):
+        """
+        Control de admisión tras accept(): devuelve el estado de la IP o None
+        si la conexión se rechaza (se cierra sin leer nada de ella).
 
-    def handle_client(self, conn, addr):
+        En el motor de hilos 'max_connections' solo limita las conexiones
+        simultáneas con 'refuse_when_saturated'; sin él es el tamaño de la
+        cola de listen() y se abre un hilo por conexión aceptada. El motor
+        asyncio lo aplica siempre (deja de llamar a accept()).
+        """
+        try:
+            if (self.config['refuse_when_saturated']
+                    and self.metrics.connections_active >= self.config['max_connections']):
+                self.limiter.refuse()
+                raise AdmissionRefused("servidor saturado")
+            return self.limiter.connect(addr[0])
+        except AdmissionRefused as e:
+            conn.close()
+            self.log_activity(f"Conexión de {addr} rechazada: {str(e)}")
+            return None
+
+    def handle_client(self, conn, addr, client):
         """Maneja la conexión con un cliente"""
         self.log_activity(f"Conexión establecida desde {addr}")
+        # Un búfer por conexión para todas las lecturas (recv_into, sin copias)
+        reader = protocolo.FrameReader()
         try:
-            while True:
-                data = conn.recv(1024)
-                if not data:
-                    break
-                
-                message = data.decode('utf-8').strip()
-                self.process_message(message, addr)
-                
-                response = f"Mensaje recibido: {message}"
-                conn.sendall(response.encode('utf-8'))
-                
+            received = reader.recv(conn, 1024)
+            if reader.is_framed():
+                self.handle_framed(conn, addr, reader, received, client)
+            else:
+                self.handle_lines(conn, addr, reader.view, received, client)
+
         except ConnectionResetError:
             self.log_activity(f"Conexión con {addr} reseteada")
+        except protocolo.ProtocolError as e:
+            self.log_activity(f"Error de protocolo con {addr}: {str(e)}")
         finally:
             conn.close()
+            self.limiter.disconnect(client)
+            self.metrics.connection_closed()
             self.log_activity(f"Conexión con {addr} cerrada")
 
+    def handle_lines(self, conn, addr, view, received, client):
+        """Modo de línea original: cada lectura es un mensaje"""
+        view = view[:1024]
+        while received:
+            refusal = self.write_refusal()
+            if refusal:
+                conn.sendall(f"Error: {refusal}".encode('utf-8'))
+                return
+            started = time.perf_counter()
+            # Se recortan los espacios sobre el búfer en lugar de copiar y hacer strip()
+            start, end = 0, received
+            while start < end and view[start] in WHITESPACE:
+                start += 1
+            while end > start and view[end - 1] in WHITESPACE:
+                end -= 1
+            self.process_message(protocolo.decode_text(view[start:end]), addr)
+
+            response = LINE_PREFIX + view[start:end]
+            self.metrics.record(1, received, len(response), time.perf_counter() - started)
+            conn.sendall(response)
+            # Por encima del límite de la IP se deja de leer: el exceso espera en TCP
+            delay = self.limiter.consume(client, 1, received)
+            if delay:
+                time.sleep(delay)
+            received = conn.recv_into(view)
+
+    def handle_framed(self, conn, addr, reader, received, client):
+        """Modo con tramas: procesa todas las tramas de cada lectura y confirma en bloque"""
+        session = Session(addr, conn)
+        try:
+            while received:
+                started = time.perf_counter()
+                acked = session.acked
+                response = self.handle_frames(reader.frames(), session)
+                self.metrics.record(session.acked - acked, received, len(response),
+                                    time.perf_counter() - started)
+                if response:
+                    with session.send_lock:
+                        conn.sendall(response)
+                if session.export:
+                    with session.send_lock:
+                        self.send_export(conn, session.export)
+                    return
+                delay = self.limiter.consume(client, session.acked - acked, received)
+                if delay:
+                    time.sleep(delay)
+                received = reader.recv(conn)
+        finally:
+            self.close_session(session)
+
+    def handle_frames(self, frames, session):
+        """
+        Procesa un lote de tramas y devuelve los bytes de respuesta. El
+        contenido puede ser bytes o memoryview; si solo hay ACK se devuelve
+        session.ack, que se reutiliza en el siguiente lote.
+        """
+        acked = session.acked
+        responses = []
+        refusal = self.write_refusal()
+        publish_refusal = refusal or self.prefork_refusal('La publicación')
+        for frame_type, payload in frames:
+            reason = publish_refusal if frame_type == protocolo.PUBLISH else refusal
+            if reason and frame_type in (protocolo.MSG, protocolo.PUBLISH):
+                # Sin ACK: el cliente no da por guardado lo que no se puede escribir
+                responses.append(protocolo.encode_frame(protocolo.ERROR, reason.encode('utf-8')))
+            elif frame_type in (protocolo.MSG, protocolo.PUBLISH):
+                # Un texto no válido se rechaza con ERROR y sin ACK; el resto
+                # del lote se procesa y se confirma normalmente
+                try:
+                    if frame_type == protocolo.MSG:
+                        topic, message = None, protocolo.decode_text(payload)
+                    else:
+                        topic, message = protocolo.decode_publish(payload)
+                except protocolo.ProtocolError as e:
+                    responses.append(protocolo.encode_frame(protocolo.ERROR, str(e).encode('utf-8')))
+                    continue
+                self.process_message(message, session.addr)
+                session.acked += 1
+                if topic is not None:
+                    self.broker.publish(topic, payload)
+            elif frame_type == protocolo.COMMAND:
+                responses.append(self.execute_command(payload, session))
+                if session.export:
+                    # Tras un export solo viajan sus bytes: se ignora el resto del lote
+                    break
+            elif frame_type == protocolo.FETCH:
+                responses.append(self.execute_fetch(payload))
+            else:
+                error = f"Tipo de trama desconocido: {frame_type}"
+                responses.append(protocolo.encode_frame(protocolo.ERROR, error.encode('utf-8')))
+
+        # Un único ACK acumulativo por lote en lugar de uno por mensaje
+        if session.acked != acked:
+            ack = protocolo.fill_ack(session.ack, session.acked)
+            if not responses:
+                return ack
+            responses.append(ack)
+        return b''.join(responses)
+
+    def parse_command(self, payload):
+        """Decodifica una trama COMMAND y devuelve (petición, manejador)"""
+        request = protocolo.decode_json(payload)
+        handler = self.commands.get(request.get('cmd'))
+        if handler is None:
+            raise ValueError(f"Comando desconocido: {request.get('cmd')}")
+        return request, handler
+
+    def execute_command(self, payload, session):
+        """Ejecuta una trama COMMAND y devuelve la trama RESPONSE"""
+        try:
+            request, handler = self.parse_command(payload)
+            result = {'ok': True, **handler(request, session)}
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        return protocolo.encode_json(protocolo.RESPONSE, result)
+
+    def execute_fetch(self, payload):
+        """Trama FETCH de un seguidor: registros del almacén desde un offset"""
+        try:
+            if self.store is None:
+                raise ValueError("El almacén de mensajes no está activado")
+            offset, max_bytes, wait_ms = protocolo.decode_fetch(payload)
+            # Espera larga: si no hay nada nuevo se contesta al llegar datos o al vencer
+            if offset >= self.store.end_offset and wait_ms:
+                self.store.wait_for(offset, wait_ms / 1000)
+            data = self.store.read_from(offset, min(max_bytes, protocolo.MAX_FRAME // 2))
+            return protocolo.encode_replica(offset, self.store.end_offset, data)
+        except (ValueError, protocolo.ProtocolError, OSError) as e:
+            return protocolo.encode_frame(protocolo.ERROR, str(e).encode('utf-8'))
+
+    def command_replica_info(self, request, session):
+        """{"cmd": "replica_info"}: lo que necesita un seguidor para empezar"""
+        if self.store is None:
+            raise ValueError("El almacén de mensajes no está activado")
+        return {
+            'start_offset': self.store.start_offset,
+            'end_offset': self.store.end_offset
+        }
+
+    def command_export(self, request, session):
+        """
+        Exportación masiva del histórico:
+        {"cmd": "export", "source": "store" | "messages", "offset": N, "length": L}
+        Tras la respuesta se envían exactamente 'length' bytes crudos y se cierra
+        la conexión; para reanudar basta pedir offset + lo ya recibido.
+        Con 'messages' se exporta el archivo activo: sus offsets vuelven a 0
+        al rotarlo (los rotados quedan como messages.txt.<fecha>.gz).
+        """
+        source = request.get('source', 'store')
+        if source == 'store':
+            if self.store is None:
+                raise ValueError("El almacén de mensajes no está activado")
+            start, end = self.store.start_offset, self.store.end_offset
+        elif source == 'messages':
+            self.check_single_process('La exportación de messages')
+            path = self.config['message_file']
+            start, end = 0, os.path.getsize(path) if os.path.exists(path) else 0
+        else:
+            raise ValueError(f"Origen de exportación desconocido: {source}")
+
+        offset = int(request.get('offset', start))
+        if not start <= offset <= end:
+            raise ValueError(f"Offset {offset} fuera de [{start}, {end}]")
+        length = end - offset
+        if request.get('length') is not None:
+            length = max(0, min(int(request['length']), length))
+
+        session.export = (source, offset, length)
+        return {'source': source, 'offset': offset, 'length': length, 'end_offset': end}
+
+    def export_ranges(self, source, offset, length):
+        """
+        Trozos de un export como (ruta, posición, bytes, lectura): se envían
+        desde el archivo; 'lectura' devuelve el contenido cuando no hay archivo
+        sin comprimir (segmentos con gzip o compactados mientras tanto)
+        """
+        if source == 'messages':
+            if length:
+                yield self.config['message_file'], offset, length, None
+            return
+
+        end = offset + length
+        for segment, size in self.store.snapshot():
+            low = max(offset, segment.base)
+            high = min(end, segment.base + size)
+            if low >= high:
+                continue
+            start, stop = low - segment.base, high - segment.base
+            path = None if segment.compressed else segment.path
+            yield path, start, stop - start, lambda s=segment, a=start, b=stop: s.read(a, b)
+
+    def send_export(self, conn, export):
+        """Envía los bytes de un export; con sendfile el kernel los copia sin pasar por Python"""
+        for path, position, count, read in self.export_ranges(*export):
+            try:
+                if path is None:
+                    raise FileNotFoundError(path)
+                with open(path, 'rb') as f:
+                    if self.config['export_sendfile']:
+                        conn.sendfile(f, position, count)
+                    else:
+                        f.seek(position)
+                        while count > 0:
+                            chunk = f.read(min(count, 1024 * 1024))
+                            if not chunk:
+                                break
+                            conn.sendall(chunk)
+                            count -= len(chunk)
+            except FileNotFoundError:
+                conn.sendall(read())
+
+    def command_query(self, request, session):
+        """
+        Consulta del histórico:
+        {"cmd": "query", "last": N, "ip": "..."} o
+        {"cmd": "query", "since": "YYYY-mm-dd HH:MM:SS" | epoch, "ip": "...", "limit": N}
+        """
+        if self.store is None:
+            raise ValueError("El almacén de mensajes no está activado")
+
+        limit = min(int(request.get('limit', 1000)), 10000)
+        if 'last' in request:
+            records = self.store.last(min(int(request['last']), limit), ip=request.get('ip'))
+        else:
+            records = self.store.since(parse_since(request.get('since')), ip=request.get('ip'), limit=limit)
+
+        return {'messages': [
+            {'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)), 'ip': ip, 'message': message}
+            for ts, ip, message in records
+        ]}
+
+    def command_subscribe(self, request, session):
+        """{"cmd": "subscribe", "topic": T}: los PUBLISH en T llegan como tramas DELIVER"""
+        self.check_single_process('La suscripción')
+        topic = request['topic']
+        if session.subscriber is None:
+            session.subscriber = self.create_subscriber(session)
+        self.broker.subscribe(topic, session.subscriber)
+        if self.follower is not None:
+            self.follower.follow_topic(topic)
+        return {'topic': topic}
+
+    def command_unsubscribe(self, request, session):
+        """{"cmd": "unsubscribe", "topic": T}"""
+        if session.subscriber is not None:
+            self.broker.unsubscribe(request['topic'], session.subscriber)
+        return {'topic': request['topic']}
+
+    def command_stats(self, request, session):
+        """{"cmd": "stats"}: contadores, indicadores y percentiles de latencia"""
+        return {'stats': self.metrics.snapshot()}
+
+    def create_subscriber(self, session):
+        """Suscriptor propio del motor de hilos"""
+        return ThreadSubscriber(session.conn, session.send_lock,
+                                max_queue=self.config['subscriber_queue'],
+                                policy=self.config['slow_consumer_policy'])
+
+    def close_session(self, session):
+        """Da de baja las suscripciones de una conexión que se cierra"""
+        if session.subscriber is not None:
+            self.broker.unsubscribe_all(session.subscriber)
+            session.subscriber.stop()
+
+    def open_store(self):
+        """Abre el almacén segmentado si se indica store_dir (por defecto desactivado)"""
+        if self.config['store_dir'] and self.store is None:
+            self.store = SegmentedStore(
+                self.config['store_dir'],
+                segment_size=self.config['segment_size'],
+                index_interval=self.config['index_interval'],
+                compress_after=self.config['compress_after'],
+                retention_segments=self.config['retention_segments']
+            )
+            self.store.start_maintenance()
+            self.metrics.gauge('store_bytes', lambda: self.store.end_offset)
+
+    def start_metrics(self):
+        """Arranca el endpoint HTTP de métricas si está configurado"""
+        if self.config['metrics_port'] and self.metrics_http is None:
+            self.metrics_http = start_http(self.metrics, self.config['metrics_port'])
+
+    def start_replica(self):
+        """En modo seguidor, arranca la réplica del almacén del líder"""
+        if not self.read_only or self.follower is not None:
+            return
+        if self.store is None:
+            raise ValueError("Un seguidor necesita 'store_dir' para replicar el almacén")
+        self.follower = Follower(self, self.config['replicate_from'],
+                                 fetch_bytes=self.config['replica_fetch_bytes'],
+                                 wait_ms=self.config['replica_wait_ms'])
+        self.metrics.gauge('replication_offset', lambda: self.follower.offset)
+        self.metrics.gauge('replication_lag_bytes', self.follower.lag_bytes)
+        self.metrics.gauge('replication_lag_seconds', self.follower.lag_seconds)
+        self.follower.start()
+
+    def start_udp(self):
+        """Arranca la ingesta UDP si está configurada"""
+        if self.config['udp_port'] and self.udp is None and not self.read_only:
+            self.udp = UDPListener(self, self.config['host'], self.config['udp_port'],
+                                   batch=self.config['udp_batch'],
+                                   rcvbuf=self.config['udp_rcvbuf'],
+                                   reuse_port=self.config['reuse_port'])
+            self.metrics.gauge('udp_datagrams', lambda: self.udp.datagrams)
+            self.metrics.gauge('udp_invalid', lambda: self.udp.invalid)
+            self.metrics.gauge('udp_shed', lambda: self.udp.shed)
+            self.metrics.gauge('udp_kernel_drops', self.udp.kernel_drops)
+            self.udp.start()
+            self.log_activity(f"Ingesta UDP en {self.config['host']}:{self.config['udp_port']}")
+
+    def prefork_refusal(self, feature):
+        """
+        Motivo para rechazar lo que necesita ver todo el tráfico, o None. En
+        modo pre-fork cada worker solo tiene las conexiones que le reparte el
+        kernel: sus suscriptores y su messages.txt son una parte del total.
+        """
+        if self.worker_index is None:
+            return None
+        return f"{feature} no está disponible en modo pre-fork (cada worker solo ve sus conexiones)"
+
+    def check_single_process(self, feature):
+        refusal = self.prefork_refusal(feature)
+        if refusal:
+            raise ValueError(refusal)
+
+    def write_refusal(self):
+        """Motivo para rechazar los mensajes de los clientes, o None si se aceptan"""
+        if self.read_only:
+            return "Servidor de solo lectura (réplica): envíe los mensajes al líder"
+        if self.writer.error is not None:
+            return f"Fallo de escritura en el servidor: {self.writer.error}"
+        if self.writer.full():
+            return "Cola de escritura llena: reintente más tarde"
+        if not self.running:
+            # Lo que llegue mientras se cierra el escritor podría no escribirse
+            return "Servidor deteniéndose: reintente más tarde"
+        return None
+
     def process_message(self, message, addr):
         """Procesa y almacena los mensajes recibidos"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        now = time.time()
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
         entry = f"{timestamp} | {addr[0]} | {message}\n"
-        
-        with self.lock:
-            with open(self.config['message_file'], 'a') as f:
-                f.write(entry)
-        
+        self.writer.write(self.config['message_file'], entry, messages=1)
+        if self.store is not None:
+            self.writer.write(self.store, (now, addr[0], message))
+
         self.log_activity(f"Mensaje de {addr[0]}: {message}")
 
     def start(self):
         """Inicia el servidor"""
         self.running = True
+        self.open_store()
+        self.writer.start()
+        self.start_metrics()
+        self.start_udp()
+        self.start_replica()
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                 s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.config['reuse_port']:
+                    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
                 s.bind((self.config['host'], self.config['port']))
+                # Cola de accept(), no un límite de conexiones (ver admit())
                 s.listen(self.config['max_connections'])
                 
                 self.log_activity(f"Servidor iniciado en {self.config['host']}:{self.config['port']}")
@@ -89,9 +558,16 @@ class TCPServer:
                 
                 while self.running:
                     conn, addr = s.accept()
-                    thread = threading.Thread(target=self.handle_client, args=(conn, addr))
+                    client = self.admit(conn, addr)
+                    if client is None:
+                        continue
+                    # daemon, como las tareas del motor asyncio: al detener el
+                    # servidor, las conexiones abiertas no impiden que el proceso salga
+                    thread = threading.Thread(target=self.handle_client, args=(conn, addr, client),
+                                              daemon=True)
+                    active = self.metrics.connection_opened()
                     thread.start()
-                    self.log_activity(f"Conexiones activas: {threading.active_count() - 1}")
+                    self.log_activity(f"Conexiones activas: {active}")
                     
         except KeyboardInterrupt:
             self.stop()
@@ -103,8 +579,23 @@ class TCPServer:
         """Detiene el servidor"""
         self.running = False
         self.log_activity("Servidor detenido")
+        if self.metrics_http is not None:
+            self.metrics_http.shutdown()
+        if self.udp is not None:
+            self.udp.stop()
+        if self.follower is not None:
+            self.follower.stop()
+        self.writer.close()
+        if self.store is not None:
+            self.store.close()
         print("\nServidor detenido")
 
 if __name__ == "__main__":
     server = TCPServer()
+    if server.config['workers'] > 1:
+        from prefork import PreforkSupervisor
+        server = PreforkSupervisor()
+    elif server.config['engine'] == 'asyncio':
+        from servidor_async import AsyncTCPServer
+        server = AsyncTCPServer()
     server.start()
\ No newline at end of file
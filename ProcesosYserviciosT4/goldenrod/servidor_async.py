@@ -0,0 +1,224 @@
+import asyncio
+import socket
+import time
+from itertools import groupby
+
+import protocolo
+from pubsub import AsyncSubscriber
+from servidor import Session, TCPServer
+
+class AsyncTCPServer(TCPServer):
+    """
+    Motor asyncio del servidor: una corrutina por conexión en lugar de un
+    hilo, con el mismo archivo de configuración y los mismos mensajes.
+    'max_connections' es aquí un límite real de conexiones simultáneas.
+    """
+
+    OFFLOADED = (protocolo.COMMAND, protocolo.FETCH)
+
+    def __init__(self, config_file='server_config.json'):
+        super().__init__(config_file)
+        self.slots = None
+        self.tasks = set()
+        # Comandos que leen del almacén y se ejecutan en un hilo aparte
+        self.blocking_commands = {'query'}
+
+    async def handle_client(self, reader, writer, client):
+        """Maneja la conexión con un cliente"""
+        addr = writer.get_extra_info('peername')
+        self.log_activity(f"Conexión establecida desde {addr}")
+        try:
+            data = await reader.read(1024)
+            if protocolo.is_framed(data):
+                await self.handle_framed(reader, writer, addr, data, client)
+                data = b''
+
+            # Modo de línea original: cada lectura es un mensaje
+            while data:
+                refusal = self.write_refusal()
+                if refusal:
+                    writer.write(f"Error: {refusal}".encode('utf-8'))
+                    await writer.drain()
+                    break
+                started = time.perf_counter()
+                message = protocolo.decode_text(data).strip()
+                self.process_message(message, addr)
+
+                response = f"Mensaje recibido: {message}".encode('utf-8')
+                self.metrics.record(1, len(data), len(response), time.perf_counter() - started)
+                writer.write(response)
+                await writer.drain()
+                # Por encima del límite de la IP se deja de leer: el exceso espera en TCP
+                delay = self.limiter.consume(client, 1, len(data))
+                if delay:
+                    await asyncio.sleep(delay)
+                data = await reader.read(1024)
+
+        except ConnectionResetError:
+            self.log_activity(f"Conexión con {addr} reseteada")
+        except protocolo.ProtocolError as e:
+            self.log_activity(f"Error de protocolo con {addr}: {str(e)}")
+        finally:
+            writer.close()
+            self.limiter.disconnect(client)
+            self.metrics.connection_closed()
+            self.slots.release()
+            self.log_activity(f"Conexión con {addr} cerrada")
+
+    async def handle_framed(self, reader, writer, addr, data, client):
+        """Modo con tramas: procesa todas las tramas de cada lectura y confirma en bloque"""
+        decoder = protocolo.FrameDecoder()
+        session = Session(addr, writer)
+        try:
+            while data:
+                frames = decoder.feed(data)
+                acked = session.acked
+                elapsed = 0
+                sent = 0
+                # Los comandos y las peticiones de réplica se ejecutan aparte para
+                # poder llevar las lecturas del almacén (y la espera larga de FETCH)
+                # a un hilo; el resto de tramas se procesan en línea
+                for offloaded, group in groupby(frames, key=lambda f: f[0] in self.OFFLOADED):
+                    if offloaded:
+                        for frame_type, payload in group:
+                            if frame_type == protocolo.FETCH:
+                                response = await asyncio.to_thread(self.execute_fetch, payload)
+                            else:
+                                response = await self.execute_command_async(payload, session)
+                            sent += len(response)
+                            writer.write(response)
+                            if session.export:
+                                # Tras un export solo viajan sus bytes y se cierra la conexión
+                                await writer.drain()
+                                await self.send_export_async(writer, session.export)
+                                return
+                    else:
+                        started = time.perf_counter()
+                        response = self.handle_frames(list(group), session)
+                        elapsed += time.perf_counter() - started
+                        if response:
+                            sent += len(response)
+                            # El transporte puede quedarse con una referencia y
+                            # session.ack se reutiliza: se escribe una copia
+                            writer.write(bytes(response))
+                self.metrics.record(session.acked - acked, len(data), sent, elapsed)
+                await writer.drain()
+                delay = self.limiter.consume(client, session.acked - acked, len(data))
+                if delay:
+                    await asyncio.sleep(delay)
+                data = await reader.read(65536)
+        finally:
+            self.close_session(session)
+
+    async def execute_command_async(self, payload, session):
+        """Como execute_command, pero sin bloquear el bucle en las consultas"""
+        try:
+            request, handler = self.parse_command(payload)
+            if request['cmd'] in self.blocking_commands:
+                result = await asyncio.to_thread(handler, request, session)
+            else:
+                result = handler(request, session)
+            result = {'ok': True, **result}
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        return protocolo.encode_json(protocolo.RESPONSE, result)
+
+    async def send_export_async(self, writer, export):
+        """Envía un export; loop.sendfile usa os.sendfile sobre el socket del transporte"""
+        loop = asyncio.get_running_loop()
+        for path, position, count, read in self.export_ranges(*export):
+            try:
+                if path is None:
+                    raise FileNotFoundError(path)
+                with open(path, 'rb') as f:
+                    if self.config['export_sendfile']:
+                        await loop.sendfile(writer.transport, f, position, count)
+                    else:
+                        f.seek(position)
+                        while count > 0:
+                            chunk = f.read(min(count, 1024 * 1024))
+                            if not chunk:
+                                break
+                            writer.write(chunk)
+                            await writer.drain()
+                            count -= len(chunk)
+            except FileNotFoundError:
+                writer.write(await asyncio.to_thread(read))
+                await writer.drain()
+
+    def create_subscriber(self, session):
+        """Suscriptor propio del motor asyncio (session.conn es el StreamWriter)"""
+        return AsyncSubscriber(session.conn,
+                               max_queue=self.config['subscriber_queue'],
+                               policy=self.config['slow_consumer_policy'])
+
+    def create_listener(self):
+        """Crea el socket de escucha no bloqueante"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.config['reuse_port']:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.config['host'], self.config['port']))
+        sock.listen(self.config['backlog'])
+        sock.setblocking(False)
+        return sock
+
+    async def serve(self, sock):
+        """Bucle de aceptación con control de conexiones simultáneas"""
+        loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.config['max_connections'])
+
+        refuse = self.config['refuse_when_saturated']
+
+        while self.running:
+            # Backpressure: con el límite alcanzado no se llama a accept() y los
+            # clientes nuevos esperan en la cola del kernel (backlog). Con
+            # 'refuse_when_saturated' se aceptan y se cierran en admit()
+            if not refuse:
+                await self.slots.acquire()
+            try:
+                conn, addr = await loop.sock_accept(sock)
+            except Exception:
+                if not refuse:
+                    self.slots.release()
+                raise
+
+            client = self.admit(conn, addr)
+            if client is None:
+                if not refuse:
+                    self.slots.release()
+                continue
+            if refuse:
+                await self.slots.acquire()
+
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            reader, writer = await asyncio.open_connection(sock=conn)
+            self.metrics.connection_opened()
+
+            task = asyncio.create_task(self.handle_client(reader, writer, client))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def start(self):
+        """Inicia el servidor"""
+        self.running = True
+        self.open_store()
+        self.writer.start()
+        self.start_metrics()
+        self.start_udp()
+        self.start_replica()
+        try:
+            with self.create_listener() as sock:
+                self.log_activity(f"Servidor asyncio iniciado en {self.config['host']}:{self.config['port']}")
+                print(f"Servidor (asyncio) escuchando en {self.config['host']}:{self.config['port']}")
+                asyncio.run(self.serve(sock))
+
+        except KeyboardInterrupt:
+            self.stop()
+        except Exception as e:
+            self.log_activity(f"Error crítico: {str(e)}")
+            self.stop()
+
+if __name__ == "__main__":
+    server = AsyncTCPServer()
+    server.start()
@@ -0,0 +1,224 @@
+# funciones/agregados.py
+"""
+Agregados incrementales para los dashboards de ProcesosYserviciosT5.
+
+Mientras se recorren los logs se mantienen dos agregados:
+ - Peticiones por día × hora (mapa de calor de 24 columnas)
+ - Flujos país → tipo de User Agent → código de estado (diagrama Sankey)
+
+Cada ejecución sólo lee los bytes nuevos de cada log (se guarda el offset
+por archivo) y reescribe dos JSON compactos con la forma que esperan los
+widgets, de modo que los dashboards no tienen que consultar los logs.
+"""
+
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+DIR_T5 = os.path.join(BASE_DIR, os.pardir, os.pardir, 'ProcesosYserviciosT5')
+
+CONFIG = {
+    'RUTA_ESTADO': os.path.join(BASE_DIR, 'agregados_estado.json'),
+    'RUTA_HEATMAP': os.path.join(DIR_T5, 'mapa de calor', 'heatmap_datos.json'),
+    'RUTA_SANKEY': os.path.join(DIR_T5, 'Sankey', 'sankey_datos.json'),
+    'RUTA_GEOLITE': 'GeoLite2-Country.mmdb',
+    'DIAS_HEATMAP': 31,  # Filas (días) que se publican en el mapa de calor
+    'TAM_LECTURA': 1 << 20
+}
+
+# Formato "combined" de Apache
+PATRON_LINEA = re.compile(
+    r'^(?P<ip>\S+) \S+ \S+ \[(?P<fecha>[^\]]+)\] "[^"]*" (?P<estado>\d{3}) \S+'
+    r'(?: "[^"]*" "(?P<user_agent>[^"]*)")?'
+)
+
+UA_HERRAMIENTAS = ('curl', 'wget', 'sqlmap', 'nikto', 'nmap', 'python', 'go-http')
+UA_BOTS = ('bot', 'crawler', 'spider', 'slurp')
+
+def clasificar_user_agent(user_agent: Optional[str]) -> str:
+    """Reduce un User Agent a una clase apta para el diagrama"""
+    ua = (user_agent or '').lower().strip()
+    if ua in ('', '-'):
+        return 'Vacío'
+    if any(h in ua for h in UA_HERRAMIENTAS):
+        return 'Herramienta'
+    if any(b in ua for b in UA_BOTS):
+        return 'Bot'
+    if ua.startswith('mozilla'):
+        return 'Navegador'
+    return 'Otro'
+
+class ResolutorPais:
+    """Resuelve países con GeoIP si está disponible, cacheando por IP"""
+
+    def __init__(self, ruta_geolite: str):
+        self.cache = {}
+        self.lector = None
+        try:
+            import geoip2.database
+            if os.path.exists(ruta_geolite):
+                self.lector = geoip2.database.Reader(ruta_geolite)
+        except ImportError:
+            pass
+
+    def pais(self, ip: str) -> str:
+        if self.lector is None:
+            return 'Desconocido'
+        pais = self.cache.get(ip)
+        if pais is None:
+            try:
+                pais = self.lector.country(ip).country.name or 'Desconocido'
+            except Exception:
+                pais = 'Desconocido'
+            self.cache[ip] = pais
+        return pais
+
+    def cerrar(self):
+        if self.lector is not None:
+            self.lector.close()
+
+class Agregados:
+    """Estado acumulado de los agregados y offsets de lectura por log"""
+
+    def __init__(self, ruta_estado: str):
+        self.ruta_estado = ruta_estado
+        self.fuentes = {}
+        self.horas = defaultdict(lambda: [0] * 24)
+        self.flujos = Counter()
+        self.cargar()
+
+    def cargar(self):
+        if not os.path.exists(self.ruta_estado):
+            return
+        with open(self.ruta_estado, 'r') as f:
+            estado = json.load(f)
+        self.fuentes = estado.get('fuentes', {})
+        for dia, valores in estado.get('horas', {}).items():
+            self.horas[dia] = valores
+        for clave, valor in estado.get('flujos', {}).items():
+            self.flujos[tuple(clave.split('|'))] = valor
+
+    def guardar(self):
+        estado = {
+            'fuentes': self.fuentes,
+            'horas': dict(self.horas),
+            'flujos': {'|'.join(clave): valor for clave, valor in self.flujos.items()}
+        }
+        escribir_json(self.ruta_estado, estado)
+
+    def registrar(self, linea: str, resolutor: ResolutorPais) -> bool:
+        """Añade una línea de log a los agregados"""
+        match = PATRON_LINEA.match(linea)
+        if not match:
+            return False
+        try:
+            fecha = datetime.strptime(match.group('fecha').split()[0], '%d/%b/%Y:%H:%M:%S')
+        except ValueError:
+            return False
+
+        self.horas[fecha.strftime('%Y-%m-%d')][fecha.hour] += 1
+        self.flujos[(
+            resolutor.pais(match.group('ip')),
+            clasificar_user_agent(match.group('user_agent')),
+            f"{match.group('estado')[0]}xx"
+        )] += 1
+        return True
+
+    def escanear(self, ruta_log: str, resolutor: ResolutorPais) -> int:
+        """Procesa sólo las líneas completas añadidas desde la última ejecución"""
+        info = os.stat(ruta_log)
+        fuente = self.fuentes.get(ruta_log, {})
+        offset = fuente.get('offset', 0)
+
+        # Si el log ha rotado (otro inodo o más pequeño) se empieza de cero
+        if fuente.get('inodo') != info.st_ino or info.st_size < offset:
+            offset = 0
+
+        procesadas = 0
+        resto = b''
+        with open(ruta_log, 'rb') as f:
+            f.seek(offset)
+            while True:
+                bloque = f.read(CONFIG['TAM_LECTURA'])
+                if not bloque:
+                    break
+                lineas = (resto + bloque).split(b'\n')
+                resto = lineas.pop()
+                for linea in lineas:
+                    if self.registrar(linea.decode('utf-8', 'replace'), resolutor):
+                        procesadas += 1
+                offset += len(bloque)
+
+        # Una línea a medio escribir se volverá a leer en la siguiente pasada
+        self.fuentes[ruta_log] = {'inodo': info.st_ino, 'offset': offset - len(resto)}
+        return procesadas
+
+    def datos_heatmap(self, dias: int) -> Dict:
+        """Filas de 24 columnas (una por hora) para el mapa de calor"""
+        ultimos = sorted(self.horas)[-dias:]
+        return {
+            'columnas': list(range(24)),
+            'filas': ultimos,
+            'valores': [self.horas[dia] for dia in ultimos]
+        }
+
+    def datos_sankey(self) -> Dict:
+        """Nodos y enlaces {nodes, links} para SankeyFlow.createSankeyChart"""
+        indices = {}
+        nodes = []
+
+        def nodo(nombre: str) -> int:
+            if nombre not in indices:
+                indices[nombre] = len(nodes)
+                nodes.append({'name': nombre})
+            return indices[nombre]
+
+        enlaces = Counter()
+        for (pais, ua, estado), valor in self.flujos.items():
+            enlaces[(nodo(pais), nodo(f"UA {ua}"))] += valor
+            enlaces[(nodo(f"UA {ua}"), nodo(f"HTTP {estado}"))] += valor
+
+        links = [{'source': s, 'target': t, 'value': v}
+                 for (s, t), v in sorted(enlaces.items())]
+        return {'nodes': nodes, 'links': links}
+
+def escribir_json(ruta: str, datos) -> None:
+    """Escribe JSON compacto de forma atómica (temporal + rename)"""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, separators=(',', ':'), ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+def main(rutas_log: Iterable[str], dry_run: bool = False) -> List[int]:
+    """Actualiza los agregados con los logs indicados y publica los JSON"""
+    print("=== Ivory - Agregados para dashboards ===")
+    agregados = Agregados(CONFIG['RUTA_ESTADO'])
+    resolutor = ResolutorPais(CONFIG['RUTA_GEOLITE'])
+
+    procesadas = []
+    try:
+        for ruta in rutas_log:
+            if not os.path.exists(ruta):
+                print(f"❌ Archivo de logs no encontrado: {ruta}")
+                continue
+            total = agregados.escanear(ruta, resolutor)
+            procesadas.append(total)
+            print(f" - {ruta}: {total} líneas nuevas")
+    finally:
+        resolutor.cerrar()
+
+    if dry_run:
+        print("Modo simulación: no se escriben los agregados")
+        return procesadas
+
+    agregados.guardar()
+    escribir_json(CONFIG['RUTA_HEATMAP'], agregados.datos_heatmap(CONFIG['DIAS_HEATMAP']))
+    escribir_json(CONFIG['RUTA_SANKEY'], agregados.datos_sankey())
+    print(f"📊 Mapa de calor: {CONFIG['RUTA_HEATMAP']}")
+    print(f"📊 Sankey: {CONFIG['RUTA_SANKEY']}")
+    return procesadas
@@ -0,0 +1,237 @@
+# funciones/multihost.py
+"""
+Modo multi-host: analiza los access.log de varios front-ends en paralelo,
+fusiona los resultados en una base de datos de estado compartida y genera
+una única lista de bloqueo consolidada para todos los hosts.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Set
+
+from funciones.user_agent_block import procesar_logs as detectar_user_agents
+
+# Configuración por defecto del modo multi-host
+CONFIG = {
+    'RUTA_ESTADO': 'ivory_estado.db',
+    'RUTA_GEOLITE': 'GeoLite2-Country.mmdb',
+    'MAX_PROCESOS': os.cpu_count() or 2,
+    'TIMEOUT_BLOQUEO': 30  # Segundos esperando el lock de la base de datos
+}
+
+MARCADOR_INICIO = "# BEGIN Ivory Bloqueo Consolidado"
+MARCADOR_FIN = "# END Ivory Bloqueo Consolidado"
+
+def conectar_estado(ruta_estado: str) -> sqlite3.Connection:
+    """Abre la base de datos de estado y crea las tablas si no existen"""
+    conn = sqlite3.connect(ruta_estado, timeout=CONFIG['TIMEOUT_BLOQUEO'])
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''CREATE TABLE IF NOT EXISTS bloqueos (
+                    ip TEXT NOT NULL,
+                    motivo TEXT NOT NULL,
+                    host TEXT NOT NULL,
+                    primera_vez TEXT NOT NULL,
+                    ultima_vez TEXT NOT NULL,
+                    PRIMARY KEY (ip, motivo, host)
+                    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS fuentes (
+                    host TEXT PRIMARY KEY,
+                    ruta_log TEXT NOT NULL,
+                    ultima_ejecucion TEXT NOT NULL,
+                    ips_detectadas INTEGER DEFAULT 0
+                    )''')
+    conn.commit()
+    return conn
+
+def cargar_hosts(ruta_config: str) -> List[Dict[str, str]]:
+    """
+    Carga la lista de hosts desde un JSON con el formato:
+    [{"host": "web1", "log": "/ruta/access.log", "htaccess": "/ruta/.htaccess"}, ...]
+    """
+    with open(ruta_config, 'r') as f:
+        hosts = json.load(f)
+
+    for entrada in hosts:
+        for campo in ('host', 'log', 'htaccess'):
+            if campo not in entrada:
+                raise ValueError(f"Falta el campo '{campo}' en la entrada {entrada}")
+    return hosts
+
+def detectar_paises(ruta_log: str, ruta_geolite: str) -> Set[str]:
+    """Detector por país; se omite si no hay geoip2 o base de datos GeoLite"""
+    try:
+        import geoip2.database
+        from funciones.pais import procesar_logs, filtrar_por_pais
+    except ImportError:
+        return set()
+
+    if not os.path.exists(ruta_geolite):
+        return set()
+
+    ips = procesar_logs(ruta_log)
+    with geoip2.database.Reader(ruta_geolite) as lector:
+        return filtrar_por_pais(ips, lector)
+
+def registrar_resultados(ruta_estado: str, host: str, ruta_log: str,
+                         resultados: Dict[str, Set[str]]) -> int:
+    """Fusiona los resultados de un host en la base de datos compartida"""
+    ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    filas = [(ip, motivo, host, ahora, ahora)
+             for motivo, ips in resultados.items() for ip in ips]
+
+    conn = conectar_estado(ruta_estado)
+    try:
+        # BEGIN IMMEDIATE toma el lock de escritura antes de leer: los
+        # procesos de otros hosts esperan en lugar de fallar a mitad de fusión
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany('''INSERT INTO bloqueos (ip, motivo, host, primera_vez, ultima_vez)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(ip, motivo, host)
+                            DO UPDATE SET ultima_vez = excluded.ultima_vez''', filas)
+        conn.execute('''INSERT INTO fuentes (host, ruta_log, ultima_ejecucion, ips_detectadas)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(host) DO UPDATE SET
+                            ruta_log = excluded.ruta_log,
+                            ultima_ejecucion = excluded.ultima_ejecucion,
+                            ips_detectadas = excluded.ips_detectadas''',
+                     (host, ruta_log, ahora, len(filas)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return len(filas)
+
+def analizar_fuente(host: str, ruta_log: str, ruta_estado: str, ruta_geolite: str,
+                    registrar: bool = True) -> Dict:
+    """
+    Ejecuta los detectores sobre un log (se ejecuta en un proceso hijo).
+    Con registrar=False (simulación) no se toca la base de datos de estado.
+    """
+    inicio = time.perf_counter()
+    # Los detectores tratan un log inexistente o ilegible como vacío: se
+    # abre antes para que el host cuente como fallido y no como "0 detecciones"
+    with open(ruta_log, 'rb'):
+        pass
+    resultados = {
+        'user_agent': detectar_user_agents(ruta_log),
+        'pais': detectar_paises(ruta_log, ruta_geolite)
+    }
+    if registrar:
+        total = registrar_resultados(ruta_estado, host, ruta_log, resultados)
+    else:
+        total = sum(len(ips) for ips in resultados.values())
+    return {
+        'host': host,
+        'detectadas': total,
+        'ips': set().union(*resultados.values()),
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }
+
+def lista_consolidada(ruta_estado: str, solo_lectura: bool = False) -> List[str]:
+    """Devuelve la lista de IPs bloqueadas en cualquiera de los hosts"""
+    if solo_lectura:
+        if not os.path.exists(ruta_estado):
+            return []
+        conn = sqlite3.connect(f"file:{ruta_estado}?mode=ro", uri=True,
+                               timeout=CONFIG['TIMEOUT_BLOQUEO'])
+    else:
+        conn = conectar_estado(ruta_estado)
+    try:
+        filas = conn.execute("SELECT DISTINCT ip FROM bloqueos ORDER BY ip").fetchall()
+    finally:
+        conn.close()
+    return [ip for (ip,) in filas]
+
+def escribir_htaccess(ruta_htaccess: str, ips: List[str]) -> None:
+    """Sustituye el bloque consolidado del .htaccess por la lista completa"""
+    backup_path = f"{ruta_htaccess}.backup_multi_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+    lineas = []
+    if os.path.exists(ruta_htaccess):
+        shutil.copy2(ruta_htaccess, backup_path)
+        with open(ruta_htaccess, 'r') as f:
+            lineas = f.readlines()
+
+    nuevo_contenido = []
+    en_bloque = False
+    for linea in lineas:
+        if MARCADOR_INICIO in linea:
+            en_bloque = True
+        if not en_bloque:
+            nuevo_contenido.append(linea)
+        if MARCADOR_FIN in linea:
+            en_bloque = False
+
+    # Evita acumular líneas en blanco entre ejecuciones sucesivas
+    while nuevo_contenido and not nuevo_contenido[-1].strip():
+        nuevo_contenido.pop()
+
+    if ips:
+        nuevo_contenido += [
+            f"\n{MARCADOR_INICIO}\n",
+            "<RequireAll>\n",
+            "    Require all granted\n"
+        ]
+        nuevo_contenido += [f"    Require not ip {ip}\n" for ip in ips]
+        nuevo_contenido += ["</RequireAll>\n", f"{MARCADOR_FIN}\n"]
+
+    # Se escribe en un temporal y se renombra para no dejar un .htaccess a medias
+    temporal = f"{ruta_htaccess}.tmp"
+    with open(temporal, 'w') as f:
+        f.writelines(nuevo_contenido)
+    os.replace(temporal, ruta_htaccess)
+
+def main(ruta_hosts: str, ruta_estado: str = None, dry_run: bool = False):
+    """Procesa todos los hosts en paralelo y distribuye la lista consolidada"""
+    ruta_estado = ruta_estado or CONFIG['RUTA_ESTADO']
+    hosts = cargar_hosts(ruta_hosts)
+    if not dry_run:
+        conectar_estado(ruta_estado).close()
+
+    print(f"=== Ivory - Modo multi-host ({len(hosts)} hosts) ===")
+
+    errores = 0
+    detectadas = set()
+    with ProcessPoolExecutor(max_workers=min(CONFIG['MAX_PROCESOS'], len(hosts) or 1)) as pool:
+        futuros = {
+            pool.submit(analizar_fuente, h['host'], h['log'], ruta_estado, CONFIG['RUTA_GEOLITE'],
+                        not dry_run): h
+            for h in hosts
+        }
+        for futuro in as_completed(futuros):
+            host = futuros[futuro]['host']
+            try:
+                resumen = futuro.result()
+                detectadas |= resumen['ips']
+                print(f" - {host}: {resumen['detectadas']} detecciones en {resumen['segundos']}s")
+            except Exception as e:
+                errores += 1
+                print(f"❌ Error procesando {host}: {str(e)}")
+
+    ips = lista_consolidada(ruta_estado, solo_lectura=dry_run)
+    if dry_run:
+        # Lo que quedaría en la base de datos tras registrar esta ejecución
+        ips = sorted(set(ips) | detectadas)
+    print(f"\n🚨 Lista consolidada: {len(ips)} IPs")
+
+    if dry_run:
+        print("Modo simulación: no se modifica ningún .htaccess")
+    else:
+        for h in hosts:
+            try:
+                escribir_htaccess(h['htaccess'], ips)
+                print(f"✔ Reglas actualizadas en {h['host']}: {h['htaccess']}")
+            except Exception as e:
+                errores += 1
+                print(f"❌ Error escribiendo {h['htaccess']}: {str(e)}")
+
+    if errores:
+        raise RuntimeError(f"{errores} hosts con errores")
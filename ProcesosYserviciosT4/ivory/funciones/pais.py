@@ -87,17 +87,17 @@ def actualizar_htaccess(ips_bloqueadas: set):
             print("Restaurando backup...")
             shutil.copy2(backup_path, RUTA_HTACCESS)
 
-def procesar_logs():
+def procesar_logs(ruta_log: str = RUTA_LOG):
     """Procesa el archivo de logs de Apache"""
-    if not os.path.exists(RUTA_LOG):
-        print(f"❌ Archivo de logs no encontrado: {RUTA_LOG}")
+    if not os.path.exists(ruta_log):
+        print(f"❌ Archivo de logs no encontrado: {ruta_log}")
         return set()
     
     ips = set()
     patron_ip = re.compile(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
     
     try:
-        with open(RUTA_LOG, 'r') as f:
+        with open(ruta_log, 'r') as f:
             for linea in f:
                 ip = patron_ip.search(linea)
                 if ip and validar_ip(ip.group()):
@@ -107,6 +107,10 @@ def procesar_logs():
     
     return ips
 
+def filtrar_por_pais(ips: set, lector) -> set:
+    """Devuelve las IPs cuyo país está en PAISES_BLOQUEADOS"""
+    return {ip for ip in ips if obtener_pais(ip, lector) in PAISES_BLOQUEADOS}
+
 def main():
     # Verificar existencia de GeoIP
     if not os.path.exists(RUTA_GEOLITE):
@@ -120,11 +124,8 @@ def main():
         return
     
     # Obtener países
-    ips_bloqueadas = set()
     with geoip2.database.Reader(RUTA_GEOLITE) as lector:
-        for ip in ips:
-            if obtener_pais(ip, lector) in PAISES_BLOQUEADOS:
-                ips_bloqueadas.add(ip)
+        ips_bloqueadas = filtrar_por_pais(ips, lector)
     
     # Aplicar bloqueo
     if ips_bloqueadas:
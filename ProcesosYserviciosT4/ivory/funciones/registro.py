@@ -0,0 +1,115 @@
+# funciones/registro.py
+"""
+Rotación de ivory.log con varias ejecuciones de Ivory a la vez.
+
+Cada ejecución de Ivory es un proceso distinto y todas escriben en el
+mismo log. Cada registro se escribe con un flock sobre 'ivory.log.lock';
+con el cerrojo tomado se reabre el log si otro proceso lo rotó, se rota si
+el registro no cabe en 'max_bytes' y se escribe. La rotación renombra el
+log a ivory.log.AAAAmmdd-HHMMSS, lo comprime a .gz (primero a .gz.tmp) y
+conserva como mucho 'copias' rotados, todo bajo el cerrojo: dos procesos
+nunca comprimen ni borran el mismo archivo.
+"""
+
+import gzip
+import logging
+import os
+import re
+import shutil
+import time
+from typing import List
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, cada proceso rota por su cuenta
+    fcntl = None
+
+ROTADO = re.compile(r'^(\d{8}-\d{6})(?:-(\d+))?(\.gz)?$')
+
+def archivos_rotados(ruta: str) -> List[str]:
+    """Rotados de 'ruta', del más antiguo al más reciente"""
+    directorio, nombre = os.path.split(ruta)
+    encontrados = []
+    for archivo in os.listdir(directorio):
+        coincide = archivo.startswith(nombre + '.') and ROTADO.match(archivo[len(nombre) + 1:])
+        if coincide:
+            encontrados.append((coincide[1], int(coincide[2] or 0), os.path.join(directorio, archivo)))
+    return [rotado for _, _, rotado in sorted(encontrados)]
+
+def comprimir(ruta: str):
+    """Comprime 'ruta' a 'ruta.gz' sin dejar nunca un .gz a medias"""
+    temporal = ruta + '.gz.tmp'
+    with open(ruta, 'rb') as origen, gzip.open(temporal, 'wb') as destino:
+        shutil.copyfileobj(origen, destino, 1024 * 1024)
+    os.replace(temporal, ruta + '.gz')
+    os.remove(ruta)
+
+class ManejadorRotativo(logging.Handler):
+    """Handler de logging con rotación por tamaño, seguro con varios procesos"""
+
+    def __init__(self, ruta: str, max_bytes: int, copias: int = 0, encoding: str = 'utf-8'):
+        super().__init__()
+        self.ruta = os.path.abspath(ruta)
+        self.max_bytes = max_bytes
+        self.copias = copias
+        self.encoding = encoding
+        self.cerrojo = open(self.ruta + '.lock', 'a')
+        self.archivo = None
+
+    def reabrir_si_rotado(self):
+        try:
+            actual = os.stat(self.ruta)
+        except FileNotFoundError:
+            actual = None
+        if self.archivo is not None:
+            if actual is not None and os.path.samestat(actual, os.fstat(self.archivo.fileno())):
+                return
+            self.archivo.close()
+        self.archivo = open(self.ruta, 'ab')
+
+    def rotar(self):
+        self.archivo.close()
+        marca = time.strftime('%Y%m%d-%H%M%S')
+        destino, n = f"{self.ruta}.{marca}", 0
+        while os.path.exists(destino) or os.path.exists(destino + '.gz'):
+            n += 1
+            destino = f"{self.ruta}.{marca}-{n}"
+        os.replace(self.ruta, destino)
+        self.archivo = open(self.ruta, 'ab')
+
+        # También los rotados que otro proceso dejara sin comprimir al morir
+        for rotado in archivos_rotados(self.ruta):
+            if not rotado.endswith('.gz'):
+                comprimir(rotado)
+        if self.copias:
+            for rotado in archivos_rotados(self.ruta)[:-self.copias]:
+                os.remove(rotado)
+
+    def emit(self, record):
+        try:
+            datos = (self.format(record) + '\n').encode(self.encoding)
+            if fcntl is not None:
+                fcntl.flock(self.cerrojo, fcntl.LOCK_EX)
+            try:
+                self.reabrir_si_rotado()
+                tamano = os.fstat(self.archivo.fileno()).st_size
+                if self.max_bytes and tamano and tamano + len(datos) > self.max_bytes:
+                    self.rotar()
+                self.archivo.write(datos)
+                self.archivo.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.cerrojo, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self.archivo is not None:
+                self.archivo.close()
+                self.archivo = None
+            self.cerrojo.close()
+        finally:
+            self.release()
+        super().close()
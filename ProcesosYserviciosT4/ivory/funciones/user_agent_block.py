@@ -86,7 +86,7 @@ def bloquear_ips_htaccess(ips_bloqueadas: Set[str]) -> None:
             print("↻ Restaurando backup...")
             os.replace(backup_path, htaccess_path)
 
-def procesar_logs() -> Set[str]:
+def procesar_logs(ruta_log: str = None) -> Set[str]:
     """Procesa logs de XAMPP"""
     patron = re.compile(
         r'^(?P<ip>\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}).*?"(?P<user_agent>.*?)"$'
@@ -95,7 +95,7 @@ def procesar_logs() -> Set[str]:
     ips = set()
     
     try:
-        with open(CONFIG['LOG_PATH'], 'r') as f:
+        with open(ruta_log or CONFIG['LOG_PATH'], 'r') as f:
             for linea in f:
                 match = patron.search(linea)
                 if match:
@@ -8,6 +8,10 @@ import logging
 from datetime import datetime
 from funciones.pais import main as country_block_main
 from funciones.user_agent_block import main as user_agent_block_main
+from funciones.multihost import main as multihost_main, cargar_hosts
+from funciones.agregados import main as agregados_main
+from funciones.user_agent_block import CONFIG as CONFIG_UA
+from funciones.registro import ManejadorRotativo
 from colorama import Fore, Style, init
 
 # Inicializar colores para la terminal
@@ -16,6 +20,8 @@ init(autoreset=True)
 # Configuración centralizada
 CONFIG = {
     'LOG_FILE': 'ivory.log',
+    'LOG_MAX_BYTES': 10 * 1024 * 1024,
+    'LOG_BACKUPS': 5,
     'MAX_BACKUPS': 5,
     'COLORES': {
         'exito': Fore.GREEN,
@@ -26,9 +32,10 @@ CONFIG = {
 }
 
 def configurar_logging():
-    """Configura el sistema de logging unificado"""
+    """Configura el sistema de logging unificado (rotado y comprimido, ver funciones/registro.py)"""
     logging.basicConfig(
-        filename=CONFIG['LOG_FILE'],
+        handlers=[ManejadorRotativo(CONFIG['LOG_FILE'], CONFIG['LOG_MAX_BYTES'],
+                                    copias=CONFIG['LOG_BACKUPS'])],
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
@@ -77,6 +84,12 @@ def main():
                       help='Ejecutar bloqueo por país')
     parser.add_argument('--user-agent', action='store_true',
                       help='Ejecutar bloqueo por User Agent')
+    parser.add_argument('--hosts', metavar='JSON',
+                      help='Modo multi-host: analizar los logs de todos los hosts del JSON')
+    parser.add_argument('--estado', metavar='DB', default='ivory_estado.db',
+                      help='Base de datos de estado compartida del modo multi-host')
+    parser.add_argument('--agregados', action='store_true',
+                      help='Actualizar los JSON del mapa de calor y del Sankey (T5)')
     parser.add_argument('--dry-run', action='store_true',
                       help='Simular ejecución sin modificar archivos')
     parser.add_argument('--verbose', action='store_true',
@@ -111,6 +124,26 @@ def main():
             )
         )
 
+    if args.hosts:
+        resultados.append(
+            ejecutar_proceso(
+                lambda: multihost_main(args.hosts, args.estado, dry_run=args.dry_run),
+                "Bloqueo multi-host",
+                args
+            )
+        )
+
+    if args.agregados:
+        rutas_log = ([h['log'] for h in cargar_hosts(args.hosts)]
+                     if args.hosts else [CONFIG_UA['LOG_PATH']])
+        resultados.append(
+            ejecutar_proceso(
+                lambda: agregados_main(rutas_log, dry_run=args.dry_run),
+                "Agregados para dashboards",
+                args
+            )
+        )
+
     # Mostrar resumen final
     if all(resultados):
         mostrar_estado("Proceso completado exitosamente", 'exito')
@@ -132,5 +165,7 @@ if __name__ == "__main__":
         # python ivory.py --paises --user-agent  # Ejecutar ambos bloqueos
         # python ivory.py --paises --dry-run     # Simular solo bloqueo por país
         # python ivory.py --user-agent --verbose # Bloqueo UA con detalles
+        # python ivory.py --hosts hosts.json     # Lista consolidada para todos los front-ends
+        # python ivory.py --agregados            # Refrescar datos del mapa de calor y Sankey
         
         # ejecucion recomendada python ivory.py --paises --user-agent --verbose
\ No newline at end of file
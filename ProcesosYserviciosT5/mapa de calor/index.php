@@ -33,6 +33,13 @@
       // Definición de número de columnas y filas para las tablas
       $columnas = 24;
       $filas = 108;
+
+      // Si Ivory ha publicado agregados (python ivory.py --agregados) se usan
+      // las peticiones reales por día y hora en lugar de números aleatorios
+      $datos = null;
+      if (is_file(__DIR__.'/heatmap_datos.json')) {
+        $datos = json_decode(file_get_contents(__DIR__.'/heatmap_datos.json'), true);
+      }
     ?>
     
     <h1>Tabla con Mapa de Calor</h1>
@@ -51,8 +58,18 @@
       </thead>
       <tbody>
         <?php
+          if ($datos) {
+            // Una fila por día con las 24 horas agregadas por Ivory
+            foreach ($datos['valores'] as $i => $fila) {
+              echo '<tr title="'.htmlspecialchars($datos['filas'][$i]).'">';
+              foreach ($fila as $valor) {
+                echo '<td>'.(int)$valor.'</td>';
+              }
+              echo '</tr>';
+            }
+          }
           // Generar filas con celdas con números aleatorios
-          for($i = 0; $i < $filas; $i++){
+          for($i = 0; !$datos && $i < $filas; $i++){
             echo '<tr>';
             for($j = 0; $j < $columnas; $j++){
               echo '<td>'.rand(1,500).'</td>';